@@ -0,0 +1,95 @@
+import os
+import argparse
+
+from glb_reader import read_glb_json, mesh_node_names
+from mesh_jobs import lod_output_path, split_lod_name
+from JSXToJS import render_loader_module
+import file_index
+from file_index import find_files
+from async_files import DEFAULT_CONCURRENCY, atomic_write, transform_files
+
+def find_lod_files(glb_file_path):
+    # The decimated levels StlToGlb.py --lod wrote next to the GLB: name_lod1.glb, name_lod2.glb, ...
+    lod_files = []
+    while os.path.exists(lod_output_path(glb_file_path, len(lod_files) + 1)):
+        lod_files.append(lod_output_path(glb_file_path, len(lod_files) + 1))
+    return lod_files
+
+def is_lod_file(glb_file_path):
+    return split_lod_name(os.path.splitext(os.path.basename(glb_file_path))[0])[1] > 0
+
+def read_glb_module(glb_file_path):
+    """
+    Returns (node_name, lod_file_names) of the loader module for one .glb file, or None if
+    the GLB cannot be read. All the file access of convert_glb happens here.
+    """
+    glb_file_name = os.path.splitext(os.path.basename(glb_file_path))[0]
+    try:
+        node_names = mesh_node_names(read_glb_json(glb_file_path))
+    except ValueError as e:
+        print(f"Error reading {glb_file_path}: {e}")
+        return None
+    # Blender names the mesh node after the imported file, fall back to that if the GLB has no named mesh.
+    node_name = node_names[0] if node_names else glb_file_name
+
+    lod_file_names = [os.path.splitext(os.path.basename(lod_file))[0] for lod_file in find_lod_files(glb_file_path)]
+    return node_name, lod_file_names
+
+def render_glb_module(glb_file_path, module, scale, rotation):
+    glb_file_name = os.path.splitext(os.path.basename(glb_file_path))[0]
+    node_name, lod_file_names = module
+    return render_loader_module(glb_file_name, node_name, scale, rotation, lod_file_names)
+
+def convert_glb(glb_file_path, output_file_path, scale, rotation):
+    """
+    Writes the .js loader module for one .glb file, reading the node names straight from
+    the GLB's JSON chunk instead of going through gltfjsx. Levels of detail found next to
+    the GLB are loaded by the same module.
+    """
+    module = read_glb_module(glb_file_path)
+    if module is None:
+        return False
+    atomic_write(output_file_path, render_glb_module(glb_file_path, module, scale, rotation))
+    print(f"Conversion completed for {glb_file_path}, output saved to {output_file_path}")
+    return True
+
+def convert_directory(input_dir, output_dir, scale, rotation, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Converts every .glb file in input_dir to a .js loader module in output_dir.
+    This replaces running GlbToJSX.py followed by JSXToJS.py. Levels of detail
+    (name_lodN.glb) go into the module of their full mesh instead of getting their own.
+    Up to concurrency files are read and written at once, see async_files.transform_files.
+    """
+    if not os.path.isdir(input_dir):
+        print(f"The folder '{input_dir}' does not exist.")
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = []
+    for glb_file_path in find_files(input_dir, recursive=False):
+        file_name = os.path.basename(glb_file_path)
+        if file_name.endswith(".glb") and not is_lod_file(file_name):
+            jobs.append((glb_file_path, os.path.join(output_dir, os.path.splitext(file_name)[0] + ".js")))
+
+    def transform(job, module):
+        if module is None:
+            return None
+        return job[1], render_glb_module(job[0], module, scale, rotation)
+
+    outputs = transform_files(jobs, lambda job: read_glb_module(job[0]), transform, concurrency=concurrency, phase_name="glb_to_js")
+    for (glb_file_path, _), output_file_path in zip(jobs, outputs):
+        if output_file_path is not None:
+            print(f"Conversion completed for {glb_file_path}, output saved to {output_file_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert .glb files directly to .js loader modules, without gltfjsx.")
+    parser.add_argument("input_dir", type=str, help="Input directory containing .glb files.")
+    parser.add_argument("output_dir", type=str, help="Output directory for the .js files.")
+    parser.add_argument("--scale", type=str, help="Scale in the format [x,y,z].", default=None)
+    parser.add_argument("--rotation", type=str, help="Rotation in the format [x,y,z].", default=None)
+    file_index.add_arguments(parser)
+    args = parser.parse_args()
+    file_index.configure(args.file_index)
+
+    convert_directory(args.input_dir, args.output_dir, args.scale, args.rotation)
@@ -1,44 +1,135 @@
 import os
+import json
+import shutil
 import subprocess
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-def convert_glb_to_jsx(folder_path, output_path):
+from mesh_jobs import split_lod_name, write_report, print_report
+import instrumentation
+from instrumentation import phase
+import file_index
+from file_index import find_files
+
+BATCH_DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gltfjsx_batch.mjs")
+# Lines the batch driver prints for each converted file start with this marker.
+RESULT_PREFIX = "@@gltfjsx-result "
+
+def collect_glb_jobs(folder_path, output_path):
+    jobs = []
+    # Iterate over all files in the folder
+    for full_file_path in find_files(folder_path, recursive=False):
+        file = os.path.basename(full_file_path)
+        # Check if the file is a .glb file
+        # Levels of detail (name_lodN.glb) are loaded through the module of their full mesh
+        if file.endswith(".glb") and split_lod_name(os.path.splitext(file)[0])[1] == 0:
+            output_file_path = os.path.join(output_path, os.path.splitext(file)[0] + ".jsx")
+            jobs.append((full_file_path, output_file_path))
+    return jobs
+
+def stderr_error(stderr, default):
+    # The last line of stderr, skipping the "Node.js v20.19.5" footer Node prints after a crash.
+    lines = [line for line in stderr.strip().splitlines() if line.strip() and not line.startswith("Node.js v")]
+    return lines[-1].strip() if lines else default
+
+def convert_with_npx(job):
+    full_file_path, output_file_path = job
+    # Construct the command to be executed
+    command = [shutil.which("npx") or "npx", "gltfjsx", full_file_path, "-o", output_file_path]
+    print(f"Converting {os.path.basename(full_file_path)}...")
+    try:
+        with phase("npx_gltfjsx", full_file_path):
+            result = subprocess.run(command, capture_output=True, text=True)
+    except OSError as e:
+        return {"source": full_file_path, "output": output_file_path, "ok": False, "error": f"could not run npx: {e}"}
+    if result.returncode != 0:
+        error = stderr_error(result.stderr, f"npx gltfjsx exited with code {result.returncode}")
+        return {"source": full_file_path, "output": output_file_path, "ok": False, "error": error}
+    return {"source": full_file_path, "output": output_file_path, "ok": True, "error": None}
+
+def convert_pool(jobs, max_workers):
+    """
+    Runs one npx gltfjsx subprocess per file, at most max_workers at a time.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(convert_with_npx, jobs))
+
+def global_node_modules():
+    npm = shutil.which("npm")
+    if npm is None:
+        return []
+    result = subprocess.run([npm, "root", "-g"], capture_output=True, text=True)
+    return [result.stdout.strip()] if result.returncode == 0 else []
+
+def convert_batch(jobs):
+    """
+    Sends every file to a single Node process running gltfjsx_batch.mjs.
+
+    Files the driver did not report on (for example because gltfjsx could not be loaded
+    at all) are returned as failures.
+    """
+    request = json.dumps({"jobs": [list(job) for job in jobs], "modulePaths": global_node_modules()})
+    # Node startup and loading gltfjsx is the batch time not spent in the per-file gltfjsx events.
+    try:
+        with phase("node_batch", files=len(jobs)):
+            process = subprocess.run([shutil.which("node") or "node", BATCH_DRIVER], input=request,
+                                     capture_output=True, text=True)
+    except OSError as e:
+        return [{"source": source, "output": output, "ok": False, "error": f"could not run node: {e}"} for source, output in jobs]
+    results = {}
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            instrumentation.event("gltfjsx", result["source"], result.pop("seconds", None), ok=result["ok"])
+            print(f"Conversion {'successful' if result['ok'] else 'failed'} for {os.path.basename(result['source'])}")
+            results[result["source"]] = result
+    error = stderr_error(process.stderr, f"node exited with code {process.returncode}")
+    return [results.get(source, {"source": source, "output": output, "ok": False, "error": error})
+            for source, output in jobs]
+
+def convert_glb_to_jsx(folder_path, output_path, mode="batch", max_workers=os.cpu_count()):
     """
     Converts all .glb files in the specified folder to .jsx components using gltfjsx.
-    
+
     Parameters:
     - folder_path: The path to the folder containing .glb files.
+    - output_path: The folder the .jsx files are written to.
+    - mode: "batch" converts everything in one Node process, "pool" runs npx gltfjsx per file
+      with max_workers subprocesses at a time.
+
+    Returns one result dict per file, errors do not stop the rest of the files.
     """
     # Check if the folder exists
     if not os.path.isdir(folder_path):
         print(f"The folder '{folder_path}' does not exist.")
-        return
+        return []
     os.makedirs(output_path, exist_ok=True)
-    # Iterate over all files in the folder
-    for file in os.listdir(folder_path):
-        # Check if the file is a .glb file
-        if file.endswith(".glb"):
-            # Construct the full path to the file
-            full_file_path = os.path.join(folder_path, file)
-            output_file_path = os.path.join(output_path,os.path.splitext(file)[0] + ".jsx")
-            # Construct the command to be executed
-            command = f"npx gltfjsx {full_file_path} -o {output_file_path}"
-            print(f"Converting {file}...")
-            try:
-                # Execute the command
-                subprocess.run(command, check=True, shell=True)
-                print(f"Conversion successful for {file}")
-            except subprocess.CalledProcessError as e:
-                print(f"Error converting {file}: {e}")
+    jobs = collect_glb_jobs(folder_path, output_path)
+    if not jobs:
+        return []
+    if mode == "batch":
+        return convert_batch(jobs)
+    return convert_pool(jobs, max_workers)
 
 if __name__ == "__main__":
     # Set up argument parser
     parser = argparse.ArgumentParser(description="Convert GLB files to JSX components.")
     parser.add_argument("input_folder", type=str, help="Input folder containing .glb files.")
     parser.add_argument("output_folder", type=str, help="Output folder for the converted .jsx files.")
-    
+    parser.add_argument("--mode", choices=["batch", "pool"], default="batch",
+                        help="batch: one Node process for all files (default). pool: one npx gltfjsx subprocess per file.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Concurrent npx subprocesses in pool mode.")
+    parser.add_argument("--report", type=str, default=None, help="Write the per-file success/failure summary to this JSON file.")
+    instrumentation.add_arguments(parser)
+    file_index.add_arguments(parser)
+
     # Parse arguments
     args = parser.parse_args()
-    
+    instrumentation.configure(args.trace, args.profile)
+    file_index.configure(args.file_index)
+
     # Call the conversion function with the provided arguments
-    convert_glb_to_jsx(args.input_folder, args.output_folder)
+    results = convert_glb_to_jsx(args.input_folder, args.output_folder, args.mode, max(1, args.jobs))
+    if args.report:
+        write_report(results, args.report)
+    print_report(results)
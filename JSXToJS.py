@@ -1,19 +1,39 @@
 import os
 import argparse
 import re
+import json
 
-def convert_file(input_file_path, output_file_path, scale, rotation):
-    with open(input_file_path, 'r') as file:
-        content = file.read()
-    
-    glb_path_match = re.search(r"\/([\w_-]+)\.glb", content)
-    if glb_path_match:
-        glb_file_name = glb_path_match.group(1)
-    else:
-        print(f"GLB path not found in {input_file_path}.")
-        return
+import instrumentation
+import file_index
+from file_index import find_files
+from async_files import DEFAULT_CONCURRENCY, atomic_write, read_text, transform_files
+
+def node_accessor(node_name):
+    # nodes.name when the node name is a plain identifier, nodes["name"] otherwise.
+    if re.fullmatch(r"[A-Za-z_$][\w$]*", node_name):
+        return f"nodes.{node_name}"
+    return f"nodes[{json.dumps(node_name)}]"
 
-    new_import = f"import {glb_file_name} from './{glb_file_name}.glb';\nimport {{ useGLTF }} from '@react-three/drei';\n"
+def render_loader_module(glb_file_name, node_name, scale, rotation, lod_file_names=()):
+    """
+    Returns the source of the .js loader module for one mesh.
+
+    Parameters:
+    - glb_file_name: Name of the .glb file next to the module, without extension. Also used as the import name.
+    - node_name: The node in the .glb whose geometry and material are returned.
+    - scale, rotation: Optional "[x,y,z]" strings added to the returned mesh description.
+    - lod_file_names: Names of the decimated levels of detail (name_lod1, name_lod2, ...). The
+      module then loads level props.lod, clamped to the coarsest level, and level 0 by default.
+    """
+    node = node_accessor(node_name)
+    new_import = f"import {glb_file_name} from './{glb_file_name}.glb';\n"
+    for lod_file_name in lod_file_names:
+        new_import += f"import {lod_file_name} from './{lod_file_name}.glb';\n"
+    new_import += "import { useGLTF } from '@react-three/drei';\n"
+    gltf_url = glb_file_name
+    if lod_file_names:
+        new_import += f"\nconst lods = [{', '.join((glb_file_name,) + tuple(lod_file_names))}];\n\n"
+        gltf_url = "lods[Math.min(props?.lod ?? 0, lods.length - 1)]"
     preload_statement = f"useGLTF.preload({glb_file_name})"
 
     additional_properties = ""
@@ -23,31 +43,58 @@ def convert_file(input_file_path, output_file_path, scale, rotation):
         additional_properties += f", rotation: {rotation}"
     
     new_export_function = f"""export default function Model(props) {{
-  const {{ nodes }} = useGLTF({glb_file_name});
-  return [{{type:'raw', geometry:nodes.{glb_file_name}.geometry, material: nodes.{glb_file_name}.material{additional_properties}}}]
+  const {{ nodes }} = useGLTF({gltf_url});
+  return [{{type:'raw', geometry:{node}.geometry, material: {node}.material{additional_properties}}}]
   
 }}
 """
     
-    new_content = "/*\nAuto-generated by: https://github.com/pmndrs/gltfjsx\n*/\n\n" + new_import + new_export_function + preload_statement
-    
-    with open(output_file_path, 'w') as file:
-        file.write(new_content)
+    return "/*\nAuto-generated by: https://github.com/pmndrs/gltfjsx\n*/\n\n" + new_import + new_export_function + preload_statement
+
+def convert_content(input_file_path, content, scale, rotation):
+    # The loader module for the gltfjsx output in content, or None if it loads no .glb.
+    glb_path_match = re.search(r"\/([\w_-]+)\.glb", content)
+    if glb_path_match:
+        glb_file_name = glb_path_match.group(1)
+    else:
+        print(f"GLB path not found in {input_file_path}.")
+        return None
+
+    return render_loader_module(glb_file_name, glb_file_name, scale, rotation)
+
+def convert_file(input_file_path, output_file_path, scale, rotation):
+    new_content = convert_content(input_file_path, read_text(input_file_path), scale, rotation)
+    if new_content is None:
+        return
+    atomic_write(output_file_path, new_content)
     print(f"Conversion completed for {input_file_path}, output saved to {output_file_path}\n")
 
-def convert_directory(input_dir, output_dir, scale, rotation):
+def convert_directory(input_dir, output_dir, scale, rotation, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Converts every .jsx file in input_dir, reading and writing up to concurrency files at
+    once (see async_files.transform_files). Every output is written atomically.
+    """
     if not os.path.isdir(input_dir):
         print(f"The folder '{input_dir}' does not exist.")
         return
 
     os.makedirs(output_dir, exist_ok=True)
 
-    for file_name in os.listdir(input_dir):
+    jobs = []
+    for input_file_path in find_files(input_dir, recursive=False):
+        file_name = os.path.basename(input_file_path)
         if file_name.endswith(".jsx"):
-            input_file_path = os.path.join(input_dir, file_name)
             output_file_name = os.path.splitext(file_name)[0] + ".js"
-            output_file_path = os.path.join(output_dir, output_file_name)
-            convert_file(input_file_path, output_file_path, scale, rotation)
+            jobs.append((input_file_path, os.path.join(output_dir, output_file_name)))
+
+    def transform(job, content):
+        new_content = convert_content(job[0], content, scale, rotation)
+        return None if new_content is None else (job[1], new_content)
+
+    outputs = transform_files(jobs, lambda job: read_text(job[0]), transform, concurrency=concurrency, phase_name="jsx_to_js")
+    for (input_file_path, _), output_file_path in zip(jobs, outputs):
+        if output_file_path is not None:
+            print(f"Conversion completed for {input_file_path}, output saved to {output_file_path}\n")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert .jsx files to .js files with specified conversion logic.")
@@ -55,6 +102,10 @@ if __name__ == "__main__":
     parser.add_argument("output_dir", type=str, help="Output directory for the converted .js files.")
     parser.add_argument("--scale", type=str, help="Scale in the format [x,y,z].", default=None)
     parser.add_argument("--rotation", type=str, help="Rotation in the format [x,y,z].", default=None)
+    instrumentation.add_arguments(parser)
+    file_index.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.configure(args.trace, args.profile)
+    file_index.configure(args.file_index)
 
     convert_directory(args.input_dir, args.output_dir,args.scale, args.rotation)
@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+
+from mesh_jobs import (STL_EXTENSIONS, COMPRESSION_PROFILES, conversion_settings, parse_lod_budgets, file_hash,
+                       print_report, print_size_report)
+from blender_pool import run_pool
+from GlbToJS import convert_glb
+import file_index
+from file_index import find_files
+
+# The store index lives in the root of the store. Paths in it are relative to the store,
+# so the store can be moved or checked in with the robots that use it.
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+# Hex digits of the content hash in asset names. Assets are named m_<hash> so the name is
+# also a valid JS identifier for the generated modules.
+HASH_LENGTH = 16
+
+
+def asset_name(content_hash):
+    return "m_" + content_hash[:HASH_LENGTH]
+
+
+def load_index(store_dir):
+    try:
+        with open(os.path.join(store_dir, INDEX_NAME), 'r') as file:
+            index = json.load(file)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "assets": {}, "aliases": {}}
+
+
+def save_index(index, store_dir):
+    os.makedirs(store_dir, exist_ok=True)
+    index_path = os.path.join(store_dir, INDEX_NAME)
+    temp_path = index_path + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(index, file, indent=4)
+    os.replace(temp_path, index_path)
+
+
+def _store_relative(path, store_dir):
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(store_dir)).replace("\\", "/")
+
+
+def collect_sources(mesh_dirs, extensions=STL_EXTENSIONS):
+    sources = []
+    for mesh_dir in mesh_dirs:
+        sources.extend(find_files(mesh_dir, extensions))
+    return sources
+
+
+def update_aliases(index, sources, store_dir):
+    """
+    Hashes every source mesh (skipping files whose size and mtime did not change since the
+    last run) and records which asset it is an alias of. Aliases of files that no longer
+    exist are dropped. Returns asset name -> the first source path with that content.
+    """
+    aliases = index["aliases"]
+    for alias in list(aliases):
+        if not os.path.exists(os.path.join(store_dir, alias)):
+            del aliases[alias]
+
+    unique = {}
+    for source_file_path in sources:
+        alias = _store_relative(source_file_path, store_dir)
+        stat = os.stat(source_file_path)
+        record = aliases.get(alias)
+        if not (record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns):
+            content_hash = file_hash(source_file_path)
+            record = {"asset": asset_name(content_hash), "hash": content_hash,
+                      "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            aliases[alias] = record
+        unique.setdefault(record["asset"], source_file_path)
+    return unique
+
+
+def stale_assets(index, unique, store_dir, settings):
+    # An asset is converted when it is new, its settings changed or one of its files is gone.
+    jobs = []
+    for name, source_file_path in unique.items():
+        entry = index["assets"].get(name)
+        if (entry is None or entry["settings"] != settings
+                or not all(os.path.exists(os.path.join(store_dir, output)) for output in entry["outputs"])):
+            jobs.append((source_file_path, os.path.join(os.path.abspath(store_dir), name + ".glb")))
+    return jobs
+
+
+def remove_unreferenced_assets(index, store_dir):
+    # Assets no alias points at anymore are deleted with their files.
+    referenced = {record["asset"] for record in index["aliases"].values()}
+    for name in [name for name in index["assets"] if name not in referenced]:
+        entry = index["assets"].pop(name)
+        for output in entry["outputs"] + [entry["module"]]:
+            output_file_path = os.path.join(store_dir, output)
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+        print(f"Removed {name}, no mesh uses it anymore")
+
+
+def build_store(store_dir, mesh_dirs, convert, settings, scale=None, rotation=None):
+    """
+    Converts every distinct mesh found in mesh_dirs once into store_dir and writes a .js
+    loader module next to each asset. Identical files (same bytes, any path or name) share
+    one asset.
+
+    Parameters:
+    - store_dir: The store directory, holding m_<hash>.glb, m_<hash>.js and index.json.
+    - mesh_dirs: Directories searched for mesh files, e.g. the meshes/ folder of every robot.
+    - convert: Called with the list of (source, glb) jobs to convert, returns the results (see blender_pool.run_pool).
+    - settings: The conversion settings recorded per asset, see mesh_jobs.conversion_settings.
+    - scale, rotation: Passed on to the loader modules, see GlbToJS.py.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    index = load_index(store_dir)
+    sources = collect_sources(mesh_dirs)
+    unique = update_aliases(index, sources, store_dir)
+    remove_unreferenced_assets(index, store_dir)
+
+    jobs = stale_assets(index, unique, store_dir, settings)
+    print(f"{len(sources)} mesh files, {len(unique)} distinct meshes, "
+          f"{len(unique) - len(jobs)} already in the store, converting {len(jobs)}.")
+    results = convert(jobs) if jobs else []
+    for result in results:
+        name = os.path.splitext(os.path.basename(result["output"]))[0]
+        if not result["ok"]:
+            index["assets"].pop(name, None)
+            continue
+        module_file_path = os.path.join(store_dir, name + ".js")
+        outputs = [_store_relative(output, store_dir) for output in [result["output"]] + result.get("lods", [])]
+        # Levels of detail the new settings no longer produce
+        for output in index["assets"].get(name, {}).get("outputs", []):
+            if output not in outputs and os.path.exists(os.path.join(store_dir, output)):
+                os.remove(os.path.join(store_dir, output))
+        convert_glb(result["output"], module_file_path, scale, rotation)
+        index["assets"][name] = {
+            "settings": settings,
+            "outputs": outputs,
+            "module": _store_relative(module_file_path, store_dir),
+        }
+    save_index(index, store_dir)
+
+    if results:
+        print_size_report(results)
+        print_report(results)
+    copies = len(sources) - len(unique)
+    if copies:
+        print(f"{copies} duplicate mesh files share an asset with another file.")
+    return results
+
+
+def alias_index(index):
+    # casefolded file name -> [(casefolded alias path parts, asset name)]
+    aliases_by_name = {}
+    for alias, record in index["aliases"].items():
+        parts = alias.casefold().split("/")
+        aliases_by_name.setdefault(parts[-1], []).append((parts, record["asset"]))
+    return aliases_by_name
+
+
+def asset_for_mesh(aliases_by_name, mesh_filename):
+    """
+    Returns the asset a URDF mesh filename (e.g. package://robot/meshes/base.STL) refers to,
+    or None. Aliases are matched by file name ignoring case. Copies with the same content
+    are the same asset, so only when aliases with different content share the name does
+    the one with the longest matching path suffix win.
+
+    Parameters:
+    - aliases_by_name: The store aliases grouped by file name, see alias_index.
+    - mesh_filename: The filename attribute of a <mesh> element.
+    """
+    parts = mesh_filename.replace("\\", "/").split("://", 1)[-1].casefold().split("/")
+    best_assets, best_length = set(), 0
+    for alias_parts, asset in aliases_by_name.get(parts[-1], ()):
+        length = 1
+        while length < min(len(parts), len(alias_parts)) and parts[-length - 1] == alias_parts[-length - 1]:
+            length += 1
+        if length > best_length:
+            best_assets, best_length = {asset}, length
+        elif length == best_length:
+            best_assets.add(asset)
+    if len(best_assets) > 1:
+        print(f"Ambiguous mesh '{mesh_filename}': matches assets {sorted(best_assets)}, using {sorted(best_assets)[0]}")
+    return sorted(best_assets)[0] if best_assets else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the meshes of one or more robots into a shared content-addressed GLB store.")
+    parser.add_argument("store_dir", type=str, help="Store directory, shared by every robot.")
+    parser.add_argument("mesh_dirs", type=str, nargs="+", help="Directories searched for STL/DAE files, e.g. robot_name/meshes.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of Blender workers.")
+    parser.add_argument("--blender", type=str, default="blender", help="Blender executable to run.")
+    parser.add_argument("--lod", type=parse_lod_budgets, default=[1.0],
+                        help="Triangle budget of every level of detail, e.g. 1.0,0.25,0.05. See StlToGlb.py.")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_PROFILES), default="none",
+                        help="Compression profile of the exported GLBs. See StlToGlb.py.")
+    parser.add_argument("--scale", type=str, help="Scale in the format [x,y,z] for the .js modules.", default=None)
+    parser.add_argument("--rotation", type=str, help="Rotation in the format [x,y,z] for the .js modules.", default=None)
+    file_index.add_arguments(parser)
+    args = parser.parse_args()
+    file_index.configure(args.file_index)
+
+    if shutil.which(args.blender) is None:
+        print(f"Blender executable '{args.blender}' not found.")
+        sys.exit(1)
+    results = build_store(args.store_dir, args.mesh_dirs,
+                          lambda jobs: run_pool(jobs, max(1, args.jobs), args.blender, "stl", args.lod, args.compression),
+                          conversion_settings(args.lod, args.compression), args.scale, args.rotation)
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
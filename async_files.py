@@ -0,0 +1,115 @@
+import os
+import asyncio
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import phase
+
+# Files in flight at once in transform_files. On network filesystems each open, read, write
+# and close is a round trip to the server, so the time goes into waiting, not into work.
+DEFAULT_CONCURRENCY = 32
+# Buffer size of atomic_open, so large outputs (items_tf.json) go out in a few big writes.
+WRITE_BUFFER = 1 << 20
+
+
+def _create_temp_file(directory, prefix):
+    # A new file named prefix.<random>.tmp in directory, returns (descriptor, path).
+    for _ in range(100):
+        temp_path = os.path.join(directory, f"{prefix}.{os.urandom(6).hex()}.tmp")
+        try:
+            return os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), temp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"could not create a temporary file for {prefix} in {directory}")
+
+
+@contextmanager
+def atomic_open(file_path, mode='w'):
+    """
+    Opens a hidden temporary file next to file_path and moves it over file_path once the
+    block ends without an error. Readers see either the old file or the new one, never a
+    partly written one. If the block raises, file_path is left as it was.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    # Created like open() creates files, so the kernel applies the umask.
+    descriptor, temp_path = _create_temp_file(directory, "." + os.path.basename(file_path))
+    try:
+        with os.fdopen(descriptor, mode, WRITE_BUFFER) as file:
+            try:
+                # A file that is replaced keeps its permissions.
+                os.chmod(temp_path, os.stat(file_path).st_mode & 0o777)
+            except FileNotFoundError:
+                pass
+            yield file
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(file_path, content):
+    # Writes a str or bytes, see atomic_open.
+    with atomic_open(file_path, 'wb' if isinstance(content, bytes) else 'w') as file:
+        file.write(content)
+
+
+def read_text(file_path):
+    with open(file_path, 'r') as file:
+        return file.read()
+
+
+async def _read_files(items, read, concurrency):
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return await asyncio.gather(*(loop.run_in_executor(executor, read, item) for item in items))
+
+
+def read_files(items, read, concurrency=DEFAULT_CONCURRENCY):
+    # [read(item) for item in items], with up to concurrency reads in flight at once.
+    items = list(items)
+    if not items:
+        return []
+    return asyncio.run(_read_files(items, read, max(1, concurrency)))
+
+
+async def _transform_file(item, read, transform, write, loop, executor, phase_name):
+    # Timed from the start of the read to the end of the write, see instrumentation.py.
+    with phase(phase_name, item[0] if isinstance(item, tuple) else item):
+        data = await loop.run_in_executor(executor, read, item)
+        output = transform(item, data)
+        if output is None:
+            return None
+        output_file_path, content = output
+        await loop.run_in_executor(executor, write, output_file_path, content)
+        return output_file_path
+
+
+async def _transform_files(items, read, transform, write, concurrency, phase_name):
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return await asyncio.gather(*(_transform_file(item, read, transform, write, loop, executor, phase_name)
+                                      for item in items))
+
+
+def transform_files(items, read, transform, write=atomic_write, concurrency=DEFAULT_CONCURRENCY, phase_name="transform_file"):
+    """
+    Runs read -> transform -> write for every item, with the reads and writes of up to
+    concurrency files in flight at once, so the latency of one file overlaps with the others.
+
+    Parameters:
+    - items: One entry per file, e.g. an input path or an (input, output) pair.
+    - read: read(item), called on the I/O threads. Returns what transform needs.
+    - transform: transform(item, data), called on the event loop thread. Returns
+      (output_file_path, content) or None to skip writing.
+    - write: write(output_file_path, content), called on the I/O threads. Atomic by default.
+    - phase_name: Name of the per-file event written with --trace.
+
+    Returns the output path written for every item (None where transform skipped it), in order.
+    """
+    items = list(items)
+    if not items:
+        return []
+    return asyncio.run(_transform_files(items, read, transform, write, max(1, concurrency), phase_name))
@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+import urdf_document
+from urdf_document import URDFDocument
+from urdf_parser import parse_urdf_for_joints, parse_urdf_for_links, parseString, parse_directory, write_to_json_file
+from mesh_lookup_populator import scan_and_generate_imports
+from xacro_eval import PropertyTable, compile_expression
+
+RESULTS_VERSION = 1
+
+# Named robot shapes. links is the total over all files, properties the number of
+# xacro:property per file, density the fraction of joint origin values written as ${...}
+# expressions, meshes the number of distinct mesh files the links cycle through.
+SCENARIOS = {
+    "small": {"links": 100, "branching": 2, "files": 1, "properties": 20, "density": 0.5, "meshes": 50},
+    "medium": {"links": 2000, "branching": 3, "files": 4, "properties": 200, "density": 0.5, "meshes": 500},
+    "large": {"links": 20000, "branching": 4, "files": 8, "properties": 1000, "density": 0.5, "meshes": 2000},
+}
+
+
+def _value(rng, property_names, density):
+    # A number, or an expression over the generated properties.
+    if property_names and rng.random() < density:
+        return "${%s * %.3f}" % (rng.choice(property_names), rng.uniform(-1, 1))
+    return "%.4f" % rng.uniform(-1, 1)
+
+
+def generate_urdf(file_path, robot_name, links, branching, properties, density, meshes, rng):
+    """
+    Writes one synthetic URDF: a tree of links where every link has up to branching
+    children, each with a visual mesh and a material, and xacro properties that reference
+    each other so they resolve in dependency order.
+    """
+    lines = [f'<robot name="{robot_name}" xmlns:xacro="http://www.ros.org/wiki/xacro">']
+    property_names = [f"{robot_name}_p{index}" for index in range(properties)]
+    for index, name in enumerate(property_names):
+        value = "%.4f" % rng.uniform(0.1, 1) if index == 0 else "${%s + %.4f}" % (property_names[rng.randrange(index)], rng.uniform(0, 0.1))
+        lines.append(f'  <xacro:property name="{name}" value="{value}"/>')
+    lines.append('  <material name="grey"><color rgba="0.5 0.5 0.5 1"/></material>')
+    for index in range(links):
+        mesh = f"mesh_{rng.randrange(meshes)}"
+        lines.append(f'  <link name="{robot_name}_link{index}">')
+        lines.append('    <visual>')
+        # urdf_parser.py reads link origins as plain numbers, only joint origins are substituted.
+        lines.append(f'      <origin xyz="{_value(rng, [], 0)} 0 {_value(rng, [], 0)}" rpy="0 0 {_value(rng, [], 0)}"/>')
+        lines.append(f'      <geometry><mesh filename="package://bench/meshes/{mesh}.STL" scale="0.001 0.001 0.001"/></geometry>')
+        lines.append('      <material name="grey"/>')
+        lines.append('    </visual>')
+        lines.append('  </link>')
+    for index in range(1, links):
+        parent = (index - 1) // branching
+        lines.append(f'  <joint name="{robot_name}_joint{index}" type="revolute">')
+        lines.append(f'    <parent link="{robot_name}_link{parent}"/>')
+        lines.append(f'    <child link="{robot_name}_link{index}"/>')
+        lines.append(f'    <origin xyz="{_value(rng, property_names, density)} {_value(rng, property_names, density)} 0.1" '
+                     f'rpy="{_value(rng, property_names, density)} 0 {_value(rng, property_names, density)}"/>')
+        lines.append('  </joint>')
+    lines.append('</robot>')
+    with open(file_path, 'w') as file:
+        file.write("\n".join(lines))
+
+
+def generate_robot(root_dir, links, branching, files, properties, density, meshes, seed=0):
+    """
+    Writes a synthetic robot directory laid out like the README example:
+    root_dir/robot.urdf (plus part_N.xacro files) and root_dir/visual/mesh_N.js, one fake
+    loader module per mesh plus a tenth as many modules no URDF uses.
+
+    Returns the name of the main URDF.
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root_dir, "visual"), exist_ok=True)
+    per_file = max(1, links // files)
+    for index in range(files):
+        file_name = "robot.urdf" if index == 0 else f"part_{index}.xacro"
+        generate_urdf(os.path.join(root_dir, file_name), f"r{index}", per_file, branching, properties, density, meshes, rng)
+    for index in range(meshes + meshes // 10):
+        with open(os.path.join(root_dir, "visual", f"mesh_{index}.js"), 'w') as file:
+            file.write(f"import mesh_{index} from './mesh_{index}.glb';\nexport default function Model(props) {{}}\n")
+    return "robot.urdf"
+
+
+def measure(function, setup=None, repeat=3):
+    """
+    Runs function(setup()) repeat times and once more under tracemalloc.
+    Returns the wall times in seconds and the peak traced memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    argument = setup() if setup else None
+    tracemalloc.start()
+    try:
+        function(argument)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"wall_s": {"min": min(times), "median": statistics.median(times), "runs": times}, "peak_bytes": peak}
+
+
+def _cold(function):
+    # Every run starts without the documents and compiled expressions of the previous one.
+    def run(argument):
+        urdf_document._document_cache.clear()
+        compile_expression.cache_clear()
+        return function(argument)
+    return run
+
+
+def run_scenario(name, params, repeat=3, keep_dir=None):
+    """
+    Generates the robot of one scenario and times each stage of urdf_parser.py and
+    mesh_lookup_populator.py on it.
+    """
+    work_dir = keep_dir or tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        main_urdf = generate_robot(work_dir, seed=0, **params)
+        urdf_path = os.path.join(work_dir, main_urdf)
+        with open(urdf_path, 'r') as file:
+            content = file.read()
+        expressions = [value for value in content.split('"') if "${" in value]
+        json_path = os.path.join(work_dir, "items_tf.json")
+        data = parse_directory(work_dir, main_urdf)
+
+        stages = {
+            "parse_xml": measure(_cold(lambda _: URDFDocument.from_string(content)), repeat=repeat),
+            "parse_urdf_for_joints": measure(_cold(lambda document: parse_urdf_for_joints(document, True)),
+                                             lambda: URDFDocument.from_string(content), repeat),
+            "parse_urdf_for_links": measure(_cold(lambda document: parse_urdf_for_links(document)),
+                                            lambda: URDFDocument.from_string(content), repeat),
+            "parseString": measure(_cold(lambda table: [parseString(expression, table) for expression in expressions]),
+                                   lambda: PropertyTable(URDFDocument.from_string(content).property_table), repeat),
+            "parse_directory": measure(_cold(lambda _: parse_directory(work_dir, main_urdf)), repeat=repeat),
+            "write_to_json_file": measure(lambda _: write_to_json_file(data, json_path), repeat=repeat),
+            "scan_and_generate_imports": measure(_cold(lambda _: scan_and_generate_imports(work_dir, work_dir)), repeat=repeat),
+        }
+        return {"name": name, "params": params, "stages": stages,
+                "total_wall_s": sum(stage["wall_s"]["median"] for stage in stages.values())}
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _quiet(function, *args):
+    # The parsers print progress for every file, keep the benchmark output readable.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        return function(*args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_scenario(result):
+    print(f"\n{result['name']}: {result['params']}")
+    print(f"  {'stage':<28}{'median ms':>12}{'min ms':>12}{'peak MB':>10}")
+    for stage, values in result["stages"].items():
+        print(f"  {stage:<28}{values['wall_s']['median'] * 1000:>12.1f}{values['wall_s']['min'] * 1000:>12.1f}"
+              f"{values['peak_bytes'] / 2 ** 20:>10.1f}")
+    print(f"  {'total':<28}{result['total_wall_s'] * 1000:>12.1f}")
+
+
+def print_comparison(baseline, results):
+    """
+    Prints the median time of every stage against a previous results file, matched by
+    scenario name. Ratios below 1 are faster than the baseline.
+    """
+    previous = {scenario["name"]: scenario for scenario in baseline["scenarios"]}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        if result["name"] not in previous:
+            continue
+        print(f"  {result['name']}:")
+        for stage, values in result["stages"].items():
+            before = previous[result["name"]]["stages"].get(stage)
+            if before:
+                ratio = values["wall_s"]["median"] / max(before["wall_s"]["median"], 1e-9)
+                print(f"    {stage:<28}{before['wall_s']['median'] * 1000:>10.1f} -> "
+                      f"{values['wall_s']['median'] * 1000:>10.1f} ms  x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark urdf_parser.py and mesh_lookup_populator.py on synthetic robots.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), nargs="+", default=["small", "medium"],
+                        help="Named robot sizes to run. Defaults to small and medium.")
+    parser.add_argument("--links", type=int, help="Run a custom robot with this many links instead of the named scenarios.")
+    parser.add_argument("--branching", type=int, default=3, help="Children per link of the custom robot.")
+    parser.add_argument("--files", type=int, default=1, help="URDF/xacro files the custom robot is split into.")
+    parser.add_argument("--properties", type=int, default=100, help="xacro:property entries per file of the custom robot.")
+    parser.add_argument("--density", type=float, default=0.5, help="Fraction of joint origin values of the custom robot written as ${...} expressions.")
+    parser.add_argument("--meshes", type=int, default=100, help="Distinct meshes of the custom robot.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage, the median is reported.")
+    parser.add_argument("--output", type=str, default="benchmark_results.json", help="JSON file the results are written to.")
+    parser.add_argument("--compare", type=str, default=None, help="A previous results file to compare against.")
+    parser.add_argument("--keep", type=str, default=None, help="Generate the robot into this directory and keep it (custom robot or single scenario).")
+    args = parser.parse_args()
+
+    if args.links:
+        scenarios = {"custom": {"links": args.links, "branching": args.branching, "files": args.files,
+                                "properties": args.properties, "density": args.density, "meshes": args.meshes}}
+    else:
+        scenarios = {name: SCENARIOS[name] for name in args.scenario}
+
+    results = []
+    for name, params in scenarios.items():
+        print(f"Running {name}...")
+        result = _quiet(run_scenario, name, params, max(1, args.repeat), args.keep)
+        print_scenario(result)
+        results.append(result)
+
+    output = {"version": RESULTS_VERSION, "commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat,
+              "scenarios": results}
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=4)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            print_comparison(json.load(file), results)
@@ -0,0 +1,167 @@
+import bpy
+import bmesh
+import os
+import sys
+import argparse
+
+from mesh_jobs import (COMPRESSION_PROFILES, collect_mesh_jobs, convert_with_cache, conversion_settings, export_settings,
+                       parse_lod_budgets, lod_output_path, read_job_list, write_report, print_report, print_size_report,
+                       serve_requests)
+import instrumentation
+import file_index
+from instrumentation import phase
+
+# The Blender side of StlToGlb.py and DaeToGlb.py. The two scripts only differ in the files
+# they look for and how they import them, everything else lives here.
+
+def triangle_count(obj):
+    return sum(len(polygon.vertices) - 2 for polygon in obj.data.polygons)
+
+def supported_export_settings(settings):
+    # Exporter options are renamed between Blender versions, only pass the ones this version has.
+    known = bpy.ops.export_scene.gltf.get_rna_type().properties.keys()
+    return {key: value for key, value in settings.items() if key in known}
+
+def merge_duplicate_vertices(meshes, distance):
+    for obj in meshes:
+        mesh = bmesh.new()
+        mesh.from_mesh(obj.data)
+        bmesh.ops.remove_doubles(mesh, verts=mesh.verts, dist=distance)
+        mesh.to_mesh(obj.data)
+        mesh.free()
+
+def export_lods(glb_file_path, lod_budgets, compression="none"):
+    """
+    Exports the scene once per budget, the first one to glb_file_path and level N to
+    name_lodN.glb, with a collapse decimate modifier on every mesh applied at export.
+    Returns the paths of the decimated levels.
+    """
+    meshes = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
+    merge_distance = COMPRESSION_PROFILES[compression]["merge_distance"]
+    if merge_distance is not None:
+        # STL stores every triangle with its own corners and exported DAE files often repeat
+        # vertices per face, merged vertices also decimate much better.
+        merge_duplicate_vertices(meshes, merge_distance)
+    settings = supported_export_settings(export_settings(compression))
+    total = sum(triangle_count(obj) for obj in meshes)
+    outputs = []
+    for level, budget in enumerate(lod_budgets):
+        ratio = budget if budget <= 1 else min(1.0, budget / max(total, 1))
+        if ratio < 1:
+            for obj in meshes:
+                modifier = obj.modifiers.get("LOD") or obj.modifiers.new("LOD", 'DECIMATE')
+                modifier.decimate_type = 'COLLAPSE'
+                modifier.ratio = ratio
+        else:
+            # The full mesh is exported exactly as before, without applying any modifier.
+            for obj in meshes:
+                if obj.modifiers.get("LOD"):
+                    obj.modifiers.remove(obj.modifiers["LOD"])
+        lod_file_path = lod_output_path(glb_file_path, level)
+        bpy.ops.export_scene.gltf(filepath=lod_file_path, **dict(settings, export_apply=ratio < 1))
+        outputs.append(lod_file_path)
+    return outputs[1:]
+
+# Everything an import can leave behind in the scene.
+SCENE_DATA = ("objects", "meshes", "materials", "images", "textures", "armatures", "actions", "cameras", "lights", "collections")
+
+def clear_scene():
+    # Much cheaper than read_factory_settings, used between the meshes of a --serve worker.
+    for name in SCENE_DATA:
+        data = getattr(bpy.data, name)
+        for block in list(data):
+            data.remove(block)
+
+def convert_mesh(import_mesh, source_file_path, glb_file_path, lod_budgets=(1.0,), compression="none", fast_reset=False):
+    os.makedirs(os.path.dirname(glb_file_path), exist_ok=True)
+
+    # Clear the scene
+    with phase("reset_scene", source_file_path):
+        if fast_reset:
+            clear_scene()
+        else:
+            bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    with phase("blender_import", source_file_path):
+        import_mesh(source_file_path)
+
+    # Export to GLB, once per level of detail
+    with phase("gltf_export", source_file_path, lods=len(lod_budgets)):
+        lods = export_lods(glb_file_path, lod_budgets, compression)
+    print(f"Converted {source_file_path} to {glb_file_path}" + (f" and {len(lods)} levels of detail" if lods else ""))
+    return lods
+
+def convert_jobs(import_mesh, jobs, lod_budgets=(1.0,), compression="none", fast_reset=False):
+    results = []
+    for source_file_path, glb_file_path in jobs:
+        try:
+            lods = convert_mesh(import_mesh, source_file_path, glb_file_path, lod_budgets, compression, fast_reset)
+            results.append({"source": source_file_path, "output": glb_file_path, "ok": True, "error": None, "lods": lods})
+        except Exception as e:
+            # Keep going, one broken mesh should not stop the rest of the package.
+            print(f"Error converting {source_file_path}: {e}")
+            results.append({"source": source_file_path, "output": glb_file_path, "ok": False, "error": str(e)})
+    return results
+
+def parse_arguments(description, mesh_kind):
+    # The arguments after "--" on the Blender command line.
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:]
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("base_search_dir", type=str, help=f"Base directory to search for {mesh_kind} files.")
+    # The base directory where GLB files should be saved
+    parser.add_argument("base_output_dir", type=str, help="Base directory where GLB files are saved.")
+    parser.add_argument("--file-list", type=str, default=None,
+                        help="JSON list of [source, output] pairs to convert instead of walking base_search_dir. Used by blender_pool.py.")
+    parser.add_argument("--force", action="store_true", help="Reconvert every mesh, even the ones the build manifest says are up to date.")
+    parser.add_argument("--report", type=str, default=None, help="Write a per-file success/failure report to this JSON file.")
+    parser.add_argument("--lod", type=parse_lod_budgets, default=[1.0],
+                        help="Triangle budget of every level of detail, e.g. 1.0,0.25,0.05. Budgets up to 1 are fractions of the "
+                             "imported triangles, larger ones are triangle counts. Level N > 0 is written to name_lodN.glb.")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_PROFILES), default="none",
+                        help="none exports the mesh as imported, dedup merges identical vertices and drops UVs and vertex colors, "
+                             "draco also applies Draco compression with quantized positions and normals.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Stay running and convert the jobs sent on stdin, one JSON request per line. Used by conversion_daemon.py.")
+    instrumentation.add_arguments(parser)
+    file_index.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure(args.trace, args.profile)
+    file_index.configure(args.file_index)
+    return args
+
+def main(description, mesh_kind, extensions, import_mesh):
+    """
+    Runs a conversion script: parses its arguments and converts the meshes.
+
+    Parameters:
+    - description: Description shown by --help.
+    - mesh_kind: Name of the source files in the help text, e.g. "STL".
+    - extensions: File extensions searched for in base_search_dir.
+    - import_mesh: import_mesh(file_path) loads one source file into the scene.
+    """
+    args = parse_arguments(description, mesh_kind)
+
+    # Ensure base_output_dir is an absolute path
+    base_output_dir = os.path.abspath(args.base_output_dir)
+
+    if args.serve:
+        # Start from factory settings once, then only clear the scene between meshes.
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        serve_requests(lambda jobs, lod_budgets, compression: convert_jobs(import_mesh, jobs, lod_budgets, compression, fast_reset=True))
+        sys.exit(0)
+
+    if args.file_list:
+        results = convert_jobs(import_mesh, read_job_list(args.file_list), args.lod, args.compression)
+    else:
+        # Only meshes that changed since the last run are converted, see mesh_jobs.convert_with_cache.
+        jobs = collect_mesh_jobs(args.base_search_dir, base_output_dir, extensions)
+        results = convert_with_cache(jobs, base_output_dir, lambda stale: convert_jobs(import_mesh, stale, args.lod, args.compression),
+                                     args.force, conversion_settings(args.lod, args.compression))
+
+    if args.report:
+        write_report(results, args.report)
+    else:
+        print_size_report(results)
+        print_report(results)
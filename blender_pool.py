@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import tempfile
+
+from mesh_jobs import (STL_EXTENSIONS, DAE_EXTENSIONS, COMPRESSION_PROFILES, collect_mesh_jobs, convert_with_cache, conversion_settings,
+                       parse_lod_budgets, write_job_list, read_report, write_report, print_report,
+                       print_size_report)
+import instrumentation
+import file_index
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Which Blender script handles which kind of conversion, and the files it picks up.
+CONVERTERS = {
+    "stl": (os.path.join(SCRIPT_DIR, "StlToGlb.py"), STL_EXTENSIONS),
+    "dae": (os.path.join(SCRIPT_DIR, "DaeToGlb.py"), DAE_EXTENSIONS),
+}
+
+def split_jobs(jobs, worker_count):
+    """
+    Splits the job list into at most worker_count chunks of roughly equal work.
+
+    Mesh sizes vary a lot inside a robot package, so jobs are handed out largest file
+    first to whichever worker currently has the fewest bytes to import.
+    """
+    chunks = [[] for _ in range(min(worker_count, len(jobs)))]
+    loads = [0] * len(chunks)
+    # One stat per file, on network mounts each is a round trip.
+    sizes = {source_file_path: os.path.getsize(source_file_path) for source_file_path, _ in jobs}
+    for job in sorted(jobs, key=lambda job: sizes[job[0]], reverse=True):
+        worker = loads.index(min(loads))
+        chunks[worker].append(job)
+        loads[worker] += sizes[job[0]]
+    return chunks
+
+def run_pool(jobs, worker_count, blender="blender", converter="stl", lod_budgets=(1.0,), compression="none"):
+    """
+    Converts the (source, output) jobs across worker_count Blender background processes,
+    exporting one GLB per level of detail in lod_budgets with the given compression profile
+    (see StlToGlb.py --lod and --compression).
+
+    Returns one result dict per job, in the same order as jobs.
+    """
+    script = CONVERTERS[converter][0]
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workers = []
+        for index, chunk in enumerate(split_jobs(jobs, worker_count)):
+            job_list_path = os.path.join(temp_dir, f"jobs_{index}.json")
+            report_path = os.path.join(temp_dir, f"report_{index}.json")
+            write_job_list(chunk, job_list_path)
+            command = [blender, "--background", "--python", script, "--",
+                       temp_dir, temp_dir, "--file-list", job_list_path, "--report", report_path,
+                       "--lod", ",".join(str(budget) for budget in lod_budgets), "--compression", compression]
+            command += instrumentation.child_arguments()
+            print(f"Starting Blender worker {index} with {len(chunk)} meshes...")
+            workers.append((subprocess.Popen(command), chunk, report_path, time.perf_counter()))
+
+        for index, (process, chunk, report_path, start) in enumerate(workers):
+            return_code = process.wait()
+            # Includes Blender startup, which the per-file phases of the worker do not.
+            instrumentation.event("blender_worker", None, time.perf_counter() - start, worker=index,
+                                  files=len(chunk), return_code=return_code)
+            if os.path.exists(report_path):
+                for result in read_report(report_path):
+                    results[result["source"]] = result
+            # Anything the worker did not report on was lost when Blender exited early.
+            for source_file_path, glb_file_path in chunk:
+                if source_file_path not in results:
+                    results[source_file_path] = {"source": source_file_path, "output": glb_file_path, "ok": False,
+                                                 "error": f"no result reported, Blender worker exited with code {return_code}"}
+    return [results[source_file_path] for source_file_path, _ in jobs]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert meshes to GLB with a pool of Blender background workers.")
+    parser.add_argument("base_search_dir", type=str, help="Base directory to search for mesh files.")
+    parser.add_argument("base_output_dir", type=str, help="Base directory where GLB files are saved.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of Blender workers. Defaults to one per core.")
+    parser.add_argument("--blender", type=str, default="blender", help="Blender executable to run.")
+    parser.add_argument("--converter", choices=sorted(CONVERTERS), default="stl",
+                        help="stl runs StlToGlb.py (STL and DAE files), dae runs DaeToGlb.py (DAE files only).")
+    parser.add_argument("--force", action="store_true", help="Reconvert every mesh, even the ones the build manifest says are up to date.")
+    parser.add_argument("--report", type=str, default=None, help="Write the per-file success/failure report to this JSON file.")
+    parser.add_argument("--lod", type=parse_lod_budgets, default=[1.0],
+                        help="Triangle budget of every level of detail, e.g. 1.0,0.25,0.05. See StlToGlb.py.")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_PROFILES), default="none",
+                        help="Compression profile of the exported GLBs. See StlToGlb.py.")
+    instrumentation.add_arguments(parser)
+    file_index.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args.trace, args.profile)
+    file_index.configure(args.file_index)
+
+    base_output_dir = os.path.abspath(args.base_output_dir)
+    jobs = collect_mesh_jobs(args.base_search_dir, base_output_dir, CONVERTERS[args.converter][1])
+    results = convert_with_cache(jobs, base_output_dir,
+                                 lambda stale: run_pool(stale, max(1, args.jobs), args.blender, args.converter,
+                                                        args.lod, args.compression),
+                                 args.force, conversion_settings(args.lod, args.compression))
+    if args.report:
+        write_report(results, args.report)
+    print_size_report(results)
+    print_report(results)
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
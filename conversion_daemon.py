@@ -0,0 +1,317 @@
+import os
+import sys
+import json
+import queue
+import socket
+import signal
+import argparse
+import threading
+import subprocess
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from mesh_jobs import (COMPRESSION_PROFILES, SERVE_RESULT_PREFIX, collect_mesh_jobs, convert_with_cache, conversion_settings,
+                       parse_lod_budgets)
+from blender_pool import CONVERTERS, split_jobs
+import instrumentation
+from instrumentation import phase
+
+
+class BlenderWorker:
+    """
+    One Blender process started with --serve, kept running between requests, so a request
+    only pays for the import and export of its meshes. A worker that dies (e.g. Blender
+    crashing on a broken mesh) is started again on its next request.
+    """
+    def __init__(self, index, blender, script):
+        self.index = index
+        self.command = [blender, "--background", "--python", script, "--", ".", ".", "--serve"]
+        self.process = None
+
+    def start(self):
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        print(f"Started Blender worker {self.index} (pid {self.process.pid})")
+
+    def convert(self, jobs, lod_budgets, compression):
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        request = {"jobs": [list(job) for job in jobs], "lod": list(lod_budgets), "compression": compression}
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            for line in self.process.stdout:
+                if line.startswith(SERVE_RESULT_PREFIX):
+                    return json.loads(line[len(SERVE_RESULT_PREFIX):])
+                # Blender's own output, passed through.
+                print(f"[blender {self.index}] {line}", end="")
+        except (BrokenPipeError, OSError):
+            pass
+        return_code = self.process.wait()
+        if len(jobs) > 1:
+            # Blender does not say which mesh it died on. Retry one mesh at a time, on a
+            # new process, so only that mesh fails.
+            return [result for job in jobs for result in self.convert([job], lod_budgets, compression)]
+        return [{"source": source_file_path, "output": glb_file_path, "ok": False,
+                 "error": f"Blender worker exited with code {return_code}"} for source_file_path, glb_file_path in jobs]
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            # Closing stdin ends the serve loop, Blender exits by itself.
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def _python_job(kind, payload):
+    # Runs in a pool process. The imports stay loaded, as do the parse caches of urdf_document,
+    # xacro_expander and xacro_eval. Those caches are size bounded, so the long lived pool
+    # processes do not grow with every robot and edit they see.
+    if kind == "parse-urdf":
+        from urdf_parser import parse_directory, write_to_json_file
+        from xacro_expander import parse_xacro_args
+        xacro_args = parse_xacro_args(payload.get("xacro_args", [])) if payload.get("xacro") else None
+        data = parse_directory(payload["directory"], payload["main_urdf"], jobs=1, xacro_args=xacro_args)
+        write_to_json_file(data, payload["output"])
+        return {"output": payload["output"], "frames": len(data["tfs"]), "items": len(data["items"])}
+    if kind == "glb-to-js":
+        from GlbToJS import convert_glb
+        convert_glb(payload["input"], payload["output"], payload.get("scale"), payload.get("rotation"))
+        return {"output": payload["output"]}
+    if kind == "mesh-lookup":
+        from mesh_lookup_populator import scan_and_generate_imports
+        scan_and_generate_imports(payload["directory"], payload["urdf_directory"], payload.get("bundle", False),
+                                  payload.get("preload", ()), payload.get("scale"), payload.get("rotation"))
+        return {"output": os.path.join(payload["directory"], "MeshLookup.js")}
+    raise ValueError(f"unknown job {kind}")
+
+
+PYTHON_JOBS = ("parse-urdf", "glb-to-js", "mesh-lookup")
+
+
+class UnknownEndpoint(LookupError):
+    # Answered with 404. A KeyError from a missing payload field is a bad request instead.
+    pass
+
+
+class ConversionService:
+    """
+    The warm workers behind the daemon: Blender workers for mesh conversion and a pool of
+    Python processes for URDF parsing, GLB -> JS modules and MeshLookup.js.
+
+    Requests are queued first come, first served. The meshes of one request are split over
+    all Blender workers (largest first, see blender_pool.split_jobs).
+    """
+    def __init__(self, blender="blender", converter="stl", blender_workers=1, python_workers=1):
+        self.workers = queue.Queue()
+        self.all_workers = [BlenderWorker(index, blender, CONVERTERS[converter][0]) for index in range(blender_workers)]
+        for worker in self.all_workers:
+            worker.start()
+            self.workers.put(worker)
+        self.extensions = CONVERTERS[converter][1]
+        # One thread per Blender worker, so a queued chunk always finds a free worker.
+        self.blender_executor = ThreadPoolExecutor(max_workers=blender_workers)
+        self.python_executor = ProcessPoolExecutor(max_workers=python_workers)
+        self.requests = 0
+        self.lock = threading.Lock()
+        # One lock per output directory: two requests for the same directory would otherwise
+        # both convert its stale meshes and the last one to save the manifest drops the other's entries.
+        self.manifest_locks = {}
+
+    def _convert_chunk(self, chunk, lod_budgets, compression):
+        worker = self.workers.get()
+        try:
+            return worker.convert(chunk, lod_budgets, compression)
+        finally:
+            self.workers.put(worker)
+
+    def convert_jobs(self, jobs, lod_budgets=(1.0,), compression="none"):
+        """
+        Converts (source, output) jobs on the warm workers. Returns one result per job, in order.
+        """
+        chunks = split_jobs(jobs, len(self.all_workers)) if jobs else []
+        futures = [self.blender_executor.submit(self._convert_chunk, chunk, lod_budgets, compression) for chunk in chunks]
+        results = {result["source"]: result for future in futures for result in future.result()}
+        return [results[source_file_path] for source_file_path, _ in jobs]
+
+    def convert(self, payload):
+        """
+        Handles a /convert request: either "jobs" ([[source, output], ...]), converted as
+        given, or "source_dir" and "output_dir", converted through the build manifest like
+        StlToGlb.py does (only changed meshes, unless "force"). Requests for the same
+        output_dir run one after the other.
+        """
+        lod = payload.get("lod", "1.0")
+        lod_budgets = parse_lod_budgets(lod if isinstance(lod, str) else ",".join(str(budget) for budget in lod))
+        compression = payload.get("compression", "none")
+        if compression not in COMPRESSION_PROFILES:
+            raise ValueError(f"unknown compression profile {compression}")
+        if "jobs" in payload:
+            jobs = [(os.path.abspath(source), os.path.abspath(output)) for source, output in payload["jobs"]]
+            return {"results": self.convert_jobs(jobs, lod_budgets, compression)}
+        output_dir = os.path.abspath(payload["output_dir"])
+        with self.lock:
+            manifest_lock = self.manifest_locks.setdefault(output_dir, threading.Lock())
+        with manifest_lock:
+            jobs = collect_mesh_jobs(payload["source_dir"], output_dir, self.extensions)
+            results = convert_with_cache(jobs, output_dir, lambda stale: self.convert_jobs(stale, lod_budgets, compression),
+                                         payload.get("force", False), conversion_settings(lod_budgets, compression))
+        return {"results": results}
+
+    def run_python(self, kind, payload):
+        return self.python_executor.submit(_python_job, kind, payload).result()
+
+    def status(self):
+        return {"blender_workers": len(self.all_workers), "idle_blender_workers": self.workers.qsize(),
+                "requests": self.requests}
+
+    def handle(self, endpoint, payload):
+        with self.lock:
+            self.requests += 1
+        with phase("daemon_" + endpoint.replace("-", "_")):
+            if endpoint == "convert":
+                return self.convert(payload)
+            if endpoint in PYTHON_JOBS:
+                return self.run_python(endpoint, payload)
+        raise UnknownEndpoint(f"unknown endpoint /{endpoint}")
+
+    def close(self):
+        self.blender_executor.shutdown()
+        self.python_executor.shutdown()
+        for worker in self.all_workers:
+            worker.stop()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /convert, /parse-urdf, /glb-to-js or /mesh-lookup with a JSON body, answered with a
+    JSON body. GET /status reports the workers.
+    """
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/status":
+            self._reply(200, self.server.service.status())
+        else:
+            self._reply(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError as e:
+            self._reply(400, {"error": f"invalid JSON: {e}"})
+            return
+        try:
+            self._reply(200, self.server.service.handle(self.path.strip("/"), payload))
+        except UnknownEndpoint as e:
+            self._reply(404, {"error": str(e)})
+        except (KeyError, ValueError, TypeError) as e:
+            self._reply(400, {"error": f"invalid request: {e!r}"})
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+
+    def address_string(self):
+        # Unix socket clients have no address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, port=8765, socket_path=None):
+    """
+    Returns an HTTP server for the service, on localhost:port or on the Unix socket socket_path.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, RequestHandler)
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port), RequestHandler)
+    server.service = service
+    return server
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def submit(address, endpoint, payload=None, timeout=None):
+    """
+    Sends one request to a running daemon and returns the decoded JSON reply.
+
+    Parameters:
+    - address: host:port (e.g. 127.0.0.1:8765) or the path of the daemon's Unix socket.
+    - endpoint: convert, parse-urdf, glb-to-js, mesh-lookup or status.
+    - payload: The JSON body. Paths in it are resolved by the daemon, so pass absolute paths.
+    """
+    if os.path.sep in address or ":" not in address:
+        connection = _UnixConnection(address)
+    else:
+        host, port = address.rsplit(":", 1)
+        connection = http.client.HTTPConnection(host, int(port), timeout=timeout)
+    try:
+        if payload is None:
+            connection.request("GET", "/" + endpoint)
+        else:
+            connection.request("POST", "/" + endpoint, json.dumps(payload), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        body = json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"{endpoint} failed ({response.status}): {body.get('error')}")
+    return body
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep Blender and Python workers running and serve conversion and URDF parsing requests.")
+    parser.add_argument("--port", type=int, default=8765, help="Port on localhost to listen on.")
+    parser.add_argument("--socket", type=str, default=None, help="Listen on this Unix socket instead of a port.")
+    parser.add_argument("--blender", type=str, default="blender", help="Blender executable to run.")
+    parser.add_argument("--converter", choices=sorted(CONVERTERS), default="stl",
+                        help="stl runs StlToGlb.py (STL and DAE files), dae runs DaeToGlb.py (DAE files only).")
+    parser.add_argument("--blender-workers", type=int, default=1, help="Blender processes kept running.")
+    parser.add_argument("--python-workers", type=int, default=1, help="Python processes kept running for parse-urdf, glb-to-js and mesh-lookup.")
+    parser.add_argument("--submit", type=str, nargs="+", metavar="ENDPOINT [JSON]", default=None,
+                        help="Instead of serving, send one request (a GET without JSON) to the daemon at --socket or --port and print the reply.")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.submit:
+        endpoint, body = args.submit[0], args.submit[1:]
+        reply = submit(args.socket or f"127.0.0.1:{args.port}", endpoint, json.loads(body[0]) if body else None)
+        print(json.dumps(reply, indent=4))
+        sys.exit(0)
+
+    instrumentation.configure(args.trace, args.profile)
+    service = ConversionService(args.blender, args.converter, max(1, args.blender_workers), max(1, args.python_workers))
+    server = make_server(service, args.port, args.socket)
+    print(f"Listening on {args.socket or f'http://127.0.0.1:{args.port}'}")
+    # Stop the Blender workers on kill as well as on Ctrl+C.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
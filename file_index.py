@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import atexit
+
+# Scripts started by a script that uses an index (Blender workers, pipeline stages) share it.
+INDEX_ENV = "MESH_PIPELINE_FILE_INDEX"
+INDEX_VERSION = 2
+# A directory modified this close to the moment it was listed may have changed again within
+# the same mtime tick, so its listing is not trusted on the next run (as git does for racy files).
+RACY_NS = 2 * 10 ** 9
+
+
+class FileIndex:
+    """
+    A listing of every directory the stages walk, built with os.scandir and optionally
+    persisted between runs.
+
+    Every directory is still stat'ed once per walk, but its entries are only listed again
+    when the directory's own mtime changed, i.e. when a file or subdirectory was added,
+    removed or renamed. On network mounts that replaces one metadata request per file with
+    one per directory.
+
+    Only names are kept. Code that decides what to rebuild (the build manifest, the
+    pipeline state) stats the files itself.
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path
+        self.directories = {}
+        self.dirty = False
+        if index_path and os.path.exists(index_path):
+            try:
+                with open(index_path, 'r') as file:
+                    index = json.load(file)
+                if index.get("version") == INDEX_VERSION:
+                    self.directories = index["directories"]
+            except (OSError, ValueError, KeyError):
+                # A corrupt index only costs one full scan.
+                self.directories = {}
+
+    def _forget(self, directory):
+        prefix = os.path.join(directory, "")
+        for key in [key for key in self.directories if key == directory or key.startswith(prefix)]:
+            del self.directories[key]
+        self.dirty = True
+
+    def listing(self, directory):
+        """
+        Returns the entry of one directory: {"dirs": [[name, is_symlink], ...],
+        "files": [name, ...]} in os.scandir order, or None when it
+        cannot be read.
+        """
+        key = os.path.abspath(directory)
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+        except OSError:
+            if key in self.directories:
+                self._forget(key)
+            return None
+        entry = self.directories.get(key)
+        if entry and entry["mtime_ns"] == mtime_ns and entry["scanned_ns"] - mtime_ns > RACY_NS:
+            return entry
+
+        scanned_ns = time.time_ns()
+        dirs, files = [], []
+        try:
+            with os.scandir(key) as entries:
+                for item in entries:
+                    try:
+                        is_dir = item.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append([item.name, item.is_symlink()])
+                    else:
+                        # Broken symlinks included, os.walk lists them as files too.
+                        files.append(item.name)
+        except OSError:
+            return None
+        if entry:
+            for name in {name for name, _ in entry["dirs"]} - {name for name, _ in dirs}:
+                self._forget(os.path.join(key, name))
+        entry = {"mtime_ns": mtime_ns, "scanned_ns": scanned_ns, "dirs": dirs, "files": files}
+        self.directories[key] = entry
+        self.dirty = True
+        return entry
+
+    def walk(self, top):
+        """
+        Same as os.walk(top): yields (root, dirs, files) top-down in the same order, without
+        following symlinked directories. Removing names from dirs prunes the walk.
+        """
+        entry = self.listing(top)
+        if entry is None:
+            return
+        dirs = [name for name, _ in entry["dirs"]]
+        yield top, dirs, list(entry["files"])
+        links = {name for name, is_symlink in entry["dirs"] if is_symlink}
+        for name in dirs:
+            if name not in links:
+                yield from self.walk(os.path.join(top, name))
+
+    def files(self, top, extensions=None, recursive=True):
+        """
+        Returns the paths of the files under top whose lower-cased name ends with one of
+        extensions (every file when None), in os.walk order.
+        """
+        found = []
+        for root, dirs, names in self.walk(top):
+            for name in names:
+                if extensions is None or name.lower().endswith(extensions):
+                    found.append(os.path.join(root, name))
+            if not recursive:
+                break
+        return found
+
+    def save(self):
+        # Merges into what other processes saved meanwhile, the directories listed here win.
+        if not self.index_path or not self.dirty:
+            return
+        saved = FileIndex(self.index_path).directories
+        saved.update(self.directories)
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({"version": INDEX_VERSION, "directories": saved}, file)
+        os.replace(temp_path, self.index_path)
+        self.dirty = False
+
+
+_shared = {"index": None}
+
+
+def shared_index():
+    """
+    The index every stage of this process walks through. It is persisted to the file named
+    by --file-index (or the MESH_PIPELINE_FILE_INDEX environment variable) at exit, and only
+    lives in memory otherwise.
+    """
+    if _shared["index"] is None:
+        _shared["index"] = FileIndex(os.environ.get(INDEX_ENV))
+        atexit.register(_shared["index"].save)
+    return _shared["index"]
+
+
+def configure(index_path):
+    # Called with the --file-index option. Child processes inherit the path.
+    if index_path:
+        os.environ[INDEX_ENV] = os.path.abspath(index_path)
+        if _shared["index"] is not None and _shared["index"].index_path != os.environ[INDEX_ENV]:
+            _shared["index"].save()
+            _shared["index"] = None
+
+
+def walk(top):
+    return shared_index().walk(top)
+
+
+def find_files(top, extensions=None, recursive=True):
+    return shared_index().files(top, extensions, recursive)
+
+
+def add_arguments(parser):
+    parser.add_argument("--file-index", type=str, default=None,
+                        help="Keep the directory listings in this file between runs, so unchanged directories are not listed again.")
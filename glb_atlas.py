@@ -0,0 +1,187 @@
+import os
+import argparse
+
+from glb_reader import read_glb, write_glb, sanitize_node_name
+from GlbToJS import is_lod_file
+from JSXToJS import render_loader_module
+from async_files import atomic_write
+import file_index
+from file_index import find_files
+
+# Top level glTF arrays whose entries are copied into the atlas, in the order their indices
+# are remapped. Everything else (scenes, asset, buffers) is rebuilt.
+MERGED_ARRAYS = ("bufferViews", "accessors", "samplers", "images", "textures", "materials", "meshes", "skins", "nodes")
+
+
+def _remap_texture_infos(value, offsets):
+    # textureInfo objects (baseColorTexture, normalTexture, ... also inside extensions) hold an "index" into textures.
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.endswith("Texture") and isinstance(item, dict) and "index" in item:
+                item["index"] += offsets["textures"]
+            _remap_texture_infos(item, offsets)
+    elif isinstance(value, list):
+        for item in value:
+            _remap_texture_infos(item, offsets)
+
+
+def _remap_primitive(primitive, offsets):
+    primitive["attributes"] = {name: index + offsets["accessors"] for name, index in primitive["attributes"].items()}
+    if "indices" in primitive:
+        primitive["indices"] += offsets["accessors"]
+    if "material" in primitive:
+        primitive["material"] += offsets["materials"]
+    for target in primitive.get("targets", []):
+        for name in target:
+            target[name] += offsets["accessors"]
+    draco = primitive.get("extensions", {}).get("KHR_draco_mesh_compression")
+    if draco:
+        draco["bufferView"] += offsets["bufferViews"]
+
+
+def _remap(gltf, offsets, byte_offset):
+    """
+    Shifts every index of one input file by the number of entries of that kind already in
+    the atlas, and its buffer views by the position of its binary chunk in the atlas buffer.
+    """
+    for view in gltf.get("bufferViews", []):
+        view["buffer"] = 0
+        view["byteOffset"] = view.get("byteOffset", 0) + byte_offset
+    for accessor in gltf.get("accessors", []):
+        if "bufferView" in accessor:
+            accessor["bufferView"] += offsets["bufferViews"]
+        sparse = accessor.get("sparse")
+        if sparse:
+            sparse["indices"]["bufferView"] += offsets["bufferViews"]
+            sparse["values"]["bufferView"] += offsets["bufferViews"]
+    for image in gltf.get("images", []):
+        if "bufferView" in image:
+            image["bufferView"] += offsets["bufferViews"]
+    for texture in gltf.get("textures", []):
+        if "source" in texture:
+            texture["source"] += offsets["images"]
+        if "sampler" in texture:
+            texture["sampler"] += offsets["samplers"]
+    _remap_texture_infos(gltf.get("materials", []), offsets)
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh["primitives"]:
+            _remap_primitive(primitive, offsets)
+    for skin in gltf.get("skins", []):
+        if "inverseBindMatrices" in skin:
+            skin["inverseBindMatrices"] += offsets["accessors"]
+        skin["joints"] = [joint + offsets["nodes"] for joint in skin["joints"]]
+        if "skeleton" in skin:
+            skin["skeleton"] += offsets["nodes"]
+    for node in gltf.get("nodes", []):
+        for key in ("mesh", "skin"):
+            if key in node:
+                node[key] += offsets[key + "es" if key == "mesh" else key + "s"]
+        if "children" in node:
+            node["children"] = [child + offsets["nodes"] for child in node["children"]]
+
+
+def merge_glbs(glb_files):
+    """
+    Merges GLB files into one glTF document and binary buffer.
+
+    The first mesh node of every file is named after the file (without extension), so
+    useGLTF exposes it as nodes.<name>. The other nodes keep their names prefixed with
+    the file name, so names from different files cannot collide.
+
+    Parameters:
+    - glb_files: The .glb paths to merge.
+
+    Returns the (gltf, binary) pair and the list of node names, one per file.
+    """
+    atlas = {"asset": {"version": "2.0", "generator": "glb_atlas.py"}}
+    offsets = {key: 0 for key in MERGED_ARRAYS}
+    binary = bytearray()
+    roots = []
+    node_names = []
+    extensions = {"extensionsUsed": set(), "extensionsRequired": set()}
+    for glb_file_path in glb_files:
+        gltf, chunk = read_glb(glb_file_path)
+        if len(gltf.get("buffers", [])) > 1 or any("uri" in buffer for buffer in gltf.get("buffers", [])):
+            raise ValueError(f"{glb_file_path} references external buffers, only self-contained GLB files can be merged")
+        name = sanitize_node_name(os.path.splitext(os.path.basename(glb_file_path))[0])
+        nodes = gltf.get("nodes", [])
+        mesh_nodes = [node for node in nodes if "mesh" in node]
+        for node in nodes:
+            if mesh_nodes and node is mesh_nodes[0]:
+                node["name"] = name
+            elif node.get("name"):
+                node["name"] = f"{name}_{node['name']}"
+
+        _remap(gltf, offsets, len(binary))
+        binary += chunk
+        # Accessors of the next file must start on a 4 byte boundary again.
+        binary += b"\0" * (-len(binary) % 4)
+
+        scene = gltf.get("scenes", [{}])[gltf.get("scene", 0)] if gltf.get("scenes") else {}
+        roots.extend(root + offsets["nodes"] for root in scene.get("nodes", range(len(nodes))))
+        for key in MERGED_ARRAYS:
+            entries = gltf.get(key, [])
+            atlas.setdefault(key, []).extend(entries)
+            offsets[key] += len(entries)
+        for key in extensions:
+            extensions[key].update(gltf.get(key, []))
+        node_names.append(name)
+
+    atlas = {key: value for key, value in atlas.items() if value}
+    atlas["buffers"] = [{"byteLength": len(binary)}]
+    atlas["scenes"] = [{"nodes": roots}]
+    atlas["scene"] = 0
+    for key, value in extensions.items():
+        if value:
+            atlas[key] = sorted(value)
+    return (atlas, bytes(binary)), node_names
+
+
+def build_atlas(visual_dir, atlas_name, write_modules=False, scale=None, rotation=None):
+    """
+    Merges every .glb in visual_dir (levels of detail excluded) into visual_dir/<atlas_name>.glb.
+
+    Parameters:
+    - visual_dir: The directory of the per-mesh .glb files written by StlToGlb.py.
+    - atlas_name: File name of the atlas without extension. Also the import name in the modules, so it must be a JS identifier.
+    - write_modules: Rewrite visual_dir/<mesh>.js to load the mesh's node from the atlas instead of <mesh>.glb.
+    - scale, rotation: Passed on to the modules, as in JSXToJS.py.
+
+    Returns the node names in the atlas.
+    """
+    # The same files GlbToJS.py writes modules for.
+    glb_files = sorted(glb_file_path for glb_file_path in find_files(visual_dir, recursive=False)
+                       if glb_file_path.endswith(".glb") and not is_lod_file(glb_file_path)
+                       and os.path.splitext(os.path.basename(glb_file_path))[0] != atlas_name)
+    (gltf, binary), node_names = merge_glbs(glb_files)
+    atlas_path = os.path.join(visual_dir, atlas_name + ".glb")
+    write_glb(gltf, binary, atlas_path)
+    input_bytes = sum(os.path.getsize(glb_file_path) for glb_file_path in glb_files)
+    print(f"Merged {len(glb_files)} GLB files ({input_bytes:,} bytes) into {atlas_path} ({os.path.getsize(atlas_path):,} bytes)")
+
+    if write_modules:
+        for glb_file_path, node_name in zip(glb_files, node_names):
+            # The module keeps the name GlbToJS.py gave it (and MeshLookup.js imports), the
+            # node name is sanitized and may differ from the file name.
+            module_path = os.path.splitext(glb_file_path)[0] + ".js"
+            atomic_write(module_path, render_loader_module(atlas_name, node_name, scale, rotation))
+        print(f"Wrote {len(node_names)} loader modules that use {atlas_name}.glb")
+    return node_names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the per-mesh GLB files of a robot into one GLB atlas.")
+    parser.add_argument("visual_dir", type=str, help="Directory containing the .glb files, e.g. robot_name/visual.")
+    parser.add_argument("--name", type=str, default="atlas", help="File name of the atlas, without extension. Defaults to atlas.")
+    parser.add_argument("--modules", action="store_true",
+                        help="Rewrite the .js loader modules in visual_dir to load their mesh from the atlas.")
+    parser.add_argument("--scale", type=str, help="Scale in the format [x,y,z] for the .js modules.", default=None)
+    parser.add_argument("--rotation", type=str, help="Rotation in the format [x,y,z] for the .js modules.", default=None)
+    file_index.add_arguments(parser)
+    args = parser.parse_args()
+    file_index.configure(args.file_index)
+
+    if not os.path.isdir(args.visual_dir):
+        print(f"The folder '{args.visual_dir}' does not exist.")
+    else:
+        build_atlas(args.visual_dir, args.name, args.modules, args.scale, args.rotation)
@@ -0,0 +1,104 @@
+import re
+import json
+import mmap
+import struct
+
+from async_files import atomic_open
+
+# Binary glTF layout: https://registry.khronos.org/glTF/specs/2.0/glTF-2.0.html#glb-file-format-specification
+GLB_MAGIC = 0x46546C67  # "glTF"
+CHUNK_JSON = 0x4E4F534A  # "JSON"
+CHUNK_BIN = 0x004E4942  # "BIN\0"
+HEADER_SIZE = 12
+CHUNK_HEADER_SIZE = 8
+
+
+class GLBError(ValueError):
+    pass
+
+
+def read_glb_json(file_path):
+    """
+    Returns the parsed JSON chunk of a .glb file.
+
+    The file is memory-mapped and only the 12 byte header and the JSON chunk are read,
+    the binary buffer (vertex data) that follows is never touched.
+    """
+    with open(file_path, 'rb') as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise GLBError(f"{file_path} is empty")
+        with data:
+            if len(data) < HEADER_SIZE + CHUNK_HEADER_SIZE:
+                raise GLBError(f"{file_path} is too short to be a GLB file")
+            magic, version, length = struct.unpack_from('<III', data, 0)
+            if magic != GLB_MAGIC:
+                raise GLBError(f"{file_path} is not a GLB file")
+            if version != 2:
+                raise GLBError(f"{file_path} is GLB version {version}, only version 2 is supported")
+            chunk_length, chunk_type = struct.unpack_from('<II', data, HEADER_SIZE)
+            if chunk_type != CHUNK_JSON:
+                raise GLBError(f"{file_path} does not start with a JSON chunk")
+            start = HEADER_SIZE + CHUNK_HEADER_SIZE
+            return json.loads(data[start:start + chunk_length])
+
+
+def read_glb(file_path):
+    """
+    Returns the parsed JSON chunk and the binary chunk (b"" when there is none) of a .glb file.
+    """
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    if len(data) < HEADER_SIZE + CHUNK_HEADER_SIZE:
+        raise GLBError(f"{file_path} is too short to be a GLB file")
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise GLBError(f"{file_path} is not a version 2 GLB file")
+    gltf, binary = None, b""
+    offset = HEADER_SIZE
+    while offset + CHUNK_HEADER_SIZE <= min(length, len(data)):
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        chunk = data[offset + CHUNK_HEADER_SIZE:offset + CHUNK_HEADER_SIZE + chunk_length]
+        if chunk_type == CHUNK_JSON and gltf is None:
+            gltf = json.loads(chunk)
+        elif chunk_type == CHUNK_BIN and not binary:
+            binary = chunk
+        offset += CHUNK_HEADER_SIZE + chunk_length
+    if gltf is None:
+        raise GLBError(f"{file_path} has no JSON chunk")
+    return gltf, binary
+
+
+def write_glb(gltf, binary, file_path):
+    # Chunks are padded to 4 bytes, the JSON chunk with spaces and the binary chunk with zeros.
+    # Written through atomic_open, so a crash never leaves a truncated GLB behind.
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+    length = HEADER_SIZE + CHUNK_HEADER_SIZE + len(json_chunk) + (CHUNK_HEADER_SIZE + len(binary) if binary else 0)
+    with atomic_open(file_path, 'wb') as file:
+        file.write(struct.pack('<III', GLB_MAGIC, 2, length))
+        file.write(struct.pack('<II', len(json_chunk), CHUNK_JSON))
+        file.write(json_chunk)
+        if binary:
+            file.write(struct.pack('<II', len(binary), CHUNK_BIN))
+            file.write(binary)
+
+
+def sanitize_node_name(name):
+    # Same as three.js PropertyBinding.sanitizeNodeName, which names the entries of useGLTF's nodes.
+    return re.sub(r"[\[\]\.:\/]", "", re.sub(r"\s", "_", name))
+
+
+def mesh_node_names(gltf):
+    """
+    Returns the names of the nodes that carry a mesh, in document order, as useGLTF
+    exposes them in `nodes`.
+    """
+    return [sanitize_node_name(node["name"]) for node in gltf.get("nodes", [])
+            if "mesh" in node and node.get("name")]
+
+
+def mesh_names(gltf):
+    return [mesh.get("name", "") for mesh in gltf.get("meshes", [])]
@@ -0,0 +1,94 @@
+// Batch driver for GlbToJSX.py: converts many .glb files with one Node process, so Node
+// startup and gltfjsx module loading are paid once per run instead of once per file.
+//
+// Reads {"jobs": [[input, output], ...], "modulePaths": [...]} as JSON on stdin and writes one
+// result line per job to stdout, prefixed with RESULT_PREFIX so gltfjsx log output can't be
+// mistaken for a result.
+import { createRequire } from 'module'
+import { pathToFileURL } from 'url'
+import path from 'path'
+
+const RESULT_PREFIX = '@@gltfjsx-result '
+
+// The same defaults the gltfjsx command line uses when no flags are given.
+const DEFAULT_OPTIONS = {
+  types: false,
+  keepnames: false,
+  keepmeshes: false,
+  keepmaterials: false,
+  keepattributes: false,
+  keepgroups: false,
+  bones: false,
+  meta: false,
+  shadows: false,
+  printwidth: 1000,
+  precision: 3,
+  draco: undefined,
+  root: undefined,
+  instance: false,
+  instanceall: false,
+  transform: false,
+  resolution: 1024,
+  degrade: '',
+  degraderesolution: 512,
+  simplify: false,
+  ratio: 0.75,
+  error: 0.001,
+  console: false,
+  debug: false,
+  timeout: 0,
+  delay: 1,
+}
+
+async function readStdin() {
+  const chunks = []
+  for await (const chunk of process.stdin) chunks.push(chunk)
+  return JSON.parse(Buffer.concat(chunks).toString('utf8'))
+}
+
+async function loadGltfjsx(modulePaths) {
+  const require = createRequire(import.meta.url)
+  const packageJson = require.resolve('gltfjsx/package.json', { paths: [process.cwd(), ...modulePaths] })
+  const packageDir = path.dirname(packageJson)
+  const { main } = require(packageJson)
+  // cli.js imports the converter from src/gltfjsx.js, fall back to it if main is not set.
+  const entry = path.join(packageDir, main || 'src/gltfjsx.js')
+  const module = await import(pathToFileURL(entry).href)
+  return module.default
+}
+
+function report(result) {
+  process.stdout.write(RESULT_PREFIX + JSON.stringify(result) + '\n')
+}
+
+function errorMessage(e) {
+  return String(e && e.message ? e.message : e)
+}
+
+const { jobs, modulePaths = [] } = await readStdin()
+let gltfjsx = null
+let loadError = null
+try {
+  gltfjsx = await loadGltfjsx(modulePaths)
+} catch (e) {
+  loadError = `could not load gltfjsx: ${errorMessage(e).split("\n")[0]}`
+  process.exitCode = 1
+}
+
+for (const [input, output] of jobs) {
+  if (loadError) {
+    // Without gltfjsx no file can be converted, report the cause for every one of them.
+    report({ source: input, output, ok: false, error: loadError, seconds: 0 })
+    continue
+  }
+  const header = `Auto-generated by: https://github.com/pmndrs/gltfjsx\nCommand: npx gltfjsx ${input} -o ${output}`
+  // seconds is the time gltfjsx spent on the file, for GlbToJSX.py --trace.
+  const start = performance.now()
+  try {
+    await gltfjsx(input, output, { ...DEFAULT_OPTIONS, header, log: (...args) => console.error(...args) })
+    report({ source: input, output, ok: true, error: null, seconds: (performance.now() - start) / 1000 })
+  } catch (e) {
+    // One broken file should not stop the rest of the batch.
+    report({ source: input, output, ok: false, error: errorMessage(e), seconds: (performance.now() - start) / 1000 })
+  }
+}
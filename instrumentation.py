@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import threading
+from contextlib import contextmanager
+
+# Child processes (Blender workers, parser pool processes) inherit these, so a whole run,
+# subprocesses included, traces into one file.
+TRACE_ENV = "MESH_PIPELINE_TRACE"
+RUN_ENV = "MESH_PIPELINE_RUN"
+
+_lock = threading.Lock()
+_state = {"trace": None, "run": None, "profiler": None, "profile_path": None, "summary": False}
+
+
+def script_name():
+    return os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+
+
+def configure(trace_path=None, profile_path=None, summary=True):
+    """
+    Turns instrumentation on for this process and the processes it starts.
+
+    Parameters:
+    - trace_path: Append one JSON object per line to this file for every timed phase.
+      Defaults to the file named by the MESH_PIPELINE_TRACE environment variable.
+    - profile_path: Run this process under cProfile and write the stats here at exit
+      (read them with python -m pstats).
+    - summary: Print the slowest files of the run at exit.
+    """
+    trace_path = trace_path or os.environ.get(TRACE_ENV)
+    if trace_path and _state["trace"] is None:
+        os.environ[TRACE_ENV] = os.path.abspath(trace_path)
+        os.environ.setdefault(RUN_ENV, uuid.uuid4().hex[:12])
+        _state["run"] = os.environ[RUN_ENV]
+        _state["trace"] = open(trace_path, 'a', buffering=1)
+        _state["summary"] = summary
+        atexit.register(finish)
+    if profile_path and _state["profiler"] is None:
+        import cProfile
+        _state["profiler"] = cProfile.Profile()
+        _state["profile_path"] = profile_path
+        _state["profiler"].enable()
+        atexit.register(finish)
+
+
+def enabled():
+    return _state["trace"] is not None
+
+
+def _write(record):
+    with _lock:
+        _state["trace"].write(json.dumps(record) + "\n")
+
+
+def event(name, file=None, duration_s=None, **fields):
+    """
+    Records one event, e.g. a phase timed somewhere else (inside Node).
+    """
+    if not enabled():
+        return
+    record = {"time": time.time(), "run": _state["run"], "pid": os.getpid(), "script": script_name(), "phase": name}
+    if file is not None:
+        record["file"] = file
+    if duration_s is not None:
+        record["duration_s"] = duration_s
+    record.update(fields)
+    _write(record)
+
+
+@contextmanager
+def phase(name, file=None, **fields):
+    """
+    Times the body as one phase, e.g. with phase("gltf_export", glb_file_path): ...
+    The event is written when the body ends, with ok set to False when it raised.
+    """
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        event(name, file, time.perf_counter() - start, ok=ok, **fields)
+
+
+def read_trace(trace_path, run=None):
+    # The records of one run (all runs when run is None) in a trace file.
+    records = []
+    with open(trace_path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if run is None or record.get("run") == run:
+                records.append(record)
+    return records
+
+
+def print_summary(records, top=10):
+    """
+    Prints the total time of every phase and the top slowest files, with the phases
+    each file spent its time in.
+    """
+    timed = [record for record in records if "duration_s" in record]
+    if not timed:
+        return
+    phases, files = {}, {}
+    for record in timed:
+        phases[record["phase"]] = phases.get(record["phase"], 0) + record["duration_s"]
+        if "file" in record:
+            breakdown = files.setdefault(record["file"], {})
+            breakdown[record["phase"]] = breakdown.get(record["phase"], 0) + record["duration_s"]
+    print("Time per phase:")
+    for name, total in sorted(phases.items(), key=lambda item: -item[1]):
+        print(f"  {name:<24}{total:>10.3f} s")
+    if files:
+        print(f"Slowest {min(top, len(files))} of {len(files)} files:")
+        for file, breakdown in sorted(files.items(), key=lambda item: -sum(item[1].values()))[:top]:
+            detail = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in sorted(breakdown.items(), key=lambda item: -item[1]))
+            print(f"  {sum(breakdown.values()):>8.3f} s  {file}  ({detail})")
+
+
+def run_records():
+    # Everything this run traced so far, including the records of child processes.
+    if not enabled():
+        return []
+    _state["trace"].flush()
+    return read_trace(os.environ[TRACE_ENV], _state["run"])
+
+
+def finish():
+    """
+    Writes the profile and prints the summary. Runs at exit, calling it earlier is harmless.
+    """
+    if _state["profiler"] is not None:
+        _state["profiler"].disable()
+        _state["profiler"].dump_stats(_state["profile_path"])
+        print(f"Profile written to {_state['profile_path']}")
+        _state["profiler"] = None
+    if _state["trace"] is not None:
+        if _state["summary"]:
+            # Read back from the file to include what child processes traced.
+            print_summary(run_records())
+        _state["trace"].close()
+        _state["trace"] = None
+
+
+def child_arguments():
+    # The --trace option for a script this process starts, so it traces into the same file.
+    return ["--trace", os.environ[TRACE_ENV]] if enabled() else []
+
+
+def add_arguments(parser):
+    # The --trace and --profile options every script takes.
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Append per-file, per-phase timing events to this JSON lines file and print the slowest files at the end.")
+    parser.add_argument("--profile", type=str, default=None, help="Run under cProfile and write the stats to this file.")
+
+
+# Processes started by an instrumented script trace into the same file. The script that
+# started the run prints the summary.
+if os.environ.get(TRACE_ENV):
+    configure(summary=RUN_ENV not in os.environ)
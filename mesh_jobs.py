@@ -0,0 +1,324 @@
+import os
+import re
+import sys
+import json
+import hashlib
+
+from file_index import walk
+
+# Extensions each Blender conversion script picks up while walking the mesh tree.
+STL_EXTENSIONS = (".stl", ".dae")
+DAE_EXTENSIONS = (".dae",)
+
+# Keyword arguments for bpy.ops.export_scene.gltf. They are stored in the build manifest,
+# so changing them here makes the next run reconvert every mesh.
+EXPORT_SETTINGS = {"export_format": "GLB"}
+
+# --compression profiles: extra exporter settings, and the distance below which vertices are
+# merged before export (None keeps the imported mesh as it is). CAD meshes carry no UVs or
+# vertex colors worth keeping, so every profile past "none" drops them. Settings the running
+# Blender version does not know are skipped by the conversion scripts.
+COMPRESSION_PROFILES = {
+    "none": {"export": {}, "merge_distance": None},
+    "dedup": {
+        "export": {"export_texcoords": False, "export_colors": False, "export_vertex_color": "NONE"},
+        "merge_distance": 1e-6,
+    },
+    "draco": {
+        "export": {"export_texcoords": False, "export_colors": False, "export_vertex_color": "NONE",
+                   "export_draco_mesh_compression_enable": True,
+                   "export_draco_mesh_compression_level": 6,
+                   "export_draco_position_quantization": 14,
+                   "export_draco_normal_quantization": 10},
+        "merge_distance": 1e-6,
+    },
+}
+
+# Levels of detail: x.glb is level 0, the decimated levels are written next to it as
+# x_lod1.glb, x_lod2.glb, ...
+LOD_PATTERN = re.compile(r"^(.*)_lod(\d+)$")
+
+# The build manifest lives in the root of the output tree.
+MANIFEST_NAME = ".glb_manifest.json"
+MANIFEST_VERSION = 1
+
+# A Blender script started with --serve marks the line answering each request with this, to
+# tell it apart from what Blender and the importers print.
+SERVE_RESULT_PREFIX = "@@blender-result "
+
+
+def collect_mesh_jobs(source_folder, output_folder, extensions):
+    """
+    Walks source_folder and pairs every mesh file with the .glb path it converts to.
+
+    The output tree mirrors the source tree, so this gives the same paths the serial
+    Blender scripts have always written to. The order is the os.walk order.
+
+    Parameters:
+    - source_folder: The directory to search for mesh files.
+    - output_folder: The directory the .glb files are written to.
+    - extensions: Lower-case file extensions to convert, e.g. (".stl", ".dae").
+    """
+    jobs = []
+    for root, dirs, files in walk(source_folder):
+        for file in files:
+            if file.lower().endswith(extensions):
+                relative_dir = os.path.relpath(root, source_folder)
+                output_dir = os.path.join(output_folder, relative_dir)
+                export_name = os.path.splitext(file)[0] + '.glb'
+                jobs.append((os.path.join(root, file), os.path.join(output_dir, export_name)))
+    return jobs
+
+
+def parse_lod_budgets(text):
+    """
+    Parses a --lod value such as "1.0,0.25,0.05", one triangle budget per level of detail.
+    A budget up to 1 is a fraction of the imported triangles, a larger one is a maximum
+    triangle count.
+    """
+    budgets = [float(budget) for budget in text.split(",") if budget.strip()]
+    if not budgets or any(budget <= 0 for budget in budgets):
+        raise ValueError(f"invalid LOD budgets '{text}', expected positive numbers such as 1.0,0.25,0.05")
+    return budgets
+
+
+def lod_output_path(glb_file_path, level):
+    if level == 0:
+        return glb_file_path
+    stem, extension = os.path.splitext(glb_file_path)
+    return f"{stem}_lod{level}{extension}"
+
+
+def split_lod_name(name):
+    # "base_link_lod2" -> ("base_link", 2), "base_link" -> ("base_link", 0)
+    match = LOD_PATTERN.match(name)
+    if match:
+        return match.group(1), int(match.group(2))
+    return name, 0
+
+
+def export_settings(compression="none"):
+    # Keyword arguments for bpy.ops.export_scene.gltf with a compression profile.
+    return dict(EXPORT_SETTINGS, **COMPRESSION_PROFILES[compression]["export"])
+
+
+def conversion_settings(lod_budgets=None, compression="none"):
+    """
+    The settings recorded in the build manifest: the exporter settings of the compression
+    profile, plus the vertex merge distance and the LOD budgets when they are used, so
+    changing any of them reconverts everything.
+    """
+    settings = export_settings(compression)
+    merge_distance = COMPRESSION_PROFILES[compression]["merge_distance"]
+    if merge_distance is not None:
+        settings["merge_distance"] = merge_distance
+    if lod_budgets and list(lod_budgets) != [1.0]:
+        settings["lod_budgets"] = list(lod_budgets)
+    return settings
+
+
+def serve_requests(convert_jobs):
+    """
+    The --serve loop of the Blender scripts. Reads one JSON request per line from stdin,
+    {"jobs": [[source, output], ...], "lod": [1.0, ...], "compression": "none"}, converts
+    it with convert_jobs(jobs, lod, compression) and answers with one line holding the
+    results, marked with SERVE_RESULT_PREFIX. Returns when stdin is closed.
+    """
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        results = convert_jobs([tuple(job) for job in request["jobs"]], request.get("lod", [1.0]),
+                               request.get("compression", "none"))
+        sys.stdout.write(SERVE_RESULT_PREFIX + json.dumps(results) + "\n")
+        sys.stdout.flush()
+
+
+def read_job_list(file_path):
+    with open(file_path, 'r') as file:
+        return [tuple(job) for job in json.load(file)]
+
+
+def write_job_list(jobs, file_path):
+    with open(file_path, 'w') as file:
+        json.dump([list(job) for job in jobs], file)
+
+
+def write_report(results, file_path):
+    with open(file_path, 'w') as file:
+        json.dump(results, file, indent=4)
+
+
+def read_report(file_path):
+    with open(file_path, 'r') as file:
+        return json.load(file)
+
+
+def print_report(results):
+    failed = [result for result in results if not result["ok"]]
+    print(f"{len(results) - len(failed)} of {len(results)} meshes converted successfully.")
+    for result in failed:
+        print(f"  FAILED {result['source']}: {result['error']}")
+
+
+def print_size_report(results):
+    """
+    Prints the size of every converted source mesh against the GLBs written for it
+    (all levels of detail included), and the totals.
+    """
+    total_input = total_output = 0
+    for result in results:
+        if not result["ok"]:
+            continue
+        outputs = [result["output"]] + result.get("lods", [])
+        input_bytes = os.path.getsize(result["source"])
+        output_bytes = sum(os.path.getsize(output) for output in outputs if os.path.exists(output))
+        total_input += input_bytes
+        total_output += output_bytes
+        print(f"  {os.path.basename(result['source'])}: {input_bytes:,} -> {output_bytes:,} bytes"
+              f" ({100 * output_bytes / max(input_bytes, 1):.1f}%)")
+    if total_input:
+        print(f"Total: {total_input:,} -> {total_output:,} bytes ({100 * total_output / total_input:.1f}%)")
+
+
+def file_hash(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _stat_key(file_path):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _hash_with_hint(file_path, entry):
+    # Only re-hash a file when its size or mtime moved since the manifest was written.
+    size, mtime_ns = _stat_key(file_path)
+    if entry and entry.get("size") == size and entry.get("mtime_ns") == mtime_ns:
+        return entry["hash"]
+    return file_hash(file_path)
+
+
+def _file_record(file_path, file_hash_value=None):
+    size, mtime_ns = _stat_key(file_path)
+    return {"hash": file_hash_value or file_hash(file_path), "size": size, "mtime_ns": mtime_ns}
+
+
+def load_manifest(output_folder):
+    """
+    Loads the build manifest of output_folder. Source and output paths in it are relative
+    to output_folder, so the whole workspace can be moved without invalidating it.
+    """
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "entries": {}}
+
+
+def save_manifest(manifest, output_folder):
+    os.makedirs(output_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(temp_path, manifest_path)
+
+
+def _manifest_key(file_path, output_folder):
+    return os.path.relpath(os.path.abspath(file_path), output_folder).replace("\\", "/")
+
+
+def _output_is_current(output_file_path, record):
+    if record is None or not os.path.exists(output_file_path):
+        return False
+    return _hash_with_hint(output_file_path, record) == record["hash"]
+
+
+def filter_stale_jobs(jobs, manifest, output_folder, settings=EXPORT_SETTINGS):
+    """
+    Returns the jobs that need converting: new or edited sources, sources whose exporter
+    settings changed, and sources whose output is missing or was modified since.
+    """
+    stale = []
+    for source_file_path, glb_file_path in jobs:
+        entry = manifest["entries"].get(_manifest_key(source_file_path, output_folder))
+        if entry is None or entry["settings"] != settings:
+            stale.append((source_file_path, glb_file_path))
+            continue
+        if _hash_with_hint(source_file_path, entry["source"]) != entry["source"]["hash"]:
+            stale.append((source_file_path, glb_file_path))
+            continue
+        # Every output of the entry (the GLB and its levels of detail) must still be current.
+        outputs = entry["outputs"]
+        if _manifest_key(glb_file_path, output_folder) not in outputs or not all(
+                _output_is_current(os.path.join(output_folder, output_key), record)
+                for output_key, record in outputs.items()):
+            stale.append((source_file_path, glb_file_path))
+    return stale
+
+
+def update_manifest(manifest, results, output_folder, settings=EXPORT_SETTINGS):
+    """
+    Records the conversion results. Failed conversions are dropped from the manifest so
+    the next run tries them again. Outputs a source no longer produces (e.g. a level of
+    detail that was removed from the budgets) are deleted.
+    """
+    for result in results:
+        key = _manifest_key(result["source"], output_folder)
+        if not result["ok"]:
+            manifest["entries"].pop(key, None)
+            continue
+        outputs = {_manifest_key(output, output_folder): _file_record(output)
+                   for output in [result["output"]] + result.get("lods", [])}
+        previous = manifest["entries"].get(key)
+        for output_key in (previous["outputs"] if previous else ()):
+            output_file_path = os.path.join(output_folder, output_key)
+            if output_key not in outputs and os.path.exists(output_file_path):
+                os.remove(output_file_path)
+        manifest["entries"][key] = {
+            "source": _file_record(result["source"]),
+            "settings": settings,
+            "outputs": outputs,
+        }
+
+
+def remove_deleted_outputs(manifest, output_folder):
+    """
+    Deletes the outputs of every manifest entry whose source file no longer exists.
+    Returns the removed output paths.
+    """
+    removed = []
+    for key in list(manifest["entries"]):
+        if os.path.exists(os.path.join(output_folder, key)):
+            continue
+        for output_key in manifest["entries"].pop(key)["outputs"]:
+            output_file_path = os.path.join(output_folder, output_key)
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+                removed.append(output_file_path)
+    return removed
+
+
+def convert_with_cache(jobs, output_folder, convert, force=False, settings=EXPORT_SETTINGS):
+    """
+    Runs convert(stale_jobs) on the jobs whose outputs are out of date and keeps the build
+    manifest of output_folder in sync. With force=True every job is converted again.
+    Returns the conversion results of the jobs that were run.
+    """
+    manifest = load_manifest(output_folder)
+    for removed in remove_deleted_outputs(manifest, output_folder):
+        print(f"Removed {removed}, its source was deleted")
+    stale = list(jobs) if force else filter_stale_jobs(jobs, manifest, output_folder, settings)
+    print(f"{len(jobs) - len(stale)} of {len(jobs)} meshes are up to date, converting {len(stale)}.")
+    results = convert(stale) if stale else []
+    update_manifest(manifest, results, output_folder, settings)
+    save_manifest(manifest, output_folder)
+    return results
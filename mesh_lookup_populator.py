@@ -1,66 +1,266 @@
 import os
-import sys
-import xml.etree.ElementTree as ET
+import json
+import argparse
+
+from urdf_document import load_document
+from asset_store import load_index, alias_index, asset_for_mesh
+from glb_reader import read_glb_json, mesh_node_names, sanitize_node_name
+from GlbToJS import find_lod_files
+import instrumentation
+from instrumentation import phase
+import file_index
+from file_index import walk
+from async_files import atomic_open, read_files
 
 
 def parse_urdf_for_meshes(parent_directory):
     all_mesh_filenames = []
 
     # Walk through all directories within the given parent directory
-    for dir_root, dirs, files in os.walk(parent_directory):
+    for dir_root, dirs, files in walk(parent_directory):
         for file in files:
             if file.endswith('.urdf') or file.endswith('.xacro'):
                 urdf_file_path = os.path.join(dir_root, file)  # Use 'dir_root' for directory root
-                tree = ET.parse(urdf_file_path)
-                xml_root = tree.getroot()  # Use 'xml_root' for XML root element
-
-                # Find all mesh filenames in the current URDF file
-                for mesh in xml_root.findall(".//mesh"):
-                    filename_attr = mesh.get('filename')
-                    if filename_attr:
-                        all_mesh_filenames.append(filename_attr)
+                # Shares the parsed tree with urdf_parser.py when both run in the same process
+                with phase("parse_urdf", urdf_file_path):
+                    all_mesh_filenames.extend(load_document(urdf_file_path).mesh_filenames)
 
     return all_mesh_filenames
 
-def scan_and_generate_imports(directory, urdf_directory):
+def normalize_mesh_name(path):
+    # "package://p_grip_description/meshes/p_grip_2F/Back_Cover.STL" -> "back_cover"
+    file_name = path.replace("\\", "/").rsplit("/", 1)[-1]
+    return os.path.splitext(file_name)[0].casefold()
+
+def build_mesh_index(mesh_filenames):
+    """
+    Groups the URDF mesh filenames by normalized name, so a loader module can be matched
+    to its meshes with one dictionary lookup.
+    """
+    mesh_index = {}
+    for mesh_filename in dict.fromkeys(mesh_filenames):
+        mesh_index.setdefault(normalize_mesh_name(mesh_filename), []).append(mesh_filename)
+    return mesh_index
+
+def report_ambiguities(matched_modules, mesh_index):
+    for name, import_paths in matched_modules.items():
+        if len(import_paths) > 1:
+            print(f"Ambiguous mesh name '{name}': {len(import_paths)} modules match {mesh_index[name]}, using {import_paths[0]}")
+            for import_path in import_paths[1:]:
+                print(f"  ignored {import_path}")
+        elif len({mesh_filename.rsplit("/", 1)[0] for mesh_filename in mesh_index[name]}) > 1:
+            print(f"Ambiguous mesh name '{name}': meshes from different directories {mesh_index[name]} all use {import_paths[0]}")
+
+def scan_and_generate_imports(directory, urdf_directory, bundle=False, preload=(), scale=None, rotation=None, atlas=None):
+    """
+    Writes MeshLookup.js for the loader modules in directory/visual. With bundle=True a
+    single lazy module is written instead, see write_bundled_lookup. atlas is the name of
+    a GLB atlas in directory/visual (see glb_atlas.py) the bundled loaders read every mesh from.
+    """
     subdirs = ["visual"] # removed collision for now
     imports = []
     mesh_lookup_dict = {}
+    # import name -> (import path, local path) of every module
+    modules = {}
 
     # Parse the URDF file to get mesh filenames
-    mesh_filenames = parse_urdf_for_meshes(urdf_directory)
+    mesh_index = build_mesh_index(parse_urdf_for_meshes(urdf_directory))
+    # normalized name -> import paths of every module with that name, the first one is used
+    matched_modules = {}
 
     for subdir in subdirs:
         subdir_path = os.path.join(directory, subdir)
         if os.path.isdir(subdir_path):
-            for root, dirs, files in os.walk(subdir_path):
+            for root, dirs, files in walk(subdir_path):
                 for file in files:
                     if file.endswith(".js"):
                         relative_path = os.path.relpath(os.path.join(root, file), directory)
                         import_name = os.path.splitext(file)[0]
                         import_path = f"./MeshLoaders/{directory}/{relative_path}".replace("\\", "/")
                         imports.append(f'import {import_name} from "{import_path}"')
-                        # Add to mesh_lookup_dict if the import_name matches any in mesh_filenames
-                        for mesh_filename in mesh_filenames:
-                            if import_name in mesh_filename:
-                                mesh_lookup_dict[mesh_filename] = import_name
+                        # The first module with a name is the one used, as in mesh_lookup_dict and report_ambiguities.
+                        modules.setdefault(import_name, (import_path, os.path.join(root, file)))
+                        # Add to mesh_lookup_dict the meshes whose file name is exactly import_name
+                        name = normalize_mesh_name(file)
+                        if name in mesh_index:
+                            matched_modules.setdefault(name, []).append(import_path)
+                            if len(matched_modules[name]) == 1:
+                                for mesh_filename in mesh_index[name]:
+                                    mesh_lookup_dict[mesh_filename] = import_name
+
+    report_ambiguities(matched_modules, mesh_index)
+    unmatched = [mesh_filename for name, mesh_filenames in mesh_index.items() if name not in matched_modules
+                 for mesh_filename in mesh_filenames]
+    if unmatched:
+        print(f"No mesh loader module found for {len(unmatched)} URDF meshes: {unmatched}")
 
+    with phase("write_lookup", os.path.join(directory, "MeshLookup.js"), bundle=bundle):
+        if bundle:
+            atlas_path = f"./MeshLoaders/{directory}/visual/{atlas}.glb".replace("\\", "/") if atlas else None
+            write_bundled_lookup(directory, modules, mesh_lookup_dict, preload, scale, rotation, atlas_path)
+        else:
+            write_mesh_lookup(directory, imports, mesh_lookup_dict)
+
+def write_mesh_lookup(directory, imports, mesh_lookup_dict):
     # Write imports and the mesh lookup dictionary to MeshLookup.js
-    with open(os.path.join(directory, "MeshLookup.js"), "w") as outfile:
+    with atomic_open(os.path.join(directory, "MeshLookup.js")) as outfile:
         outfile.writelines([f"{line}\n" for line in imports])
         outfile.write("\nconst MeshLookupTable = {\n")
         for key, value in mesh_lookup_dict.items():
             outfile.write(f'  "{key}": {value},\n')
         outfile.write("};\n")
-        outfile.write("\nconst MeshLookup = (path) => MeshLookupTable[path]();")
+        # props are passed to the loader module, e.g. MeshLookup(path, { lod: 1 }) picks a level of detail
+        outfile.write("\nconst MeshLookup = (path, props) => MeshLookupTable[path](props);")
         outfile.write("\nexport { MeshLookupTable, MeshLookup };")
 
+BUNDLE_HEADER = """/*
+Auto-generated by mesh_lookup_populator.py --bundle
+Nothing is fetched when this module loads: the .glb imports are URLs, and each mesh is
+loaded by useGLTF the first time its loader runs. Meshes listed in MeshPreload are
+fetched right away, call preloadMeshes(paths) to fetch others ahead of time.
+*/
+
+import { useGLTF } from '@react-three/drei';
+"""
+
+BUNDLE_FOOTER = """
+const preloadMeshes = (paths) => paths.forEach((path) => MeshLookupTable[path].preload());
+preloadMeshes(MeshPreload);
+
+const MeshLookup = (path, props) => MeshLookupTable[path](props);
+export { MeshLookupTable, MeshLookup, MeshPreload, preloadMeshes };"""
+
+def read_module_glb(local_path):
+    # (mesh node names, level of detail paths) of the .glb next to a per-mesh module.
+    glb_file_path = os.path.splitext(local_path)[0] + ".glb"
+    try:
+        node_names = mesh_node_names(read_glb_json(glb_file_path))
+    except (OSError, ValueError) as e:
+        print(f"Error reading {glb_file_path}: {e}")
+        node_names = []
+    return node_names, find_lod_files(glb_file_path)
+
+def write_bundled_lookup(directory, modules, mesh_lookup_dict, preload=(), scale=None, rotation=None, atlas_path=None):
+    """
+    Writes MeshLookup.js as one module holding a lazy loader per mesh, in place of importing
+    every per-mesh module (each of which preloads its mesh as soon as it is imported).
+
+    Parameters:
+    - directory: MeshLookup.js is written here.
+    - modules: Import name -> (import path, local path) of the per-mesh modules. The .glb next
+      to each module (and its levels of detail) is used, the module itself is not imported.
+    - mesh_lookup_dict: URDF mesh filename -> import name.
+    - preload: URDF mesh filenames or mesh names (file names without extension, any case) to fetch as soon as the module loads.
+    - scale, rotation: Optional "[x,y,z]" strings added to the returned mesh description, as in JSXToJS.py.
+    - atlas_path: Import path of a GLB atlas built by glb_atlas.py. Every mesh is then read from
+      the atlas node named after its module, so the whole robot is one fetch and one parse.
+    """
+    imports = []
+    loaders = []
+    if atlas_path:
+        imports.append(f'import atlas from "{atlas_path}"')
+    import_names = list(dict.fromkeys(mesh_lookup_dict.values()))
+    # The GLB headers and levels of detail of every module, read concurrently.
+    glb_files = {} if atlas_path else dict(zip(import_names, read_files(import_names, lambda import_name: read_module_glb(modules[import_name][1]))))
+    for import_name in import_names:
+        if atlas_path:
+            loaders.append(f"const {import_name}_mesh = lazyMesh([atlas], {json.dumps(sanitize_node_name(import_name))});")
+            continue
+        import_path, local_path = modules[import_name]
+        node_names, lod_file_paths = glb_files[import_name]
+        # Blender names the mesh node after the imported file, as in GlbToJS.py
+        node_name = node_names[0] if node_names else import_name
+        urls = [import_name]
+        imports.append(f'import {import_name} from "{os.path.splitext(import_path)[0]}.glb"')
+        for lod_file_path in lod_file_paths:
+            lod_name = os.path.splitext(os.path.basename(lod_file_path))[0]
+            urls.append(lod_name)
+            imports.append(f'import {lod_name} from "{os.path.dirname(import_path)}/{lod_name}.glb"')
+        loaders.append(f"const {import_name}_mesh = lazyMesh([{', '.join(urls)}], {json.dumps(node_name)});")
+
+    additional_properties = ""
+    if scale:
+        additional_properties += f", scale: {scale}"
+    if rotation:
+        additional_properties += f", rotation: {rotation}"
+    preload = {name.casefold() for name in preload}
+    preloaded = [mesh_filename for mesh_filename in mesh_lookup_dict
+                 if mesh_filename.casefold() in preload or normalize_mesh_name(mesh_filename) in preload]
+
+    with atomic_open(os.path.join(directory, "MeshLookup.js")) as outfile:
+        outfile.write(BUNDLE_HEADER)
+        outfile.writelines([f"{line}\n" for line in imports])
+        outfile.write(f"""
+// A loader for one mesh, called like the per-mesh modules: props.lod picks a level of detail.
+const lazyMesh = (urls, node) => {{
+  const loader = (props) => {{
+    const {{ nodes }} = useGLTF(urls[Math.min(props?.lod ?? 0, urls.length - 1)]);
+    return [{{type:'raw', geometry: nodes[node].geometry, material: nodes[node].material{additional_properties}}}];
+  }};
+  loader.preload = () => useGLTF.preload(urls[0]);
+  return loader;
+}};
+
+""")
+        outfile.writelines([f"{line}\n" for line in loaders])
+        outfile.write("\nconst MeshLookupTable = {\n")
+        for key, value in mesh_lookup_dict.items():
+            outfile.write(f'  "{key}": {value}_mesh,\n')
+        outfile.write("};\n")
+        outfile.write(f"\nconst MeshPreload = {json.dumps(preloaded)};\n")
+        outfile.write(BUNDLE_FOOTER)
+    print(f"Bundled {len(loaders)} lazy mesh loaders into {os.path.join(directory, 'MeshLookup.js')}, preloading {len(preloaded)} meshes.")
+
+def scan_store_and_generate_imports(directory, urdf_directory, store_dir, bundle=False, preload=(), scale=None, rotation=None):
+    """
+    Writes MeshLookup.js with every URDF mesh pointing at its asset in the shared store
+    built by asset_store.py. Meshes with identical content share one import.
+    """
+    aliases_by_name = alias_index(load_index(store_dir))
+    imports = {}
+    modules = {}
+    mesh_lookup_dict = {}
+    unmatched = []
+    for mesh_filename in dict.fromkeys(parse_urdf_for_meshes(urdf_directory)):
+        asset = asset_for_mesh(aliases_by_name, mesh_filename)
+        if asset is None:
+            unmatched.append(mesh_filename)
+            continue
+        imports.setdefault(asset, f'import {asset} from "./MeshLoaders/{store_dir}/{asset}.js"'.replace("\\", "/"))
+        modules[asset] = (f"./MeshLoaders/{store_dir}/{asset}.js".replace("\\", "/"), os.path.join(store_dir, asset + ".js"))
+        mesh_lookup_dict[mesh_filename] = asset
+    if unmatched:
+        print(f"No store asset found for {len(unmatched)} URDF meshes: {unmatched}")
+    print(f"{len(mesh_lookup_dict)} URDF meshes use {len(imports)} store assets.")
+    with phase("write_lookup", os.path.join(directory, "MeshLookup.js"), bundle=bundle):
+        if bundle:
+            write_bundled_lookup(directory, modules, mesh_lookup_dict, preload, scale, rotation)
+        else:
+            write_mesh_lookup(directory, list(imports.values()), mesh_lookup_dict)
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: mesh_lookup_pupolator.py <base_directory containing collision and visual folders> <urdf_directory>")
-        sys.exit(1)
-    
-    directory = sys.argv[1]
-    urdf_file = sys.argv[2]
-    scan_and_generate_imports(directory, urdf_file)
+    parser = argparse.ArgumentParser(description="Write MeshLookup.js, mapping the meshes of the URDF files to their loader modules.")
+    parser.add_argument("base_directory", type=str, help="Base directory containing the visual (and collision) folders. MeshLookup.js is written here.")
+    parser.add_argument("urdf_directory", type=str, help="Directory searched for .urdf and .xacro files.")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Point the meshes at the modules of this shared asset store (see asset_store.py) instead of base_directory/visual.")
+    parser.add_argument("--bundle", action="store_true",
+                        help="Write one module with a lazy loader per mesh instead of importing every per-mesh module, so only the meshes that are used get fetched.")
+    parser.add_argument("--preload", type=str, nargs="+", default=[],
+                        help="With --bundle, meshes (URDF filenames or names like base_link) fetched as soon as MeshLookup.js loads.")
+    parser.add_argument("--atlas", type=str, default=None,
+                        help="With --bundle, read every mesh from this GLB atlas in base_directory/visual (see glb_atlas.py), given without extension.")
+    parser.add_argument("--scale", type=str, help="With --bundle, scale in the format [x,y,z].", default=None)
+    parser.add_argument("--rotation", type=str, help="With --bundle, rotation in the format [x,y,z].", default=None)
+    instrumentation.add_arguments(parser)
+    file_index.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args.trace, args.profile)
+    file_index.configure(args.file_index)
 
+    if args.store:
+        scan_store_and_generate_imports(args.base_directory, args.urdf_directory, args.store,
+                                        args.bundle, args.preload, args.scale, args.rotation)
+    else:
+        scan_and_generate_imports(args.base_directory, args.urdf_directory,
+                                  args.bundle, args.preload, args.scale, args.rotation, args.atlas)
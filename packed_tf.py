@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+from array import array
+
+from async_files import atomic_write
+
+# Packed, little-endian counterpart of items_tf.json that the browser can map straight into
+# typed arrays. Layout (every section starts on a 4 byte boundary):
+#
+#   header            magic "UTFB", u32 version, u32 frameCount, u32 itemCount,
+#                     u32 stringCount, u32 stringBytes, 8 reserved bytes   (32 bytes)
+#   stringOffsets     u32[stringCount + 1], byte offsets into the string blob
+#   strings           UTF-8 blob, padded to 4 bytes
+#   frames (tfs)      i32 name[F], i32 parent[F], i32 parentName[F],
+#                     f32 position[F*3], f32 rotation[F*4] (w x y z), f32 scale[F*3]
+#   items             i32 name[I], i32 frame[I], i32 shape[I], u32 flags[I],
+#                     f32 position[I*3], f32 rotation[I*4] (w x y z), f32 scale[I*3], f32 color[I*4] (r g b a)
+#
+# name, parentName and shape index the string table (-1 for none). parent and frame index the
+# frames (-1 when the parent is not a frame, e.g. "world"). flags bit 0 is highlight, bit 1
+# is set when the item has a color.
+MAGIC = b"UTFB"
+VERSION = 1
+HEADER = struct.Struct('<4sIIIII8x')
+FLAG_HIGHLIGHT = 1
+FLAG_HAS_COLOR = 2
+LOADER_NAME = "ItemsTfLoader.js"
+
+
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _pad(data):
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _vector(value, keys):
+    return [float(value[key]) for key in keys]
+
+
+def pack_items_tf(data):
+    """
+    Returns the packed bytes of a {'tfs': ..., 'items': ...} dictionary as written by urdf_parser.py.
+    """
+    tfs, items = data['tfs'], data['items']
+    strings = {}
+
+    def string_index(value):
+        if value is None:
+            return -1
+        return strings.setdefault(value, len(strings))
+
+    frame_index = {name: index for index, name in enumerate(tfs)}
+    frame_names, parents, parent_names = array('i'), array('i'), array('i')
+    frame_positions, frame_rotations, frame_scales = array('f'), array('f'), array('f')
+    for name, tf in tfs.items():
+        frame_names.append(string_index(name))
+        parents.append(frame_index.get(tf['frame'], -1))
+        parent_names.append(string_index(tf['frame']))
+        frame_positions.extend(_vector(tf['position'], 'xyz'))
+        frame_rotations.extend(_vector(tf['rotation'], 'wxyz'))
+        frame_scales.extend(_vector(tf['scale'], 'xyz'))
+
+    item_names, item_frames, item_shapes, item_flags = array('i'), array('i'), array('i'), array('I')
+    item_positions, item_rotations, item_scales, item_colors = array('f'), array('f'), array('f'), array('f')
+    for name, item in items.items():
+        item_names.append(string_index(name))
+        item_frames.append(frame_index.get(item['frame'], -1))
+        item_shapes.append(string_index(item['shape']))
+        has_color = isinstance(item['color'], dict)
+        item_flags.append((FLAG_HIGHLIGHT if item['highlight'] else 0) | (FLAG_HAS_COLOR if has_color else 0))
+        item_positions.extend(_vector(item['position'], 'xyz'))
+        item_rotations.extend(_vector(item['rotation'], 'wxyz'))
+        item_scales.extend(_vector(item['scale'], 'xyz'))
+        item_colors.extend(_vector(item['color'], 'rgba') if has_color else [0.0, 0.0, 0.0, 0.0])
+
+    blob = bytearray()
+    offsets = array('I', [0])
+    for value in strings:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+
+    sections = [HEADER.pack(MAGIC, VERSION, len(tfs), len(items), len(strings), len(blob)),
+                _little_endian(offsets), _pad(bytes(blob))]
+    for values in (frame_names, parents, parent_names, frame_positions, frame_rotations, frame_scales,
+                   item_names, item_frames, item_shapes, item_flags,
+                   item_positions, item_rotations, item_scales, item_colors):
+        sections.append(_little_endian(values))
+    return b"".join(sections)
+
+
+def unpack_items_tf(packed):
+    """
+    Reads packed bytes back into the {'tfs': ..., 'items': ...} layout of items_tf.json,
+    with float32 precision.
+    """
+    magic, version, frame_count, item_count, string_count, string_bytes = HEADER.unpack_from(packed, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a packed items_tf file of a supported version")
+    offset = HEADER.size
+
+    def take(typecode, count):
+        nonlocal offset
+        values = array(typecode)
+        values.frombytes(packed[offset:offset + 4 * count])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        offset += 4 * count
+        return values
+
+    string_offsets = take('I', string_count + 1)
+    blob = packed[offset:offset + string_bytes]
+    offset += string_bytes + (-string_bytes % 4)
+    strings = [blob[string_offsets[i]:string_offsets[i + 1]].decode('utf-8') for i in range(string_count)]
+
+    def string(index):
+        return strings[index] if index >= 0 else None
+
+    frame_names, parents, parent_names = take('i', frame_count), take('i', frame_count), take('i', frame_count)
+    positions, rotations, scales = take('f', frame_count * 3), take('f', frame_count * 4), take('f', frame_count * 3)
+    tfs = {}
+    for i in range(frame_count):
+        tfs[string(frame_names[i])] = {
+            'frame': string(parent_names[i]),
+            'position': dict(zip('xyz', positions[i * 3:i * 3 + 3])),
+            'rotation': dict(zip('wxyz', rotations[i * 4:i * 4 + 4])),
+            'scale': dict(zip('xyz', scales[i * 3:i * 3 + 3])),
+        }
+
+    item_names, item_frames, item_shapes, item_flags = (take('i', item_count), take('i', item_count),
+                                                        take('i', item_count), take('I', item_count))
+    positions, rotations = take('f', item_count * 3), take('f', item_count * 4)
+    scales, colors = take('f', item_count * 3), take('f', item_count * 4)
+    items = {}
+    for i in range(item_count):
+        name = string(item_names[i])
+        items[name] = {
+            'shape': string(item_shapes[i]),
+            'name': name,
+            'frame': string(frame_names[item_frames[i]]) if item_frames[i] >= 0 else name,
+            'position': dict(zip('xyz', positions[i * 3:i * 3 + 3])),
+            'rotation': dict(zip('wxyz', rotations[i * 4:i * 4 + 4])),
+            'color': dict(zip('rgba', colors[i * 4:i * 4 + 4])) if item_flags[i] & FLAG_HAS_COLOR else "",
+            'scale': dict(zip('xyz', scales[i * 3:i * 3 + 3])),
+            'highlight': bool(item_flags[i] & FLAG_HIGHLIGHT),
+        }
+    return {'tfs': tfs, 'items': items}
+
+
+LOADER_SOURCE = """/*
+Auto-generated by packed_tf.py: loader for the packed items_tf file.
+Every array is a typed array view on the fetched buffer, nothing is parsed or copied.
+*/
+
+const MAGIC = 0x42465455; // "UTFB"
+
+export function parseItemsTf(buffer) {
+  const view = new DataView(buffer);
+  if (view.getUint32(0, true) !== MAGIC || view.getUint32(4, true) !== %(version)d) {
+    throw new Error("Not a packed items_tf file of version %(version)d");
+  }
+  const frameCount = view.getUint32(8, true);
+  const itemCount = view.getUint32(12, true);
+  const stringCount = view.getUint32(16, true);
+  const stringBytes = view.getUint32(20, true);
+  let offset = %(header_size)d;
+  const take = (Type, count) => {
+    const values = new Type(buffer, offset, count);
+    offset += count * 4;
+    return values;
+  };
+
+  const stringOffsets = take(Uint32Array, stringCount + 1);
+  const bytes = new Uint8Array(buffer, offset, stringBytes);
+  offset += stringBytes + ((4 - (stringBytes %% 4)) %% 4);
+  const decoder = new TextDecoder();
+  const strings = new Array(stringCount);
+  for (let i = 0; i < stringCount; i++) {
+    strings[i] = decoder.decode(bytes.subarray(stringOffsets[i], stringOffsets[i + 1]));
+  }
+
+  const frames = {
+    count: frameCount,
+    name: take(Int32Array, frameCount),
+    parent: take(Int32Array, frameCount),
+    parentName: take(Int32Array, frameCount),
+    position: take(Float32Array, frameCount * 3),
+    rotation: take(Float32Array, frameCount * 4),
+    scale: take(Float32Array, frameCount * 3),
+  };
+  const items = {
+    count: itemCount,
+    name: take(Int32Array, itemCount),
+    frame: take(Int32Array, itemCount),
+    shape: take(Int32Array, itemCount),
+    flags: take(Uint32Array, itemCount),
+    position: take(Float32Array, itemCount * 3),
+    rotation: take(Float32Array, itemCount * 4),
+    scale: take(Float32Array, itemCount * 3),
+    color: take(Float32Array, itemCount * 4),
+  };
+  return { strings, frames, items };
+}
+
+export async function loadItemsTf(url) {
+  const response = await fetch(url);
+  return parseItemsTf(await response.arrayBuffer());
+}
+
+// Rebuilds the { tfs, items } objects of items_tf.json, for code that expects the JSON layout.
+export function toItemsTfObject({ strings, frames, items }) {
+  const string = (index) => (index >= 0 ? strings[index] : null);
+  const xyz = (a, i) => ({ x: a[i * 3], y: a[i * 3 + 1], z: a[i * 3 + 2] });
+  const wxyz = (a, i) => ({ w: a[i * 4], x: a[i * 4 + 1], y: a[i * 4 + 2], z: a[i * 4 + 3] });
+  const tfs = {};
+  for (let i = 0; i < frames.count; i++) {
+    tfs[string(frames.name[i])] = {
+      frame: string(frames.parentName[i]),
+      position: xyz(frames.position, i),
+      rotation: wxyz(frames.rotation, i),
+      scale: xyz(frames.scale, i),
+    };
+  }
+  const result = {};
+  for (let i = 0; i < items.count; i++) {
+    const name = string(items.name[i]);
+    const c = items.color;
+    result[name] = {
+      shape: string(items.shape[i]),
+      name,
+      frame: items.frame[i] >= 0 ? string(frames.name[items.frame[i]]) : name,
+      position: xyz(items.position, i),
+      rotation: wxyz(items.rotation, i),
+      color: items.flags[i] & %(has_color)d ? { r: c[i * 4], g: c[i * 4 + 1], b: c[i * 4 + 2], a: c[i * 4 + 3] } : "",
+      scale: xyz(items.scale, i),
+      highlight: Boolean(items.flags[i] & %(highlight)d),
+    };
+  }
+  return { tfs, items: result };
+}
+""" % {"version": VERSION, "header_size": HEADER.size, "has_color": FLAG_HAS_COLOR, "highlight": FLAG_HIGHLIGHT}
+
+
+def write_packed_file(data, file_path):
+    """
+    Writes the packed file and ItemsTfLoader.js next to it.
+    """
+    atomic_write(file_path, pack_items_tf(data))
+    atomic_write(os.path.join(os.path.dirname(os.path.abspath(file_path)), LOADER_NAME), LOADER_SOURCE)
+
+
+def read_packed_file(file_path):
+    with open(file_path, 'rb') as file:
+        return unpack_items_tf(file.read())
+
+
+def compare_with_json(json_path, packed_path, repeat=3):
+    """
+    Prints the size of both files and the best of repeat load times of each in Python:
+    json.load against unpack_items_tf, which decodes the packed file into the same layout.
+    """
+    def best_time(load):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            load()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def load_json():
+        with open(json_path, 'r') as file:
+            return json.load(file)
+
+    def load_packed():
+        with open(packed_path, 'rb') as file:
+            return unpack_items_tf(file.read())
+
+    json_size, packed_size = os.path.getsize(json_path), os.path.getsize(packed_path)
+    json_time, packed_time = best_time(load_json), best_time(load_packed)
+    print(f"JSON:   {json_size:>12,} bytes  load {json_time * 1000:9.2f} ms")
+    print(f"Packed: {packed_size:>12,} bytes  load {packed_time * 1000:9.2f} ms"
+          f"  ({json_size / max(packed_size, 1):.1f}x smaller, {json_time / max(packed_time, 1e-9):.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an items_tf.json file to the packed binary format.")
+    parser.add_argument("json_file", type=str, help="items_tf.json written by urdf_parser.py.")
+    parser.add_argument("packed_file", type=str, help="Packed file to write, e.g. items_tf.bin.")
+    args = parser.parse_args()
+
+    with open(args.json_file, 'r') as file:
+        data = json.load(file)
+    write_packed_file(data, args.packed_file)
+    print(f"Wrote {args.packed_file} and {LOADER_NAME}")
+    compare_with_json(args.json_file, args.packed_file)
@@ -0,0 +1,75 @@
+import os
+import json
+import sqlite3
+import hashlib
+
+from mesh_jobs import file_hash
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT);
+CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, joints TEXT, links TEXT, files TEXT);
+"""
+
+
+class ParseCache:
+    """
+    The joints and links urdf_parser.py extracted from every file, stored in a SQLite
+    database so the next run only parses the files that changed.
+
+    A result is stored under the content hash of its file, the is_main flag, the parser
+    version and the parse mode. Expanded xacro files also record every file they included
+    with its hash, and are reparsed when any of them changed. Content hashes are only
+    recomputed for files whose size or modification time changed.
+    """
+    def __init__(self, cache_path, parser_version):
+        self.cache_path = cache_path
+        self.parser_version = parser_version
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def file_hash(self, file_path):
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT size, mtime_ns, hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+        digest = file_hash(path)
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def _key(self, file_path, is_main, mode):
+        # Relative includes make an expanded xacro file depend on where it is, a plain file only on its content.
+        location = os.path.abspath(file_path) if mode.startswith("xacro") else ""
+        parts = [self.file_hash(file_path), str(int(is_main)), str(self.parser_version), mode, location]
+        return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, file_path, is_main, mode):
+        """
+        Returns (joints_info, links_info, files) stored for this file, or None when it has
+        to be parsed. files are the absolute paths the result was built from, the file first.
+        """
+        row = self.connection.execute("SELECT joints, links, files FROM results WHERE key = ?",
+                                      (self._key(file_path, is_main, mode),)).fetchone()
+        if row is not None:
+            files = json.loads(row[2])
+            try:
+                unchanged = all(self.file_hash(path) == digest for path, digest in files[1:])
+            except OSError:
+                unchanged = False
+            if unchanged:
+                self.hits += 1
+                return json.loads(row[0]), json.loads(row[1]), [path for path, _ in files]
+        self.misses += 1
+        return None
+
+    def put(self, file_path, is_main, mode, joints_info, links_info, files):
+        files = [[os.path.abspath(path), self.file_hash(path)] for path in files]
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                (self._key(file_path, is_main, mode), json.dumps(joints_info), json.dumps(links_info),
+                                 json.dumps(files)))
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+
+from mesh_jobs import (STL_EXTENSIONS, COMPRESSION_PROFILES, MANIFEST_NAME, collect_mesh_jobs, convert_with_cache, conversion_settings,
+                       parse_lod_budgets, print_report, print_size_report)
+from blender_pool import run_pool
+from GlbToJS import convert_glb, find_lod_files, is_lod_file
+from mesh_lookup_populator import scan_and_generate_imports
+from urdf_parser import parse_directory, write_to_json_file
+import instrumentation
+from instrumentation import phase
+import file_index
+from file_index import find_files, walk
+
+# Remembers, for every generated file, the inputs it was last built from.
+STATE_NAME = ".pipeline_state.json"
+URDF_EXTENSIONS = ('.urdf', '.xacro')
+
+
+class Rule:
+    """
+    One node of the build graph: target is rebuilt by action() when it is missing or when
+    the signature of its inputs differs from the one recorded at its last build.
+
+    inputs are tracked by modification time. present are tracked only by name, for
+    targets that depend on which files exist but not on what is inside them.
+    """
+    def __init__(self, target, inputs, action, present=()):
+        self.target = target
+        self.inputs = inputs
+        self.action = action
+        self.present = present
+
+    def signature(self):
+        mtimes = {path: os.stat(path).st_mtime_ns for path in sorted(self.inputs) if os.path.exists(path)}
+        return {"inputs": mtimes, "present": sorted(self.present)}
+
+
+def list_files(directory, extensions, recursive=True):
+    return find_files(directory, extensions, recursive)
+
+
+class Pipeline:
+    """
+    Runs StlToGlb -> GlbToJS -> mesh_lookup_populator and urdf_parser for one robot
+    directory laid out as described in the README, rebuilding only what changed inputs
+    invalidate:
+
+    - meshes/*.stl, *.dae -> visual/*.glb    (content-hash build manifest, Blender pool)
+    - visual/x.glb        -> visual/x.js     (one module per changed GLB)
+    - visual/*.js + URDFs -> MeshLookup.js   (only when modules appear/disappear or a URDF changes)
+    - URDFs               -> items_tf.json
+    """
+    def __init__(self, robot_dir, main_urdf, urdf_dir=None, json_path=None, blender="blender",
+                 jobs=os.cpu_count(), scale=None, rotation=None, lod_budgets=(1.0,),
+                 compression="none", bundle=False):
+        self.robot_dir = robot_dir
+        self.main_urdf = main_urdf
+        self.urdf_dir = urdf_dir or robot_dir
+        self.meshes_dir = os.path.join(robot_dir, "meshes")
+        self.visual_dir = os.path.join(robot_dir, "visual")
+        self.lookup_path = os.path.join(robot_dir, "MeshLookup.js")
+        self.json_path = json_path or os.path.join(robot_dir, "items_tf.json")
+        self.state_path = os.path.join(robot_dir, STATE_NAME)
+        self.blender = blender
+        self.jobs = jobs
+        self.scale = scale
+        self.rotation = rotation
+        self.lod_budgets = lod_budgets
+        self.compression = compression
+        self.bundle = bundle
+        # Absolute paths of every file the last build wrote or owns, see is_output.
+        self.outputs = set()
+
+    def load_state(self):
+        try:
+            with open(self.state_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(state, file, indent=4)
+        os.replace(temp_path, self.state_path)
+
+    def build_meshes(self):
+        jobs = collect_mesh_jobs(self.meshes_dir, os.path.abspath(self.visual_dir), STL_EXTENSIONS)
+        if shutil.which(self.blender) is None:
+            if jobs:
+                print(f"Blender executable '{self.blender}' not found, skipping the STL/DAE -> GLB stage.")
+            return []
+        results = convert_with_cache(jobs, os.path.abspath(self.visual_dir),
+                                     lambda stale: run_pool(stale, self.jobs, self.blender, "stl", self.lod_budgets, self.compression),
+                                     settings=conversion_settings(self.lod_budgets, self.compression))
+        if results:
+            print_size_report(results)
+            print_report(results)
+        return results
+
+    def rules(self):
+        rules = []
+        # Levels of detail are inputs of the module of their full mesh, not modules of their own.
+        glb_files = [path for path in list_files(self.visual_dir, (".glb",)) if not is_lod_file(path)]
+        for glb_file_path in glb_files:
+            js_file_path = os.path.splitext(glb_file_path)[0] + ".js"
+            rules.append(Rule(js_file_path, [glb_file_path] + find_lod_files(glb_file_path),
+                              lambda glb=glb_file_path, js=js_file_path: convert_glb(glb, js, self.scale, self.rotation)))
+
+        urdf_files = list_files(self.urdf_dir, URDF_EXTENSIONS)
+        # MeshLookup.js only imports modules by path, so it depends on which modules exist, not on their content.
+        js_files = {os.path.splitext(glb_file_path)[0] + ".js" for glb_file_path in glb_files}
+        js_files.update(list_files(self.visual_dir, (".js",)))
+        lookup_inputs = urdf_files
+        if self.bundle:
+            # The bundled lookup reads the node names and levels of detail from the GLBs themselves.
+            lookup_inputs = urdf_files + list_files(self.visual_dir, (".glb",))
+        rules.append(Rule(self.lookup_path, lookup_inputs, self.write_lookup, present=js_files))
+        rules.append(Rule(self.json_path, urdf_files, self.write_json))
+        return rules
+
+    def write_lookup(self):
+        scan_and_generate_imports(self.robot_dir, self.urdf_dir, self.bundle, scale=self.scale, rotation=self.rotation)
+        print(f"Wrote {self.lookup_path}")
+
+    def write_json(self):
+        write_to_json_file(parse_directory(self.urdf_dir, self.main_urdf), self.json_path)
+        print(f"Wrote {self.json_path}")
+
+    def remove_orphaned_modules(self, state):
+        # A module whose GLB was deleted (because its mesh was deleted) goes away with it.
+        for target in list(state):
+            if target.endswith(".js") and target.startswith(os.path.join(self.visual_dir, "")):
+                glb_file_path = os.path.splitext(target)[0] + ".glb"
+                if not os.path.exists(glb_file_path):
+                    if os.path.exists(target):
+                        os.remove(target)
+                        print(f"Removed {target}, its GLB was deleted")
+                    del state[target]
+
+    def build(self):
+        """
+        Brings every output up to date. Returns the list of targets that were rebuilt.
+        """
+        with phase("build_meshes"):
+            results = self.build_meshes()
+        outputs = {self.state_path, os.path.join(self.visual_dir, MANIFEST_NAME)}
+        for result in results:
+            if result["ok"]:
+                outputs.add(result["output"])
+                outputs.update(result.get("lods", []))
+        state = self.load_state()
+        previous_state = json.dumps(state, sort_keys=True)
+        self.remove_orphaned_modules(state)
+
+        rebuilt = []
+        for rule in self.rules():
+            outputs.add(rule.target)
+            if os.path.exists(rule.target) and state.get(rule.target) == rule.signature():
+                continue
+            with phase("rule", rule.target):
+                rule.action()
+            rebuilt.append(rule.target)
+            state[rule.target] = rule.signature()
+
+        if json.dumps(state, sort_keys=True) != previous_state:
+            self.save_state(state)
+        self.outputs = {os.path.abspath(path) for path in outputs}
+        if not rebuilt:
+            print("Everything is up to date.")
+        return rebuilt
+
+    def is_output(self, path):
+        # Files the pipeline writes itself, changing them must not trigger another build.
+        return os.path.abspath(path) in self.outputs
+
+    def watched_dirs(self):
+        return sorted({os.path.abspath(path) for path in (self.robot_dir, self.urdf_dir) if os.path.isdir(path)})
+
+
+def is_ignored_path(path):
+    # Hidden files are temporary files (atomic writes, editors saving through a temporary
+    # copy) and bookkeeping. A save renamed over a visible file is seen through its destination.
+    return os.path.basename(path).startswith(".")
+
+
+def snapshot(directories):
+    files = {}
+    for directory in directories:
+        for root, dirs, names in walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if is_ignored_path(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def watch_polling(pipeline, interval):
+    print(f"Watching {', '.join(pipeline.watched_dirs())} for changes (polling every {interval}s)...")
+    last = snapshot(pipeline.watched_dirs())
+    while True:
+        time.sleep(interval)
+        current = snapshot(pipeline.watched_dirs())
+        if current != last:
+            pipeline.build()
+            # Take the snapshot after the build so the files it wrote don't count as changes.
+            current = snapshot(pipeline.watched_dirs())
+        last = current
+
+
+def watch_events(pipeline, interval):
+    """
+    Rebuilds on filesystem events (inotify, FSEvents, ReadDirectoryChangesW) through the
+    optional watchdog package. Returns False when watchdog is not installed.
+    """
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return False
+
+    changed = []
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            # Editors that save through a temporary file and rename it over the original
+            # (gedit's .goutputstream-*) only report the edited file as the destination.
+            path = getattr(event, "dest_path", None) or event.src_path
+            if not event.is_directory and not is_ignored_path(path):
+                changed.append(path)
+
+    observer = Observer()
+    for directory in pipeline.watched_dirs():
+        observer.schedule(Handler(), directory, recursive=True)
+    observer.start()
+    print(f"Watching {', '.join(pipeline.watched_dirs())} for changes...")
+    try:
+        while True:
+            time.sleep(interval)
+            if changed:
+                # Let a burst of events (e.g. an editor saving several files) settle into one build.
+                # Checked here, after the build that wrote them, so its own outputs are known.
+                paths = changed[:]
+                del changed[:len(paths)]
+                if not all(pipeline.is_output(path) for path in paths):
+                    pipeline.build()
+    finally:
+        observer.stop()
+        observer.join()
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the STL -> GLB -> JS -> MeshLookup.js and URDF -> JSON pipeline incrementally.")
+    parser.add_argument("robot_dir", type=str, help="Robot directory containing meshes/ and visual/.")
+    parser.add_argument("main_urdf", type=str, help="File name of the main URDF, e.g. robot.urdf.")
+    parser.add_argument("--urdf-dir", type=str, default=None, help="Directory searched for .urdf/.xacro files. Defaults to robot_dir.")
+    parser.add_argument("--json", type=str, default=None, help="Output JSON file. Defaults to robot_dir/items_tf.json.")
+    parser.add_argument("--blender", type=str, default="blender", help="Blender executable to run.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of Blender workers.")
+    parser.add_argument("--scale", type=str, help="Scale in the format [x,y,z] for the .js modules.", default=None)
+    parser.add_argument("--rotation", type=str, help="Rotation in the format [x,y,z] for the .js modules.", default=None)
+    parser.add_argument("--lod", type=parse_lod_budgets, default=[1.0],
+                        help="Triangle budget of every level of detail, e.g. 1.0,0.25,0.05. See StlToGlb.py.")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_PROFILES), default="none",
+                        help="Compression profile of the exported GLBs. See StlToGlb.py.")
+    parser.add_argument("--bundle", action="store_true", help="Write MeshLookup.js as one lazy module, see mesh_lookup_populator.py --bundle.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and rebuild whenever an input changes.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between checks in watch mode.")
+    instrumentation.add_arguments(parser)
+    file_index.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args.trace, args.profile)
+    file_index.configure(args.file_index)
+
+    if not os.path.isdir(args.robot_dir):
+        print(f"The folder '{args.robot_dir}' does not exist.")
+        sys.exit(1)
+
+    pipeline = Pipeline(args.robot_dir, args.main_urdf, args.urdf_dir, args.json, args.blender,
+                        max(1, args.jobs), args.scale, args.rotation, args.lod, args.compression, args.bundle)
+    pipeline.build()
+    if args.watch:
+        try:
+            if not watch_events(pipeline, args.poll_interval):
+                watch_polling(pipeline, args.poll_interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import conversion_daemon
+from conversion_daemon import ConversionService, make_server, submit
+from mesh_jobs import MANIFEST_NAME
+
+
+class FakeBlenderWorker:
+    """
+    Stands in for a Blender process: copies each source to its output, slowly enough for
+    two requests to overlap.
+    """
+    converted = []
+
+    def __init__(self, index, blender, script):
+        self.index = index
+
+    def start(self):
+        pass
+
+    def convert(self, jobs, lod_budgets, compression):
+        time.sleep(0.2)
+        results = []
+        for source_file_path, glb_file_path in jobs:
+            os.makedirs(os.path.dirname(glb_file_path), exist_ok=True)
+            with open(source_file_path, 'rb') as source, open(glb_file_path, 'wb') as output:
+                output.write(source.read())
+            FakeBlenderWorker.converted.append(source_file_path)
+            results.append({"source": source_file_path, "output": glb_file_path, "ok": True})
+        return results
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    monkeypatch.setattr(conversion_daemon, "BlenderWorker", FakeBlenderWorker)
+    FakeBlenderWorker.converted = []
+    service = ConversionService(blender_workers=2)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def test_concurrent_converts_share_the_manifest(daemon, tmp_path):
+    source_dir = tmp_path / "meshes"
+    source_dir.mkdir()
+    for name in ("base.stl", "arm.stl", "gripper.stl"):
+        (source_dir / name).write_text(name)
+    payload = {"source_dir": str(source_dir), "output_dir": str(tmp_path / "glb")}
+
+    replies = []
+    threads = [threading.Thread(target=lambda: replies.append(submit(daemon, "convert", payload, timeout=30)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The second request waits for the first and finds every mesh up to date.
+    assert sorted(len(reply["results"]) for reply in replies) == [0, 3]
+    assert len(FakeBlenderWorker.converted) == 3
+    with open(tmp_path / "glb" / MANIFEST_NAME) as file:
+        assert sorted(json.load(file)["entries"]) == ["../meshes/arm.stl", "../meshes/base.stl", "../meshes/gripper.stl"]
+
+
+def test_unknown_endpoint_and_missing_fields(daemon):
+    with pytest.raises(RuntimeError, match=r"\(404\)"):
+        submit(daemon, "nope", {})
+    with pytest.raises(RuntimeError, match=r"\(400\)"):
+        submit(daemon, "convert", {"source_dir": "."})
@@ -0,0 +1,108 @@
+import struct
+
+import pytest
+
+from glb_atlas import build_atlas, merge_glbs
+from glb_reader import mesh_node_names, read_glb, write_glb
+
+
+def triangle_glb(file_path, positions, nodes, scene_nodes, textured=False):
+    """
+    Writes a GLB with one triangle mesh. Positions are followed by uint16 indices, which
+    leave the binary chunk 2 bytes short of a multiple of 4, and optionally a textured material.
+    """
+    binary = struct.pack('<9f', *positions) + struct.pack('<3H', 0, 1, 2)
+    gltf = {
+        "asset": {"version": "2.0"},
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [{"buffer": 0, "byteOffset": 0, "byteLength": 36},
+                        {"buffer": 0, "byteOffset": 36, "byteLength": 6}],
+        "accessors": [{"bufferView": 0, "componentType": 5126, "count": 3, "type": "VEC3"},
+                      {"bufferView": 1, "componentType": 5123, "count": 3, "type": "SCALAR"}],
+        "materials": [{"name": "paint"}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "material": 0}]}],
+        "nodes": nodes,
+        "scenes": [{"nodes": scene_nodes}],
+        "scene": 0,
+    }
+    if textured:
+        binary += b"\0\0" + b"PNGDATA!"
+        gltf["bufferViews"].append({"buffer": 0, "byteOffset": 44, "byteLength": 8})
+        gltf["buffers"][0]["byteLength"] = len(binary)
+        gltf["images"] = [{"bufferView": 2, "mimeType": "image/png"}]
+        gltf["samplers"] = [{}]
+        gltf["textures"] = [{"source": 0, "sampler": 0}]
+        gltf["materials"][0]["pbrMetallicRoughness"] = {"baseColorTexture": {"index": 0}}
+    write_glb(gltf, binary, str(file_path))
+
+
+def read_positions(gltf, binary, mesh_index):
+    accessor = gltf["accessors"][gltf["meshes"][mesh_index]["primitives"][0]["attributes"]["POSITION"]]
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    return list(struct.unpack_from('<9f', binary, view["byteOffset"] + accessor.get("byteOffset", 0)))
+
+
+BASE = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+ARM = [2.0, 0.0, 0.0, 3.0, 0.0, 0.0, 2.0, 1.0, 5.0]
+
+
+@pytest.fixture
+def glb_files(tmp_path):
+    base = tmp_path / "base_link.glb"
+    arm = tmp_path / "arm 1.glb"
+    triangle_glb(base, BASE, [{"name": "Body", "mesh": 0}], [0], textured=True)
+    # A parent node without a mesh, so the mesh node is not the first node of the file.
+    triangle_glb(arm, ARM, [{"name": "root", "children": [1]}, {"name": "Part", "mesh": 0}], [0], textured=True)
+    return [str(base), str(arm)]
+
+
+def test_merge_remaps_indices(glb_files):
+    (gltf, binary), node_names = merge_glbs(glb_files)
+    assert node_names == ["base_link", "arm_1"]
+    assert [node["name"] for node in gltf["nodes"]] == ["base_link", "arm_1_root", "arm_1"]
+    assert gltf["nodes"][1]["children"] == [2]
+    assert gltf["nodes"][2]["mesh"] == 1
+    assert gltf["scenes"] == [{"nodes": [0, 1]}]
+
+    primitive = gltf["meshes"][1]["primitives"][0]
+    assert primitive == {"attributes": {"POSITION": 2}, "indices": 3, "material": 1}
+    assert [accessor["bufferView"] for accessor in gltf["accessors"]] == [0, 1, 3, 4]
+    # The views of the second file start after the 52 byte binary chunk of the first.
+    assert [view["byteOffset"] for view in gltf["bufferViews"]] == [0, 36, 44, 52, 88, 96]
+    assert all(view["buffer"] == 0 for view in gltf["bufferViews"])
+    assert gltf["buffers"] == [{"byteLength": len(binary)}]
+
+    assert [image["bufferView"] for image in gltf["images"]] == [2, 5]
+    assert gltf["textures"] == [{"source": 0, "sampler": 0}, {"source": 1, "sampler": 1}]
+    assert gltf["materials"][1]["pbrMetallicRoughness"]["baseColorTexture"] == {"index": 1}
+
+
+def test_merged_glb_reads_back(glb_files, tmp_path):
+    (gltf, binary), _ = merge_glbs(glb_files)
+    atlas_path = tmp_path / "atlas.glb"
+    write_glb(gltf, binary, str(atlas_path))
+    gltf, binary = read_glb(str(atlas_path))
+    assert mesh_node_names(gltf) == ["base_link", "arm_1"]
+    assert read_positions(gltf, binary, 0) == BASE
+    assert read_positions(gltf, binary, 1) == ARM
+    for image in gltf["images"]:
+        view = gltf["bufferViews"][image["bufferView"]]
+        assert binary[view["byteOffset"]:view["byteOffset"] + view["byteLength"]] == b"PNGDATA!"
+
+
+def test_external_buffers_are_rejected(tmp_path):
+    path = tmp_path / "external.glb"
+    write_glb({"asset": {"version": "2.0"}, "buffers": [{"uri": "external.bin", "byteLength": 4}]}, b"", str(path))
+    with pytest.raises(ValueError, match="external buffers"):
+        merge_glbs([str(path)])
+
+
+def test_build_atlas_rewrites_the_modules(glb_files, tmp_path):
+    (tmp_path / "arm 1.js").write_text("import arm_1 from './arm 1.glb';\n")
+    assert build_atlas(str(tmp_path), "atlas", write_modules=True) == ["arm_1", "base_link"]
+    assert mesh_node_names(read_glb(str(tmp_path / "atlas.glb"))[0]) == ["arm_1", "base_link"]
+    # The module of arm 1.glb keeps its file name, which MeshLookup.js imports.
+    assert sorted(path.name for path in tmp_path.glob("*.js")) == ["arm 1.js", "base_link.js"]
+    module = (tmp_path / "arm 1.js").read_text()
+    assert "./atlas.glb" in module and "arm 1.glb" not in module
+    assert not list(tmp_path.glob(".*.tmp"))
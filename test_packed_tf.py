@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from packed_tf import LOADER_NAME, pack_items_tf, unpack_items_tf, write_packed_file
+
+
+def pose(position, rotation):
+    return {
+        'position': dict(zip('xyz', position)),
+        'rotation': dict(zip('wxyz', rotation)),
+        'scale': {'x': 1, 'y': 1, 'z': 1},
+    }
+
+
+def item(name, frame, shape=None, color="", highlight=False):
+    # In the key order of urdf_parser.py.
+    transform = pose([0.5, -0.25, 2], [1, 0, 0, 0])
+    return {'shape': shape, 'name': name, 'frame': frame, 'position': transform['position'],
+            'rotation': transform['rotation'], 'color': color, 'scale': transform['scale'], 'highlight': highlight}
+
+
+ITEMS_TF = {
+    'tfs': {
+        'base_link': dict({'frame': 'world'}, **pose([0, 0, 0], [1, 0, 0, 0])),
+        'arm': dict({'frame': 'base_link'}, **pose([0.1, 0.2, 0.3], [0.7071068, 0, 0.7071068, 0])),
+        'gripper_ü': dict({'frame': 'arm'}, **pose([-1e-3, 0, 12.5], [0.5, 0.5, 0.5, 0.5])),
+    },
+    'items': {
+        'base_link': item('base_link', 'base_link', 'package://bot/meshes/base_link.STL',
+                          {'r': 0.25, 'g': 0.5, 'b': 0.75, 'a': 1}),
+        'arm': item('arm', 'arm', highlight=True),
+        'gripper_ü': item('gripper_ü', 'gripper_ü', 'package://bot/meshes/gripper.dae'),
+    },
+}
+
+
+def assert_close(actual, expected):
+    # Values are stored as float32.
+    if isinstance(expected, dict):
+        assert list(actual) == list(expected)
+        for key in expected:
+            assert_close(actual[key], expected[key])
+    elif isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        assert actual == pytest.approx(expected, rel=1e-6, abs=1e-7)
+    else:
+        assert actual == expected
+
+
+def test_round_trip():
+    assert_close(unpack_items_tf(pack_items_tf(ITEMS_TF)), ITEMS_TF)
+
+
+def test_round_trip_empty():
+    assert unpack_items_tf(pack_items_tf({'tfs': {}, 'items': {}})) == {'tfs': {}, 'items': {}}
+
+
+def test_rejects_other_files():
+    with pytest.raises(ValueError):
+        unpack_items_tf(json.dumps(ITEMS_TF).encode('utf-8'))
+
+
+def test_write_packed_file(tmp_path):
+    packed_path = tmp_path / "items_tf.bin"
+    write_packed_file(ITEMS_TF, str(packed_path))
+    assert packed_path.read_bytes() == pack_items_tf(ITEMS_TF)
+    assert (tmp_path / LOADER_NAME).exists()
@@ -0,0 +1,82 @@
+import os
+
+from parse_cache import ParseCache
+from urdf_parser import PARSER_VERSION, parse_directory
+
+JOINTS = {"arm": {"frame": "base_link"}}
+LINKS = {"arm": {"name": "arm"}}
+
+URDF = """<robot name="bot">
+  <link name="base_link"/>
+  <link name="arm"/>
+  <joint name="arm_joint" type="fixed">
+    <origin xyz="0 0 %s"/><parent link="base_link"/><child link="arm"/>
+  </joint>
+</robot>
+"""
+
+
+def test_hit_after_reopening(tmp_path):
+    urdf = tmp_path / "robot.urdf"
+    urdf.write_text("<robot/>")
+    cache = ParseCache(str(tmp_path / "cache.sqlite"), 1)
+    assert cache.get(str(urdf), True, "dom") is None
+    cache.put(str(urdf), True, "dom", JOINTS, LINKS, [str(urdf)])
+    cache.close()
+
+    cache = ParseCache(str(tmp_path / "cache.sqlite"), 1)
+    assert cache.get(str(urdf), True, "dom") == (JOINTS, LINKS, [str(urdf)])
+    # The result is stored for one combination of is_main, parse mode and parser version.
+    assert cache.get(str(urdf), False, "dom") is None
+    assert cache.get(str(urdf), True, "stream") is None
+    assert ParseCache(str(tmp_path / "cache.sqlite"), 2).get(str(urdf), True, "dom") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_changed_file_is_reparsed(tmp_path):
+    urdf = tmp_path / "robot.urdf"
+    urdf.write_text("<robot/>")
+    cache = ParseCache(str(tmp_path / "cache.sqlite"), 1)
+    cache.put(str(urdf), True, "dom", JOINTS, LINKS, [str(urdf)])
+    urdf.write_text("<robot name='changed'/>")
+    assert cache.get(str(urdf), True, "dom") is None
+    # Touching a file without changing it keeps its result.
+    urdf.write_text("<robot/>")
+    os.utime(urdf, ns=(1, 1))
+    assert cache.get(str(urdf), True, "dom") == (JOINTS, LINKS, [str(urdf)])
+
+
+def test_changed_include_is_reparsed(tmp_path):
+    urdf = tmp_path / "robot.xacro"
+    part = tmp_path / "part.xacro"
+    urdf.write_text("<robot/>")
+    part.write_text("<robot/>")
+    cache = ParseCache(str(tmp_path / "cache.sqlite"), 1)
+    cache.put(str(urdf), True, "xacro {}", JOINTS, LINKS, [str(urdf), str(part)])
+    assert cache.get(str(urdf), True, "xacro {}") is not None
+    part.write_text("<robot><link name='new'/></robot>")
+    assert cache.get(str(urdf), True, "xacro {}") is None
+    part.unlink()
+    assert cache.get(str(urdf), True, "xacro {}") is None
+
+
+def test_parse_directory_reuses_results(tmp_path):
+    urdf_dir = tmp_path / "urdf"
+    urdf_dir.mkdir()
+    urdf = urdf_dir / "robot.urdf"
+    urdf.write_text(URDF % "0.5")
+    cache_path = str(tmp_path / "cache.sqlite")
+    uncached = parse_directory(str(urdf_dir), "robot.urdf")
+
+    cache = ParseCache(cache_path, PARSER_VERSION)
+    assert parse_directory(str(urdf_dir), "robot.urdf", cache=cache) == uncached
+    cache.close()
+    cache = ParseCache(cache_path, PARSER_VERSION)
+    assert parse_directory(str(urdf_dir), "robot.urdf", cache=cache) == uncached
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    urdf.write_text(URDF % "0.75")
+    data = parse_directory(str(urdf_dir), "robot.urdf", cache=cache)
+    assert data["tfs"]["arm"]["position"]["z"] == 0.75
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
@@ -0,0 +1,33 @@
+import os
+from collections import OrderedDict
+
+import urdf_document
+from urdf_document import load_document
+
+
+def test_changed_file_replaces_its_document(tmp_path):
+    path = tmp_path / "robot.urdf"
+    path.write_text('<robot><link name="a"/></robot>')
+    first = load_document(str(path))
+    assert load_document(str(path)) is first
+    path.write_text('<robot><link name="a"/><link name="b"/></robot>')
+    os.utime(path, ns=(1, 1))
+    second = load_document(str(path))
+    assert [link.get("name") for link in second.links] == ["a", "b"]
+    assert list(urdf_document._document_cache).count(str(path)) == 1
+
+
+def test_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(urdf_document, "DOCUMENT_CACHE_SIZE", 2)
+    monkeypatch.setattr(urdf_document, "_document_cache", OrderedDict())
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.urdf"
+        path.write_text(f'<robot><link name="{name}"/></robot>')
+        paths.append(str(path))
+    first = load_document(paths[0])
+    load_document(paths[1])
+    # Using a is what keeps it, b is the least recently used when c is loaded.
+    assert load_document(paths[0]) is first
+    load_document(paths[2])
+    assert list(urdf_document._document_cache) == [paths[0], paths[2]]
@@ -0,0 +1,18 @@
+from xacro_eval import PropertyTable
+
+
+def test_changes_forget_resolved_values():
+    table = PropertyTable({"a": "1", "b": "${a * 2}"})
+    assert table.substitute("${a}") == "1"
+    assert table.resolve("b") == 2
+    table.update({"a": "2"})
+    assert table.substitute("${a}") == "2"
+    assert table.resolve("b") == 4
+    table |= {"a": "3"}
+    assert table.resolve("b") == 6
+    table.pop("a")
+    table.setdefault("a", "5")
+    assert table.resolve("b") == 10
+    del table["a"]
+    table["a"] = "6"
+    assert table.resolve("b") == 12
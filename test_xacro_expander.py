@@ -0,0 +1,164 @@
+from collections import OrderedDict
+
+import pytest
+
+import xacro_expander
+from xacro_eval import PropertyTable
+from xacro_expander import XacroError, expand_file
+from urdf_parser import parse_directory
+
+XACRO_HEADER = '<robot name="test" xmlns:xacro="http://www.ros.org/wiki/xacro">\n'
+
+
+def write_xacro(directory, name, body):
+    path = directory / name
+    path.write_text(XACRO_HEADER + body + "\n</robot>\n")
+    return path
+
+
+def link_names(root):
+    return [link.get("name") for link in root.iter("link")]
+
+
+def test_boolean_properties():
+    table = PropertyTable({"sim": "false", "cam": "True"})
+    assert table.evaluate("not sim") is True
+    assert not table.evaluate("cam and sim")
+
+
+def test_boolean_conditions(tmp_path):
+    path = write_xacro(tmp_path, "robot.xacro", """
+  <xacro:property name="W" value="2"/>
+  <xacro:property name="flag" value="false"/>
+  <xacro:arg name="sim" default="false"/>
+  <xacro:macro name="part" params="name use_gripper">
+    <xacro:if value="${use_gripper and not flag}"><link name="${name}"/></xacro:if>
+  </xacro:macro>
+  <xacro:if value="${W == 2 and not flag}"><link name="cond"/></xacro:if>
+  <xacro:if value="${not $(arg sim)}"><link name="real"/></xacro:if>
+  <xacro:part name="gripper" use_gripper="true"/>
+  <xacro:part name="no_gripper" use_gripper="false"/>""")
+    root, _ = expand_file(str(path))
+    assert link_names(root) == ["cond", "real", "gripper"]
+
+
+def test_include_and_macro_parameters(tmp_path):
+    (tmp_path / "parts").mkdir()
+    write_xacro(tmp_path / "parts", "arm.xacro", """
+  <xacro:property name="length" value="0.5"/>
+  <xacro:macro name="arm" params="prefix reach:=2 side:=^|left">
+    <link name="${prefix}_arm_${side}"><visual><origin xyz="${length * reach} 0 0"/></visual></link>
+  </xacro:macro>""")
+    path = write_xacro(tmp_path, "robot.xacro", """
+  <xacro:include filename="parts/arm.xacro"/>
+  <xacro:arm prefix="a"/>
+  <xacro:property name="side" value="right"/>
+  <xacro:arm prefix="b" reach="4"/>""")
+    root, includes = expand_file(str(path))
+    assert link_names(root) == ["a_arm_left", "b_arm_right"]
+    assert [origin.get("xyz") for origin in root.iter("origin")] == ["1.0 0 0", "2.0 0 0"]
+    assert includes == [str(path), str(tmp_path / "parts" / "arm.xacro")]
+
+
+def test_blocks(tmp_path):
+    path = write_xacro(tmp_path, "robot.xacro", """
+  <xacro:property name="shared">
+    <inertial><mass value="1"/></inertial>
+  </xacro:property>
+  <xacro:macro name="wrap" params="name *body **extra">
+    <link name="${name}">
+      <xacro:insert_block name="body"/>
+      <xacro:insert_block name="extra"/>
+      <xacro:insert_block name="shared"/>
+    </link>
+  </xacro:macro>
+  <xacro:wrap name="l1">
+    <visual/>
+    <extra><collision/><collision/></extra>
+  </xacro:wrap>""")
+    root, _ = expand_file(str(path))
+    link = root.find("link")
+    assert [child.tag for child in link] == ["visual", "collision", "collision", "inertial"]
+
+
+def test_property_scopes_and_unless(tmp_path):
+    path = write_xacro(tmp_path, "robot.xacro", """
+  <xacro:macro name="set" params="value">
+    <xacro:property name="outer" value="${value}" scope="parent"/>
+    <xacro:property name="inner" value="hidden"/>
+  </xacro:macro>
+  <xacro:set value="7"/>
+  <link name="l${outer}"/>
+  <xacro:unless value="${outer > 5}"><link name="small"/></xacro:unless>""")
+    root, _ = expand_file(str(path))
+    assert link_names(root) == ["l7"]
+
+
+def test_args_and_find(tmp_path, monkeypatch):
+    package = tmp_path / "my_robot"
+    (package / "urdf").mkdir(parents=True)
+    write_xacro(package / "urdf", "wheel.xacro", '<link name="wheel"/>')
+    monkeypatch.setenv("ROBOT_COLOR", "blue")
+    path = write_xacro(package / "urdf", "robot.xacro", """
+  <xacro:arg name="prefix" default="left"/>
+  <xacro:include filename="$(find my_robot)/urdf/wheel.xacro"/>
+  <link name="$(arg prefix)_$(env ROBOT_COLOR)_$(optenv MISSING_VARIABLE plain)"/>""")
+    assert link_names(expand_file(str(path))[0]) == ["wheel", "left_blue_plain"]
+    assert link_names(expand_file(str(path), {"prefix": "right"})[0]) == ["wheel", "right_blue_plain"]
+
+
+def test_errors(tmp_path):
+    path = write_xacro(tmp_path, "loop.xacro", '<xacro:include filename="loop.xacro"/>')
+    with pytest.raises(XacroError, match="includes itself"):
+        expand_file(str(path))
+    path = write_xacro(tmp_path, "missing.xacro", '<xacro:undefined_macro_call/><xacro:call macro="nope"/>')
+    with pytest.raises(XacroError, match="undefined macro nope"):
+        expand_file(str(path))
+    path = write_xacro(tmp_path, "arg.xacro", '<link name="$(arg nope)"/>')
+    with pytest.raises(XacroError, match="undefined argument nope"):
+        expand_file(str(path))
+
+
+def test_expansion_cache_follows_includes(tmp_path):
+    part = write_xacro(tmp_path, "part.xacro", '<link name="first"/>')
+    path = write_xacro(tmp_path, "robot.xacro", '<xacro:include filename="part.xacro"/>')
+    assert link_names(expand_file(str(path))[0]) == ["first"]
+    part.write_text(XACRO_HEADER + '<link name="second_version"/>\n</robot>\n')
+    assert link_names(expand_file(str(path))[0]) == ["second_version"]
+
+
+def test_caches_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(xacro_expander, "PARSED_CACHE_SIZE", 2)
+    monkeypatch.setattr(xacro_expander, "EXPANSION_CACHE_SIZE", 2)
+    monkeypatch.setattr(xacro_expander, "_parsed_cache", OrderedDict())
+    monkeypatch.setattr(xacro_expander, "_expansion_cache", OrderedDict())
+    paths = [write_xacro(tmp_path, f"robot_{index}.xacro", f'<link name="l{index}"/>') for index in range(3)]
+    for path in paths:
+        expand_file(str(path))
+    assert list(xacro_expander._parsed_cache) == [str(path) for path in paths[1:]]
+    assert [key[0] for key in xacro_expander._expansion_cache] == [str(path) for path in paths[1:]]
+    # An edited file replaces its entries instead of adding new ones.
+    paths[2].write_text(XACRO_HEADER + '<link name="edited"/>\n</robot>\n')
+    assert link_names(expand_file(str(paths[2]))[0]) == ["edited"]
+    assert len(xacro_expander._parsed_cache) == len(xacro_expander._expansion_cache) == 2
+
+
+def test_parse_directory_merges_included_files(tmp_path):
+    write_xacro(tmp_path, "arm.xacro", """
+  <xacro:macro name="arm" params="parent">
+    <link name="arm"/>
+    <joint name="arm_joint" type="fixed">
+      <origin xyz="0 0 ${height}"/><parent link="${parent}"/><child link="arm"/>
+    </joint>
+  </xacro:macro>""")
+    write_xacro(tmp_path, "robot.xacro", """
+  <xacro:include filename="arm.xacro"/>
+  <xacro:property name="height" value="0.25"/>
+  <link name="base_link"/>
+  <xacro:arm parent="base_link"/>""")
+    data = parse_directory(str(tmp_path), "robot.xacro", xacro_args={})
+    # arm.xacro is part of robot.xacro, so the arm hangs off base_link, which hangs off world.
+    assert list(data["items"]) == ["base_link", "arm"]
+    assert data["tfs"]["arm"]["frame"] == "base_link"
+    assert data["tfs"]["arm"]["position"] == {"x": 0.0, "y": 0.0, "z": 0.25}
+    assert data["tfs"]["base_link"]["frame"] == "world"
@@ -0,0 +1,73 @@
+import os
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+from xacro_eval import PropertyTable
+
+# Define the namespace
+XACRO_NAMESPACE = {'xacro': 'http://www.ros.org/wiki/xacro'}
+
+
+class URDFDocument:
+    """
+    A URDF or xacro file parsed once and shared by every extractor: the joints and links
+    of urdf_parser.py and the meshes of mesh_lookup_populator.py.
+
+    Attributes:
+    - root: The root element of the parsed tree.
+    - property_table: xacro:property names mapped to their raw values, see xacro_eval.PropertyTable.
+    - joints: The <joint> children of the root.
+    - links: Every <link> element in the tree.
+    - materials: Every <material> element in the tree.
+    - mesh_filenames: The filename attribute of every <mesh> element, in document order.
+    """
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path
+        self.property_table = PropertyTable()
+        # getting all external properties to parse
+        for property in root.findall('.//xacro:property', namespaces=XACRO_NAMESPACE):
+            self.property_table[property.get('name')] = property.get('value')
+        self.joints = root.findall('joint')
+        self.links = root.findall('.//link')
+        self.materials = root.findall('.//material')
+        self.mesh_filenames = [mesh.get('filename') for mesh in root.findall('.//mesh') if mesh.get('filename')]
+
+    @classmethod
+    def from_string(cls, urdf_content):
+        return cls(ET.fromstring(urdf_content))
+
+
+# absolute path -> ((mtime_ns, size), URDFDocument), least recently used first. A long running
+# process (the daemon, pipeline.py --watch) sees many files, so only the latest version of the
+# DOCUMENT_CACHE_SIZE most recently loaded files is kept.
+DOCUMENT_CACHE_SIZE = 128
+_document_cache = OrderedDict()
+
+
+def load_document(file_path):
+    """
+    Returns the parsed document of file_path. Documents are cached by path and modification
+    time, so every tool running in the same process (e.g. pipeline.py) parses a file once
+    until it changes. A changed file replaces its cached document.
+    """
+    stat = os.stat(file_path)
+    key = os.path.abspath(file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _document_cache.get(key)
+    if cached is not None and cached[0] == version:
+        _document_cache.move_to_end(key)
+        return cached[1]
+    document = URDFDocument(ET.parse(file_path).getroot(), file_path)
+    _document_cache[key] = (version, document)
+    _document_cache.move_to_end(key)
+    if len(_document_cache) > DOCUMENT_CACHE_SIZE:
+        _document_cache.popitem(last=False)
+    return document
+
+
+def as_document(urdf_content):
+    # The extractors accept either raw URDF text or an already parsed document.
+    if isinstance(urdf_content, URDFDocument):
+        return urdf_content
+    return URDFDocument.from_string(urdf_content)
@@ -1,12 +1,26 @@
 import xml.etree.ElementTree as ET
 import math
 import json
-import sys
-import re
 import os 
-
-import ast
-import operator
+import argparse
+
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the batch conversions fall back to plain Python
+    np = None
+
+from urdf_document import XACRO_NAMESPACE, URDFDocument, as_document, load_document
+from xacro_eval import PropertyTable, compile_expression
+from packed_tf import write_packed_file, compare_with_json
+from xacro_expander import XacroError, expand_file, parse_xacro_args
+from parse_cache import ParseCache
+from async_files import atomic_open
+import instrumentation
+from instrumentation import phase
+import file_index
+from file_index import walk
 
 _AXES2TUPLE = {
     'sxyz': [0, 0, 0, 0], 'sxyx': [0, 0, 1, 0], 'sxzy': [0, 1, 0, 0], 'sxzx': [0, 1, 1, 0],
@@ -19,59 +33,25 @@ _AXES2TUPLE = {
 
 _NEXT_AXIS = [1, 2, 0, 1]
 
-def safe_eval(expr, variables):
-    allowed_operators = {
-        ast.Add: operator.add, ast.Sub: operator.sub,
-        ast.Mult: operator.mul, ast.Div: operator.truediv,
-        ast.Pow: operator.pow, ast.BitXor: operator.xor,
-        ast.USub: operator.neg
-    }
-
-    def eval_(node):
-        if isinstance(node, ast.Constant):
-            return node.value
-        elif isinstance(node, ast.BinOp):
-            return allowed_operators[type(node.op)](eval_(node.left), eval_(node.right))
-        elif isinstance(node, ast.UnaryOp):
-            return allowed_operators[type(node.op)](eval_(node.operand))
-        elif isinstance(node, ast.Name):
-            if node.id in variables:
-                return variables[node.id]
-            else:
-                raise NameError(f"Name {node.id} is not defined")
-        else:
-            raise TypeError(node)
+# Stored with every cached parse result (see parse_cache.py). Bump it whenever a change here
+# changes what is extracted from a file, so results of the old parser are not reused.
+PARSER_VERSION = 1
 
-    expr_ast = ast.parse(expr, mode='eval').body
-    return eval_(expr_ast)
+def safe_eval(expr, variables):
+    # Evaluates one expression, see xacro_eval.compile_expression for what is allowed.
+    def lookup(name):
+        if name in variables:
+            return variables[name]
+        raise NameError(f"Name {name} is not defined")
+    return compile_expression(expr)(lookup)
 
 # Parses a given input string and replaces the ${...} value. Use this if you have a weird format like:
 # <origin xyz="${camera_link *0.05} 0 0" rpy="0 0 0"/> where <xacro:property name="camera_link" value="0.05" />
+# Properties may reference other properties, and every distinct expression is only compiled once.
 def parseString(input_string: str, property_table):
-    pattern = r'\$\{(.*?)\}'
-
-    # Add more default properties to swap if you encounter errors. 
-    # Lio is special and refuses to define their property values normally.
-    property_table['pi'] = str(math.pi)
-    
-    def replace_match(match):
-        expression = match.group(1)
-        for var in re.findall(r'[a-zA-Z_][a-zA-Z_0-9]*', expression):
-            if var in property_table:
-                # Attempt to replace variable names with their values, converting to str for eval
-                expression = expression.replace(var, property_table[var])
-        try:
-            # Evaluate the expression and replace in the input string
-            result = str(safe_eval(expression, property_table))
-
-            return result
-        except Exception as e:
-            print(f"Error evaluating expression '{expression}': {e}")
-            return match.group(0)  # Return the original string if error
-
-    # Replace all matches in the input string
-    result_string = re.sub(pattern, replace_match, input_string)
-    return result_string
+    if not isinstance(property_table, PropertyTable):
+        property_table = PropertyTable(property_table)
+    return property_table.substitute(input_string)
 
 
 
@@ -110,235 +90,593 @@ def quaternion_from_euler(ai, aj, ak, axes='sxyz'):
 
     return quaternion
 
+def quaternions_from_euler(angles, axes='sxyz'):
+    """
+    Batch version of quaternion_from_euler: converts a sequence of (ai, aj, ak) triples
+    with one vectorized NumPy call and returns a list of [w, x, y, z] quaternions.
+    Falls back to quaternion_from_euler per triple when NumPy is not installed.
+    """
+    if np is None:
+        return [quaternion_from_euler(ai, aj, ak, axes) for ai, aj, ak in angles]
+    angles = np.asarray(angles, dtype=np.float64).reshape(-1, 3)
+    firstaxis, parity, repetition, frame = _AXES2TUPLE[axes.lower()]
+    i = firstaxis + 1
+    j = _NEXT_AXIS[i + parity - 1] + 1
+    k = _NEXT_AXIS[i - parity] + 1
+
+    ai, aj, ak = angles[:, 0], angles[:, 1], angles[:, 2]
+    if frame:
+        ai, ak = ak, ai
+    if parity:
+        aj = -aj
+
+    ai, aj, ak = ai / 2.0, aj / 2.0, ak / 2.0
+    ci, si = np.cos(ai), np.sin(ai)
+    cj, sj = np.cos(aj), np.sin(aj)
+    ck, sk = np.cos(ak), np.sin(ak)
+    cc, cs = ci * ck, ci * sk
+    sc, ss = si * ck, si * sk
+
+    quaternions = np.empty((len(angles), 4))
+    if repetition:
+        quaternions[:, 0] = cj * (cc - ss)
+        quaternions[:, i] = cj * (cs + sc)
+        quaternions[:, j] = sj * (cc + ss)
+        quaternions[:, k] = sj * (cs - sc)
+    else:
+        quaternions[:, 0] = cj * cc + sj * ss
+        quaternions[:, i] = cj * sc - sj * cs
+        quaternions[:, j] = cj * ss + sj * cc
+        quaternions[:, k] = cj * cs - sj * sc
+
+    if parity:
+        quaternions[:, j] *= -1
+
+    return quaternions.tolist()
+
+def _compose_poses(parent_positions, parent_rotations, positions, rotations):
+    """
+    World poses of frames given their parents' world poses and their local poses.
+    Positions are [x, y, z] rows and rotations [w, x, y, z] rows.
+    """
+    if np is None:
+        composed = [_compose_pose(*pose) for pose in zip(parent_positions, parent_rotations, positions, rotations)]
+        return [pose[0] for pose in composed], [pose[1] for pose in composed]
+    p0, q0 = np.asarray(parent_positions, dtype=np.float64), np.asarray(parent_rotations, dtype=np.float64)
+    p1, q1 = np.asarray(positions, dtype=np.float64), np.asarray(rotations, dtype=np.float64)
+    w0, v0 = q0[:, :1], q0[:, 1:]
+    w1, v1 = q1[:, :1], q1[:, 1:]
+    # Hamilton product q0 * q1
+    rotation = np.hstack((w0 * w1 - np.sum(v0 * v1, axis=1, keepdims=True),
+                          w0 * v1 + w1 * v0 + np.cross(v0, v1)))
+    # p0 + q0 * p1 * conj(q0)
+    t = 2.0 * np.cross(v0, p1)
+    position = p0 + p1 + w0 * t + np.cross(v0, t)
+    return position.tolist(), rotation.tolist()
+
+def _compose_pose(parent_position, parent_rotation, position, rotation):
+    w0, x0, y0, z0 = parent_rotation
+    w1, x1, y1, z1 = rotation
+    composed_rotation = [w0 * w1 - x0 * x1 - y0 * y1 - z0 * z1,
+                         w0 * x1 + x0 * w1 + y0 * z1 - z0 * y1,
+                         w0 * y1 - x0 * z1 + y0 * w1 + z0 * x1,
+                         w0 * z1 + x0 * y1 - y0 * x1 + z0 * w1]
+    px, py, pz = position
+    tx, ty, tz = 2.0 * (y0 * pz - z0 * py), 2.0 * (z0 * px - x0 * pz), 2.0 * (x0 * py - y0 * px)
+    composed_position = [parent_position[0] + px + w0 * tx + (y0 * tz - z0 * ty),
+                         parent_position[1] + py + w0 * ty + (z0 * tx - x0 * tz),
+                         parent_position[2] + pz + w0 * tz + (x0 * ty - y0 * tx)]
+    return composed_position, composed_rotation
+
+def compute_world_poses(tfs):
+    """
+    Returns the pose of every frame in tfs relative to the root of its chain ("world" for
+    the main URDF), so a viewer does not have to compose the chain itself.
+
+    Frames are visited in topological order over the joint tree, one depth level at a time,
+    and each level is composed with one vectorized call. Frames whose parent is not in tfs
+    are roots and keep their local pose. Frames in a cycle are left out.
+    """
+    children = {}
+    for name, tf in tfs.items():
+        children.setdefault(tf['frame'], []).append(name)
+
+    def local_pose(name):
+        position, rotation = tfs[name]['position'], tfs[name]['rotation']
+        return ([position['x'], position['y'], position['z']],
+                [rotation['w'], rotation['x'], rotation['y'], rotation['z']])
+
+    world = {}
+    level = [name for name, tf in tfs.items() if tf['frame'] not in tfs]
+    for name in level:
+        world[name] = local_pose(name)
+    while level:
+        next_level = [child for name in level for child in children.get(name, []) if child not in world]
+        if not next_level:
+            break
+        parents = [world[tfs[child]['frame']] for child in next_level]
+        locals_ = [local_pose(child) for child in next_level]
+        positions, rotations = _compose_poses([pose[0] for pose in parents], [pose[1] for pose in parents],
+                                              [pose[0] for pose in locals_], [pose[1] for pose in locals_])
+        for child, position, rotation in zip(next_level, positions, rotations):
+            world[child] = (position, rotation)
+        level = next_level
+
+    skipped = [name for name in tfs if name not in world]
+    if skipped:
+        print(f"Frames in a cycle, no world pose computed: {skipped}")
+    return {name: {
+                'frame': _chain_root(name, tfs),
+                'position': {'x': world[name][0][0], 'y': world[name][0][1], 'z': world[name][0][2]},
+                'rotation': {'w': world[name][1][0], 'x': world[name][1][1], 'y': world[name][1][2], 'z': world[name][1][3]},
+            } for name in tfs if name in world}
+
+def _chain_root(name, tfs):
+    # The frame the chain of name is attached to, i.e. the parent of its topmost frame.
+    frame = tfs[name]['frame']
+    while frame in tfs:
+        frame = tfs[frame]['frame']
+    return frame
+
+# Change your predefined geometry shape mapping here. In the scenario of Lio,
+# box = cube
+predefined_mapping = {
+    "box": "cube",
+    "cylinder": "cylinder",
+    "sphere": "sphere",
+}
+
+def joint_origin(joint, property_table):
+    """
+    Returns (parent, child, xyz, rpy) for a <joint> element, or None if the joint has no origin.
+    """
+    if joint.find('origin') is None: 
+        return None
+    origin =  joint.find('origin').attrib
+    parent = joint.find('parent').get('link')
+    child = joint.find('child').get('link')
+
+    # Check if the urdf specifies a property value to be replaced.
+    xyz = list(map(float, parseString(origin['xyz'], property_table).split()))
+    rpy = list(map(float, parseString(origin.get('rpy', '0 0 0').strip(), property_table).split()))
+    return parent, child, xyz, rpy
+
+def joint_tf(parent, xyz, quaternion):
+    return {
+        'frame': parent,
+        'position': {'x': xyz[0], 'y': xyz[1], 'z': xyz[2]},
+        'rotation': {'w': quaternion[0], 'x': quaternion[1], 'y': quaternion[2], 'z': quaternion[3]},
+        'scale': {'x': 1, 'y': 1, 'z': 1}
+    }
+
+def joint_record(joint, property_table):
+    """
+    Returns (parent, child, tf) for a <joint> element, or None if the joint has no origin.
+    """
+    origin = joint_origin(joint, property_table)
+    if origin is None:
+        return None
+    parent, child, xyz, rpy = origin
+    # Convert from Euler angles (rpy) to quaternion, through the same code as the batch in parse_urdf_for_joints
+    quaternion = quaternions_from_euler([rpy[:3]], "sxyz")[0]
+    return parent, child, joint_tf(parent, xyz, quaternion)
+
+def base_link_record(parents, children, parent_count):
+    """
+    Returns (base_link, tf) attaching the root of the joint tree to "world", or None when
+    every parent is also a child.
+    """
+    # Identify the base_link
+    potential_base_links = (parents - children) if (parents - children) else None
+    base_link = None
+    highest_count = -1
+    if potential_base_links is None:
+        return None
+    # Sorted so ties between equally used roots resolve the same way in every process.
+    for link in sorted(potential_base_links, key=str):
+        count = parent_count.get(link, 0)
+        if count > highest_count:
+            base_link = link
+            highest_count = count
+
+    print("base_link identified as: "+ str(base_link))
+    return base_link, {
+        'frame': "world",
+        'position': {'x': 0, 'y': 0, 'z': 0},
+        'rotation': {'w': 1, 'x': 0, 'y': 0, 'z': 0},
+        'scale': {'x': 1, 'y': 1, 'z': 1}
+    }
+
 def parse_urdf_for_joints(urdf_content, is_main):
-    # Parse the URDF XML content
-    root = ET.fromstring(urdf_content)
+    # Parse the URDF XML content, unless it is an already parsed URDFDocument
+    document = as_document(urdf_content)
     joints_info = {}
-    # Define the namespace
-    namespace = {'xacro': 'http://www.ros.org/wiki/xacro'}
-
-    # Find all xacro:property elements
-    property_elements = root.findall('.//xacro:property', namespaces=namespace)
-    property_table = {}
-    # getting all external properties to parse
-    for property in property_elements:
-        property_table[property.get('name')] = property.get('value')
-    # print(property_table)
+    property_table = document.property_table
      # Maps for parent-child relationships and tracking all links
     parents = set()
     children = set()
     parent_count = {}
 
     # Find all <joint> elements
-    joints = root.findall('joint')
-    for joint in joints:
-        joint_name = joint.get('name')
-        # print(joint_name)
-        if joint.find('origin') is None: 
-            continue
-        origin =  joint.find('origin').attrib
-        parent = joint.find('parent').get('link')
-        child = joint.find('child').get('link')
-
+    origins = [origin for origin in (joint_origin(joint, property_table) for joint in document.joints) if origin is not None]
+    # Convert every joint's Euler angles (rpy) to a quaternion in one batch
+    quaternions = quaternions_from_euler([rpy[:3] for parent, child, xyz, rpy in origins], "sxyz")
+    for (parent, child, xyz, rpy), quaternion in zip(origins, quaternions):
         # Populate the parent_child_map and all_links set
         parents.add(parent)
         children.add(child)
-        if parent in parent_count:
-            parent_count[parent] += 1
-        else:
-            parent_count[parent] = 1
-
-        # Check if the urdf specifies a property value to be replaced.
-        xyz = list(map(float, parseString(origin['xyz'], property_table).split()))
-        rpy = list(map(float, parseString(origin.get('rpy', '0 0 0').strip(), property_table).split()))
-
-        # Convert from Euler angles (rpy) to quaternion
-        quaternion = quaternion_from_euler(rpy[0], rpy[1], rpy[2], "sxyz")
-
-        joints_info[child] = {
-            'frame': parent,
-            'position': {'x': xyz[0], 'y': xyz[1], 'z': xyz[2]},
-            'rotation': {'w': quaternion[0], 'x': quaternion[1], 'y': quaternion[2], 'z': quaternion[3]},
-            'scale': {'x': 1, 'y': 1, 'z': 1}
-        }
+        parent_count[parent] = parent_count.get(parent, 0) + 1
+        joints_info[child] = joint_tf(parent, xyz, quaternion)
 
     # Add base_link information
     if is_main:
-        # Identify the base_link
-        potential_base_links = (parents - children) if (parents - children) else None
-        base_link = None
-        highest_count = -1
-        if potential_base_links is not None:
-            for link in potential_base_links:
-                count = parent_count.get(link, 0)
-                if count > highest_count:
-                    base_link = link
-                    highest_count = count
-
-            joints_info[base_link] = {
-                'frame': "world",
-                'position': {'x': 0, 'y': 0, 'z': 0},
-                'rotation': {'w': 1, 'x': 0, 'y': 0, 'z': 0},
-                'scale': {'x': 1, 'y': 1, 'z': 1}
-            }
-            print("base_link identified as: "+ str(base_link))
+        base = base_link_record(parents, children, parent_count)
+        if base is not None:
+            joints_info[base[0]] = base[1]
     return joints_info
 
+def material_color(material):
+    # The rgba color of a <material> element, or None if it has no <color>.
+    if material.find('color') is not None:
+        color = list(map(float, material.find('color').get('rgba').split()))
+        return {"r": color[0], "g": color[1], "b": color[2], "a": color[3]}
+    return None
+
+def link_record(link, property_table, materials_map):
+    """
+    Returns the item for a <link> element, or None if the link has no name.
+    materials_map maps material names to colors for visuals that reference a named material.
+    """
+    link_name = link.get('name')
+    visual = link.find('visual')
+    geometry = None
+    scale = None
+    if visual is not None and visual.find('geometry/mesh') is not None:
+        mesh = visual.find('geometry/mesh')
+        geometry = mesh.get('filename')
+        if mesh.get('scale'):
+            scale = list(map(float, parseString(mesh.get('scale'), property_table).split()))
+    elif visual is not None and visual.find("geometry") is not None:
+        for shape in predefined_mapping:
+            if visual.find('geometry/'+shape) is not None:
+                geometry = predefined_mapping[shape]
+                size_node = visual.find(f"geometry/{shape}")
+                if shape == "box" and size_node is not None:
+                        size = list(map(float, parseString(size_node.get('size'), property_table).split()))
+                        scale = [size[0], size[1], size[2]]  # Update scale based on size
+                break  # Exit loop after finding the first matching shape
+               
+
+    if link_name is not None and visual is not None and geometry is not None:
+        color = {"r": 1, "g": 1, "b": 1, "a": 1}  # Default color
+        # Check if color is defined directly
+        if visual.find('material/color') is not None:
+            arr_color = list(map(float, visual.find('material/color').get('rgba').split()))
+            color = {"r":arr_color[0], "g":arr_color[1], "b":arr_color[2], "a":arr_color[3]}
+        elif visual.find('material') is not None and materials_map.get(visual.find('material').get('name')):
+            # Use material name to find color
+            color = materials_map[visual.find('material').get('name')]
+            
+        
+        # Check if origin is present
+        origin = visual.find('origin')
+        xyz = [0.0, 0.0, 0.0]
+        rpy = [0.0, 0.0, 0.0]
+
+        if origin is not None:
+            xyz = list(map(float, origin.get('xyz', '0 0 0').split()))
+            rpy = list(map(float, parseString(origin.get('rpy', '0 0 0'), property_table).split()))
+        return {
+            "shape": geometry,
+            "name": link_name,
+            "frame": link_name,
+            "position": {"x": xyz[0], "y": xyz[1], "z": xyz[2]},
+            "rotation": {"w": 1, "x": rpy[0], "y": rpy[1], "z": rpy[2]},
+            "color": color,
+            "scale": {"x": scale[0], "y": scale[1], "z": scale[2]} if scale else {"x": 1, "y": 1, "z": 1},
+            "highlight": False
+        }
+
+    elif link_name is not None:
+        return {
+            "shape": geometry,
+            "name": link_name,
+            "frame": link_name,
+            "position": {"x": 0, "y": 0, "z": 0},
+            "rotation": {"w": 1, "x": 0, "y": 0, "z": 0},
+            "color": "",
+            "scale": {"x": 1, "y": 1, "z": 1},
+            "highlight": False
+        }
+    return None
+
 def parse_urdf_for_links(urdf_content):
-    root = ET.fromstring(urdf_content)
-    links = root.findall('.//link')
-    materials = root.findall('.//material')
+    document = as_document(urdf_content)
     items = {}  # New dictionary to populate
-    # Find all xacro:property elements
-    namespace = {'xacro': 'http://www.ros.org/wiki/xacro'}
-    property_elements = root.findall('.//xacro:property', namespaces=namespace)
-    property_table = {}
-    # getting all external properties to parse
-    for property in property_elements:
-        property_table[property.get('name')] = property.get('value')
+    property_table = document.property_table
     # Create a materials map
     materials_map = {}
-    # Change your predefined geometry shape mapping here. In the scenario of Lio,
-    # box = cube
-    predefined_mapping = {
-        "box": "cube",
-        "cylinder": "cylinder",
-        "sphere": "sphere",
-    }
-
-    for material in materials:
-        name = material.get('name')
-        if material.find('color') is not None:
-            color = list(map(float, material.find('color').get('rgba').split()))
-            materials_map[name] = {"r": color[0], "g": color[1], "b": color[2], "a": color[3]}
-
-    
-    for link in links:
-        link_name = link.get('name')
-        # print(link_name)
-        visual = link.find('visual')
-        geometry = None
-        scale = None
-        if visual is not None and visual.find('geometry/mesh') is not None:
-            mesh = visual.find('geometry/mesh')
-            geometry = mesh.get('filename')
-            if mesh.get('scale'):
-                scale = list(map(float, parseString(mesh.get('scale'), property_table).split()))
-        elif visual is not None and visual.find("geometry") is not None:
-            for shape in predefined_mapping:
-                if visual.find('geometry/'+shape) is not None:
-                    geometry = predefined_mapping[shape]
-                    size_node = visual.find(f"geometry/{shape}")
-                    if shape == "box" and size_node is not None:
-                            size = list(map(float, parseString(size_node.get('size'), property_table).split()))
-                            scale = [size[0], size[1], size[2]]  # Update scale based on size
-                    break  # Exit loop after finding the first matching shape
-                   
-
-        if link_name is not None and visual is not None and geometry is not None:
-            color = {"r": 1, "g": 1, "b": 1, "a": 1}  # Default color
-            # Check if color is defined directly
-            if visual.find('material/color') is not None:
-                arr_color = list(map(float, visual.find('material/color').get('rgba').split()))
-                color = {"r":arr_color[0], "g":arr_color[1], "b":arr_color[2], "a":arr_color[3]}
-            elif visual.find('material') is not None and materials_map.get(visual.find('material').get('name')):
-                # Use material name to find color
-                color = materials_map[visual.find('material').get('name')]
-                
-            
-            # Check if origin is present
-            origin = visual.find('origin')
-            xyz = [0.0, 0.0, 0.0]
-            rpy = [0.0, 0.0, 0.0]
-
-            if origin is not None:
-                xyz = list(map(float, origin.get('xyz', '0 0 0').split()))
-                rpy = list(map(float, parseString(origin.get('rpy', '0 0 0'), property_table).split()))
-            items[link_name] = {
-                "shape": geometry,
-                "name": link_name,
-                "frame": link_name,
-                "position": {"x": xyz[0], "y": xyz[1], "z": xyz[2]},
-                "rotation": {"w": 1, "x": rpy[0], "y": rpy[1], "z": rpy[2]},
-                "color": color,
-                "scale": {"x": scale[0], "y": scale[1], "z": scale[2]} if scale else {"x": 1, "y": 1, "z": 1},
-                "highlight": False
-            }
-
-        elif link_name is not None:
-            items[link_name] = {
-                "shape": geometry,
-                "name": link_name,
-                "frame": link_name,
-                "position": {"x": 0, "y": 0, "z": 0},
-                "rotation": {"w": 1, "x": 0, "y": 0, "z": 0},
-                "color": "",
-                "scale": {"x": 1, "y": 1, "z": 1},
-                "highlight": False
-            }
+    for material in document.materials:
+        color = material_color(material)
+        if color is not None:
+            materials_map[material.get('name')] = color
+
+    for link in document.links:
+        item = link_record(link, property_table, materials_map)
+        if item is not None:
+            items[item["name"]] = item
     return items
 
-def read_urdf_file(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        return content
-    except Exception as e:
-        print(f"An error occurred while reading the file: {e}")
-        sys.exit(1)
+XACRO_PROPERTY_TAG = '{%s}property' % XACRO_NAMESPACE['xacro']
+
+def _iterparse_released(file_path):
+    """
+    Yields (element, depth) from ET.iterparse as each element closes. Once a direct child
+    of the root has been handled, everything parsed so far is dropped, so memory stays
+    bounded by the largest top-level element instead of by the file size.
+    """
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        yield element, depth
+        depth -= 1
+        if depth == 1:
+            root.clear()
+
+def _stream_tables(file_path):
+    # First pass: the xacro properties and named material colors, like URDFDocument collects
+    # them over the whole file, so a link may use a property or material defined after it.
+    property_table = PropertyTable()
+    materials_map = {}
+    for element, depth in _iterparse_released(file_path):
+        if element.tag == XACRO_PROPERTY_TAG:
+            property_table[element.get('name')] = element.get('value')
+        elif element.tag == 'material':
+            color = material_color(element)
+            if color is not None:
+                materials_map[element.get('name')] = color
+    return property_table, materials_map
+
+def iter_urdf_records(file_path, is_main):
+    """
+    Streams a URDF with ET.iterparse and yields ("joint", child, tf) and ("link", name, item)
+    records as their elements close, then the ("joint", base_link, tf) record when is_main.
+
+    The file is read twice, once for the xacro properties and material colors and once for
+    the records, but never held in memory as a whole.
+    """
+    property_table, materials_map = _stream_tables(file_path)
+    parents = set()
+    children = set()
+    parent_count = {}
+    for element, depth in _iterparse_released(file_path):
+        # Same elements as URDFDocument: <joint> children of the root and <link> anywhere.
+        if element.tag == 'joint' and depth == 2:
+            record = joint_record(element, property_table)
+            if record is not None:
+                parent, child, tf = record
+                parents.add(parent)
+                children.add(child)
+                parent_count[parent] = parent_count.get(parent, 0) + 1
+                yield "joint", child, tf
+        elif element.tag == 'link':
+            item = link_record(element, property_table, materials_map)
+            if item is not None:
+                yield "link", item["name"], item
+            element.clear()
 
-def read_urdf_file(file_path):
-    with open(file_path, 'r') as file:
-        return file.read()
+    if is_main:
+        base = base_link_record(parents, children, parent_count)
+        if base is not None:
+            yield "joint", base[0], base[1]
+
+def parse_urdf_streaming(file_path, is_main):
+    """
+    Streaming counterpart of parse_urdf_for_joints and parse_urdf_for_links for very large
+    generated URDFs. Returns (joints_info, links_info), identical to the DOM parsers.
+    """
+    joints_info = {}
+    links_info = {}
+    for kind, name, record in iter_urdf_records(file_path, is_main):
+        if kind == "joint":
+            joints_info[name] = record
+        else:
+            links_info[name] = record
+    return joints_info, links_info
 
 def write_to_json_file(data, file_path):
-    with open(file_path, 'w') as file:
+    # Atomic, so a viewer reloading the file never reads half of it.
+    with atomic_open(file_path) as file:
         json.dump(data, file, indent=4)
 
-def main():
-    if len(sys.argv) != 4:
-        print("Usage: python urdf_parser.py <parent_directory_path> <destination_json_file> <main_urdf_name>")
-        sys.exit(1)
-    
-    parent_directory_path = sys.argv[1]
-    destination_json_file_path = sys.argv[2]
-    main_file = sys.argv[3]
-    
-    # Initialize the dictionaries to store combined information from all URDF files
-    combined_tfs = {}  # For joints_info
-    combined_items = {}  # For links_info
-
+def parse_file(urdf_file_path, is_main, stream=False, xacro_args=None):
+    """
+    Returns (joints_info, links_info) for one .urdf or .xacro file.
+    With stream=True the file is parsed with iterparse instead of being loaded whole.
+    With xacro_args (a dict, possibly empty) the file is expanded first, see xacro_expander.py.
+    """
+    if stream:
+        return parse_urdf_streaming(urdf_file_path, is_main)
+    if xacro_args is not None:
+        try:
+            document = URDFDocument(expand_file(urdf_file_path, xacro_args)[0], urdf_file_path)
+        except XacroError as e:
+            if is_main:
+                raise
+            # e.g. a macro file meant to be included with arguments it does not get here.
+            print(f"Skipping {urdf_file_path}: {e}")
+            return {}, {}
+    else:
+        # Parse the file once and share the tree between both extractors
+        document = load_document(urdf_file_path)
+    return parse_urdf_for_joints(document, is_main), parse_urdf_for_links(document)
+
+def find_urdf_files(parent_directory_path, main_file):
+    """
+    Returns (urdf_file_path, is_main) for every .urdf and .xacro file, in os.walk order.
+    """
+    urdf_files = []
     # Iterate over all directories starting from the parent directory
-    for root, dirs, files in os.walk(parent_directory_path):
+    for root, dirs, files in walk(parent_directory_path):
         print(f"walking through {str(dirs)}")
         for file in files:
             if file.endswith('.urdf') or file.endswith(".xacro"):
-                print(f"converting {file}...")
-                find_base = main_file == file
-                urdf_file_path = os.path.join(root, file)
-                urdf_content = read_urdf_file(urdf_file_path)
-                
-                # Assuming parse_urdf_for_joints and parse_urdf_for_links are defined
-                joints_info = parse_urdf_for_joints(urdf_content, find_base)
-                links_info = parse_urdf_for_links(urdf_content)
-
-                # Merge the current file's joints and links info into the combined dictionaries
-                for key, value in joints_info.items():
-                    if key not in combined_tfs:
-                        combined_tfs[key] = value
-                for key, value in links_info.items():
-                    if key not in combined_items:
-                        combined_items[key] = value
+                urdf_files.append((os.path.join(root, file), main_file == file))
+    return urdf_files
+
+def source_files(urdf_file_path, xacro_args=None):
+    # Absolute paths of the files a parse result depends on, the file itself first.
+    if xacro_args is not None:
+        try:
+            return expand_file(urdf_file_path, xacro_args)[1]
+        except XacroError:
+            pass
+    return [os.path.abspath(urdf_file_path)]
+
+def parse_mode(stream=False, xacro_args=None):
+    # Results of different modes are cached separately.
+    if xacro_args is not None:
+        return "xacro " + json.dumps(sorted(xacro_args.items()))
+    return "stream" if stream else "dom"
+
+def _parse_file_job(job):
+    urdf_file_path, is_main, stream, xacro_args = job
+    print(f"converting {os.path.basename(urdf_file_path)}...")
+    with phase("parse_urdf", urdf_file_path, stream=stream):
+        joints_info, links_info = parse_file(urdf_file_path, is_main, stream, xacro_args)
+    return joints_info, links_info, source_files(urdf_file_path, xacro_args)
+
+def _load_cached(cache, urdf_files, mode, cached):
+    # Adds the stored results of urdf_files to cached, None for the files that have to be parsed.
+    if cache is None:
+        return
+    for urdf_file_path, is_main in urdf_files:
+        if urdf_file_path not in cached:
+            cached[urdf_file_path] = cache.get(urdf_file_path, is_main, mode)
+
+def parse_directory(parent_directory_path, main_file, stream=False, jobs=1, xacro_args=None, cache=None):
+    """
+    Parses every .urdf and .xacro file under parent_directory_path and merges their joints
+    and links. When several files define the same frame or item, the first one found wins.
+    main_file is the file name of the main URDF, its root link is attached to "world".
+
+    With jobs > 1 the files are parsed in a process pool. Results are still merged in
+    os.walk order, so the output is the same as a serial run.
+
+    With xacro_args (a dict of xacro:arg values, possibly empty) every file is expanded
+    with xacro_expander.py first, and the files the main file includes are not parsed on
+    their own: their links and joints are part of the main file's tree.
+
+    With a parse_cache.ParseCache only the files without a stored result are parsed, the
+    merge runs over stored and new results alike.
+    """
+    # Initialize the dictionaries to store combined information from all URDF files
+    combined_tfs = {}  # For joints_info
+    combined_items = {}  # For links_info
+
+    urdf_files = find_urdf_files(parent_directory_path, main_file)
+    mode = parse_mode(stream, xacro_args)
+    # urdf_file_path -> (joints_info, links_info, files) of every file found in the cache or parsed
+    cached = {}
+    if xacro_args is not None:
+        _load_cached(cache, [(urdf_file_path, is_main) for urdf_file_path, is_main in urdf_files if is_main], mode, cached)
+        included = set()
+        for urdf_file_path, is_main in urdf_files:
+            if is_main:
+                files = cached[urdf_file_path][2] if cached.get(urdf_file_path) else source_files(urdf_file_path, xacro_args)
+                included.update(files[1:])
+        urdf_files = [(urdf_file_path, is_main) for urdf_file_path, is_main in urdf_files
+                      if os.path.abspath(urdf_file_path) not in included]
+    _load_cached(cache, urdf_files, mode, cached)
+    file_jobs = [(urdf_file_path, is_main, stream, xacro_args) for urdf_file_path, is_main in urdf_files
+                 if cached.get(urdf_file_path) is None]
+    if jobs > 1 and len(file_jobs) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            parsed = list(executor.map(_parse_file_job, file_jobs, chunksize=max(1, len(file_jobs) // (jobs * 4))))
+    else:
+        parsed = [_parse_file_job(job) for job in file_jobs]
+    for (urdf_file_path, is_main, _, _), result in zip(file_jobs, parsed):
+        cached[urdf_file_path] = result
+        if cache is not None:
+            cache.put(urdf_file_path, is_main, mode, *result)
+    results = [cached[urdf_file_path] for urdf_file_path, _ in urdf_files]
+
+    for joints_info, links_info, _ in results:
+        # Merge the current file's joints and links info into the combined dictionaries
+        for key, value in joints_info.items():
+            if key not in combined_tfs:
+                combined_tfs[key] = value
+        for key, value in links_info.items():
+            if key not in combined_items:
+                combined_items[key] = value
 
     # Prepare the final dictionary with only 'tfs' and 'items' keys
-    final_urdf_info = {
+    return {
         'tfs': combined_tfs,
         'items': combined_items
     }
 
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate the joints and links of every URDF/xacro file in a directory into one JSON file.")
+    parser.add_argument("parent_directory_path", type=str, help="Directory searched for .urdf and .xacro files.")
+    parser.add_argument("destination_json_file", type=str, help="Path of the JSON file to write.")
+    parser.add_argument("main_urdf_name", type=str, help="File name of the main URDF, its root link is attached to world.")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Parse the files in a pool of this many processes. The output is identical to a serial run.")
+    parser.add_argument("--world-poses", action="store_true",
+                        help="Add a 'world_poses' section with the pose of every frame relative to the root of its chain.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Parse with iterparse, for very large generated URDFs. Memory use is bounded by the largest element instead of the file size.")
+    parser.add_argument("--packed", type=str, default=None,
+                        help="Also write the packed binary format to this path (e.g. items_tf.bin), with ItemsTfLoader.js next to it.")
+    parser.add_argument("--compare-packed", action="store_true",
+                        help="With --packed, also print the size and load time of the JSON and the packed file. Loads both files several times.")
+    parser.add_argument("--cache", type=str, nargs="?", const="", default=None,
+                        help="Keep the parse result of every file in this SQLite database (next to the JSON file when no path is given) "
+                             "and only parse the files that changed since the last run.")
+    parser.add_argument("--xacro", action="store_true",
+                        help="Expand xacro:include, xacro:macro, xacro:if/unless and $(arg ...) first (see xacro_expander.py), so a multi-file robot becomes one tree.")
+    parser.add_argument("--xacro-arg", type=str, nargs="+", default=[], help="With --xacro, xacro arguments in the format name:=value.")
+    instrumentation.add_arguments(parser)
+    file_index.add_arguments(parser)
+    args = parser.parse_args()
+    if args.xacro and args.stream:
+        parser.error("--xacro cannot be combined with --stream")
+    instrumentation.configure(args.trace, args.profile)
+    file_index.configure(args.file_index)
+    
+    destination_json_file_path = args.destination_json_file
+
+    cache = None
+    if args.cache is not None:
+        cache = ParseCache(args.cache or destination_json_file_path + ".cache.sqlite", PARSER_VERSION)
+    try:
+        final_urdf_info = parse_directory(args.parent_directory_path, args.main_urdf_name, args.stream, max(1, args.jobs),
+                                          parse_xacro_args(args.xacro_arg) if args.xacro else None, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+            print(f"Parse cache: {cache.hits} files reused, {cache.misses} parsed")
+
+    if args.world_poses:
+        final_urdf_info['world_poses'] = compute_world_poses(final_urdf_info['tfs'])
+
     # Write the aggregated information to a single JSON file
-    write_to_json_file(final_urdf_info, destination_json_file_path)
+    with phase("write_json", destination_json_file_path):
+        write_to_json_file(final_urdf_info, destination_json_file_path)
     print(f"All URDF information has been aggregated into 'tfs' and 'items' and written to {destination_json_file_path}")
 
+    if args.packed:
+        with phase("write_packed", args.packed):
+            write_packed_file(final_urdf_info, args.packed)
+        print(f"Packed 'tfs' and 'items' written to {args.packed}")
+        if args.compare_packed:
+            compare_with_json(destination_json_file_path, args.packed)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
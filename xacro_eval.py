@@ -0,0 +1,230 @@
+import re
+import ast
+import math
+import operator
+from functools import lru_cache
+
+# ${...} substitutions inside attribute values and property values.
+SUBSTITUTION_PATTERN = re.compile(r'\$\{(.*?)\}')
+
+# Names every expression can use without defining them. Add more default properties to swap
+# if you encounter errors. Lio is special and refuses to define their property values normally.
+BUILTINS = {
+    'pi': math.pi,
+    # $(arg ...) is substituted as text before evaluation, so ${not $(arg sim)} reads not false.
+    'true': True, 'false': False, 'True': True, 'False': False,
+}
+
+# Functions allowed in expressions, as in ROS xacro.
+FUNCTIONS = {
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'asin': math.asin, 'acos': math.acos, 'atan': math.atan, 'atan2': math.atan2,
+    'sqrt': math.sqrt, 'radians': math.radians, 'degrees': math.degrees,
+    'floor': math.floor, 'ceil': math.ceil, 'abs': abs, 'min': min, 'max': max,
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub,
+    ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+    ast.Pow: operator.pow, ast.BitXor: operator.xor,
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Not: operator.not_,
+}
+
+# Comparisons, as used by xacro:if and xacro:unless conditions.
+_COMPARE_OPERATORS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.In: lambda left, right: left in right, ast.NotIn: lambda left, right: left not in right,
+}
+
+
+def _compile_node(node):
+    """
+    Turns an expression AST into a closure taking a name lookup function, so evaluating
+    an expression again does not walk the AST again.
+    """
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda lookup: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda lookup: lookup(name)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        function = _BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda lookup: function(left(lookup), right(lookup))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        function = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda lookup: function(operand(lookup))
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPERATORS for op in node.ops):
+        left = _compile_node(node.left)
+        pairs = [(_COMPARE_OPERATORS[type(op)], _compile_node(comparator)) for op, comparator in zip(node.ops, node.comparators)]
+
+        def compare(lookup):
+            # Chained like Python: a < b < c is a < b and b < c.
+            value = left(lookup)
+            for function, comparator in pairs:
+                right = comparator(lookup)
+                if not function(value, right):
+                    return False
+                value = right
+            return True
+        return compare
+    if isinstance(node, ast.BoolOp):
+        values = [_compile_node(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda lookup: all(value(lookup) for value in values)
+        return lambda lookup: any(value(lookup) for value in values)
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = _compile_node(node.test), _compile_node(node.body), _compile_node(node.orelse)
+        return lambda lookup: body(lookup) if test(lookup) else orelse(lookup)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+        function = FUNCTIONS[node.func.id]
+        arguments = [_compile_node(argument) for argument in node.args]
+        return lambda lookup: function(*[argument(lookup) for argument in arguments])
+    raise TypeError(f"unsupported expression {ast.dump(node)}")
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(expression):
+    """
+    Compiles the inside of a ${...} once. The result is called with a function resolving
+    variable names to values. The 4096 most recently used expressions are cached, so a
+    repeated expression is parsed once, while a long running daemon does not keep every
+    expression of every file it ever read.
+    """
+    return _compile_node(ast.parse(expression.strip(), mode='eval').body)
+
+
+def _parse_literal(text):
+    # Property values are strings, numbers are used as numbers and true/false (any case) as
+    # booleans like xacro does, so ${not sim} is True for sim="false".
+    if text.strip().lower() in ('true', 'false'):
+        return text.strip().lower() == 'true'
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class PropertyTable(dict):
+    """
+    xacro:property names mapped to their raw values, which may reference other properties
+    through ${...}. Values are resolved on demand in dependency order and memoized, so every
+    property is evaluated at most once, and circular references are reported.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+        self._resolving = set()
+        self._substitutions = {}
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        # Other properties may have been resolved through the old value. (The caches do not
+        # exist yet while a pickled table is being restored.)
+        if '_values' in self.__dict__:
+            self.invalidate()
+
+    # Every other way of changing the table forgets the resolved values as well.
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self.invalidate()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.invalidate()
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def pop(self, name, *default):
+        value = super().pop(name, *default)
+        self.invalidate()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.invalidate()
+        return item
+
+    def clear(self):
+        super().clear()
+        self.invalidate()
+
+    def invalidate(self):
+        # Forgets every resolved value and substitution.
+        self._values.clear()
+        self._substitutions.clear()
+
+    def resolve(self, name):
+        """
+        Returns the value of a property (a number when it is numeric), or of a builtin.
+        """
+        if name in self._values:
+            return self._values[name]
+        if name not in self:
+            if name in BUILTINS:
+                return BUILTINS[name]
+            raise NameError(f"Name {name} is not defined")
+        if name in self._resolving:
+            raise ValueError(f"Circular reference through property {name}")
+        self._resolving.add(name)
+        try:
+            raw = self[name]
+            if raw is None:
+                raise ValueError(f"Property {name} has no value")
+            match = SUBSTITUTION_PATTERN.fullmatch(raw.strip())
+            # A value that is a single ${...} keeps the type of the expression.
+            value = self.evaluate(match.group(1)) if match else _parse_literal(self.substitute(raw, strict=True))
+        finally:
+            self._resolving.discard(name)
+        self._values[name] = value
+        return value
+
+    def resolve_all(self):
+        # Resolves every property, each one after the properties it references.
+        return {name: self.resolve(name) for name in self}
+
+    def evaluate(self, expression):
+        return compile_expression(expression)(self.resolve)
+
+    def substitute(self, text, strict=False):
+        """
+        Replaces every ${...} in text by its value. Expressions that cannot be evaluated
+        are reported and left in place, unless strict is set, in which case the error is raised.
+        """
+        if not strict and text in self._substitutions:
+            return self._substitutions[text]
+
+        def replace_match(match):
+            expression = match.group(1)
+            try:
+                # Evaluate the expression and replace in the input string
+                return str(self.evaluate(expression))
+            except Exception as e:
+                if strict:
+                    raise
+                print(f"Error evaluating expression '{expression}': {e}")
+                return match.group(0)  # Return the original string if error
+
+        result = SUBSTITUTION_PATTERN.sub(replace_match, text)
+        if not strict:
+            self._substitutions[text] = result
+        return result
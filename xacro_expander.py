@@ -0,0 +1,355 @@
+import os
+import re
+import copy
+import argparse
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from collections import OrderedDict
+
+from xacro_eval import SUBSTITUTION_PATTERN, PropertyTable
+
+# Both namespace URIs are in use in the wild.
+XACRO_URIS = ("http://www.ros.org/wiki/xacro", "http://ros.org/wiki/xacro")
+# $(arg name), $(find package), $(env NAME), $(optenv NAME default)
+COMMAND_PATTERN = re.compile(r'\$\((\w+)\s*([^)]*)\)')
+# name, name:=default, name:=^, name:=^|default, *block, **block
+PARAMETER_PATTERN = re.compile(r'(\*{0,2})([\w-]+)(?::=(.*))?')
+
+
+class XacroError(ValueError):
+    pass
+
+
+def xacro_name(tag):
+    # The local name of a xacro element (property, macro, ...), None for any other element.
+    for uri in XACRO_URIS:
+        if tag.startswith("{%s}" % uri):
+            return tag[len(uri) + 2:]
+    return None
+
+
+# absolute path -> ((mtime_ns, size), root element), least recently used first. Included files
+# are parsed once and never modified, every expansion reads the same tree. Bounded, since the
+# daemon's pool processes expand many robots over their lifetime.
+PARSED_CACHE_SIZE = 256
+_parsed_cache = OrderedDict()
+
+
+def parse_cached(file_path):
+    stat = os.stat(file_path)
+    key = os.path.abspath(file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _parsed_cache.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, ET.parse(key).getroot())
+        _parsed_cache[key] = cached
+    _parsed_cache.move_to_end(key)
+    if len(_parsed_cache) > PARSED_CACHE_SIZE:
+        _parsed_cache.popitem(last=False)
+    return cached[1]
+
+
+@lru_cache(maxsize=1024)
+def find_package(name, start_dir):
+    """
+    Resolves $(find name): the closest directory named name above start_dir, or one of the
+    directories of ROS_PACKAGE_PATH (the directory itself or its child named name).
+    """
+    directory = os.path.abspath(start_dir)
+    while True:
+        if os.path.basename(directory) == name:
+            return directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    for root in filter(None, os.environ.get("ROS_PACKAGE_PATH", "").split(os.pathsep)):
+        for candidate in (root, os.path.join(root, name)):
+            if os.path.basename(os.path.normpath(candidate)) == name and os.path.isdir(candidate):
+                return os.path.abspath(candidate)
+    raise XacroError(f"package {name} not found above {start_dir} or on ROS_PACKAGE_PATH")
+
+
+class _ScopeTable(PropertyTable):
+    # The properties of one macro call, falling back to the scope the macro was called in.
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+
+    def resolve(self, name):
+        if name not in self and name not in self._values:
+            return self.parent.resolve(name)
+        return super().resolve(name)
+
+
+class _Scope:
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.properties = PropertyTable() if parent is None else _ScopeTable(parent.properties)
+        self.blocks = {}
+        self.macros = {}
+
+    def lookup(self, kind, name):
+        scope = self
+        while scope is not None:
+            if name in getattr(scope, kind):
+                return getattr(scope, kind)[name]
+            scope = scope.parent
+        return None
+
+
+class XacroExpander:
+    """
+    Expands a xacro file into a plain URDF tree, without ROS: xacro:include, xacro:property
+    (values and blocks), xacro:arg, xacro:macro calls with parameter defaults and block
+    parameters, xacro:insert_block, xacro:if and xacro:unless, ${...} expressions and the
+    $(arg), $(find), $(env) and $(optenv) substitutions.
+
+    Included files are parsed once per process (see parse_cached) however often they are
+    included. Namespaced includes (ns=...) and xacro:element/xacro:attribute are not supported.
+
+    Attributes:
+    - includes: Absolute paths of every file read, the expanded file first.
+    """
+    def __init__(self, args=None):
+        self.args = dict(args or {})
+        self.includes = []
+        self._stack = []
+
+    def expand_file(self, file_path):
+        """
+        Returns the root element of the expanded URDF.
+        """
+        self.includes = []
+        scope = _Scope()
+        source = self._enter(file_path)
+        try:
+            root = ET.Element(source.tag, self._attributes(source, scope))
+            root.text = source.text
+            self._expand_children(source, root, scope)
+        finally:
+            self._stack.pop()
+        return root
+
+    def _enter(self, file_path):
+        path = os.path.abspath(file_path)
+        if path in self._stack:
+            raise XacroError(f"{path} includes itself through {' -> '.join(self._stack)}")
+        self._stack.append(path)
+        if path not in self.includes:
+            self.includes.append(path)
+        return parse_cached(path)
+
+    def _command(self, match):
+        command, argument = match.group(1), match.group(2).strip()
+        if command == "arg":
+            if argument not in self.args:
+                raise XacroError(f"undefined argument {argument}")
+            return self.args[argument]
+        if command == "find":
+            return find_package(argument, os.path.dirname(self._stack[-1]))
+        if command == "env":
+            if argument not in os.environ:
+                raise XacroError(f"environment variable {argument} is not set")
+            return os.environ[argument]
+        if command == "optenv":
+            name, _, default = argument.partition(" ")
+            return os.environ.get(name, default.strip())
+        raise XacroError(f"unsupported substitution $({command} {argument})")
+
+    def _text(self, text, scope):
+        if text is None or "$" not in text:
+            return text
+        return scope.properties.substitute(COMMAND_PATTERN.sub(self._command, text))
+
+    def _attributes(self, element, scope):
+        return {name: self._text(value, scope) for name, value in element.attrib.items()}
+
+    def _condition(self, element, scope):
+        text = COMMAND_PATTERN.sub(self._command, element.get("value", "")).strip()
+        match = SUBSTITUTION_PATTERN.fullmatch(text)
+        value = scope.properties.evaluate(match.group(1)) if match else scope.properties.substitute(text)
+        if isinstance(value, str):
+            if value.lower() in ("true", "1"):
+                return True
+            if value.lower() in ("false", "0"):
+                return False
+            raise XacroError(f"invalid condition '{value}', expected true or false")
+        return bool(value)
+
+    def _define_property(self, element, scope):
+        name = element.get("name")
+        target = {"parent": scope.parent or scope, "global": None}.get(element.get("scope"), scope)
+        if target is None:
+            target = scope
+            while target.parent is not None:
+                target = target.parent
+        if element.get("value") is None and element.get("default") is None:
+            # A block property, expanded where xacro:insert_block inserts it.
+            target.blocks[name] = ("property", element)
+            return
+        value = element.get("value")
+        if value is None:
+            # default only applies when the property is not defined yet.
+            if name in target.properties:
+                return
+            value = element.get("default")
+        if target is scope:
+            target.properties[name] = COMMAND_PATTERN.sub(self._command, value)
+        else:
+            # Evaluated here, the macro's own properties are gone once it returns.
+            target.properties[name] = str(self._text(value, scope))
+            current = scope
+            while current is not target:
+                current.properties.invalidate()
+                current = current.parent
+
+    def _call_macro(self, definition, element, output, scope):
+        # Like ROS xacro, the body sees the properties and macros of the calling scope.
+        call = _Scope(scope)
+        children = [child for child in element]
+        supplied = self._attributes(element, scope)
+        for parameter in definition.get("params", "").split():
+            match = PARAMETER_PATTERN.fullmatch(parameter)
+            if match is None:
+                raise XacroError(f"invalid parameter '{parameter}' of macro {definition.get('name')}")
+            stars, name, default = match.groups()
+            if stars:
+                if not children:
+                    raise XacroError(f"macro {definition.get('name')} expects a block for {name}")
+                # Expanded in the calling scope. *name inserts the element itself, **name its children.
+                block = ET.Element("block")
+                self._expand_element(children.pop(0), block, scope)
+                call.blocks[name] = ("elements", [item for element in block for item in element] if stars == "**" else list(block))
+                continue
+            if name in supplied:
+                value = supplied[name]
+            elif default is not None:
+                if default.startswith("^"):
+                    try:
+                        value = str(scope.properties.resolve(name))
+                    except NameError:
+                        if "|" not in default:
+                            raise XacroError(f"macro {definition.get('name')}: {name} is not defined in the calling scope")
+                        value = default.split("|", 1)[1]
+                else:
+                    value = default
+            else:
+                raise XacroError(f"macro {definition.get('name')} is missing parameter {name}")
+            call.properties[name] = value
+        self._expand_children(definition, output, call)
+
+    def _insert_block(self, name, output, scope):
+        block = scope.lookup("blocks", name)
+        if block is None:
+            raise XacroError(f"undefined block {name}")
+        kind, content = block
+        if kind == "property":
+            self._expand_children(content, output, scope)
+        else:
+            # A block can be inserted several times, every insertion gets its own copy.
+            output.extend(copy.deepcopy(element) for element in content)
+
+    def _expand_children(self, source, output, scope):
+        for child in source:
+            self._expand_element(child, output, scope)
+
+    def _expand_element(self, element, output, scope):
+        name = xacro_name(element.tag)
+        if name is None:
+            if not isinstance(element.tag, str):
+                return
+            copy = ET.SubElement(output, element.tag, self._attributes(element, scope))
+            copy.text = self._text(element.text, scope)
+            copy.tail = element.tail
+            self._expand_children(element, copy, scope)
+        elif name == "property":
+            self._define_property(element, scope)
+        elif name == "arg":
+            self.args.setdefault(element.get("name"), COMMAND_PATTERN.sub(self._command, element.get("default", "")))
+        elif name == "macro":
+            scope.macros[element.get("name")] = element
+        elif name == "include":
+            file_name = self._text(element.get("filename"), scope)
+            path = os.path.join(os.path.dirname(self._stack[-1]), file_name)
+            included = self._enter(path)
+            try:
+                self._expand_children(included, output, scope)
+            finally:
+                self._stack.pop()
+        elif name in ("if", "unless"):
+            if self._condition(element, scope) == (name == "if"):
+                self._expand_children(element, output, scope)
+        elif name == "insert_block":
+            self._insert_block(self._text(element.get("name"), scope), output, scope)
+        elif name == "call":
+            macro = scope.lookup("macros", self._text(element.get("macro"), scope))
+            if macro is None:
+                raise XacroError(f"undefined macro {element.get('macro')}")
+            self._call_macro(macro, element, output, scope)
+        else:
+            macro = scope.lookup("macros", name)
+            if macro is None:
+                print(f"Skipping unsupported xacro:{name} in {self._stack[-1]}")
+                return
+            self._call_macro(macro, element, output, scope)
+
+
+def parse_xacro_args(values):
+    # ["name:=value", ...] as given on the command line, like ROS xacro takes them.
+    args = {}
+    for value in values or ():
+        name, separator, argument = value.partition(":=")
+        if not separator:
+            raise ValueError(f"invalid xacro argument '{value}', expected name:=value")
+        args[name] = argument
+    return args
+
+
+# (absolute path, args) -> (versions of every file read, (root, includes)), least recently used first
+EXPANSION_CACHE_SIZE = 32
+_expansion_cache = OrderedDict()
+
+
+def _versions(paths):
+    try:
+        return tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+    except OSError:
+        return None
+
+
+def expand_file(file_path, args=None):
+    """
+    Returns (root, includes): the expanded URDF tree of a xacro file and the absolute paths
+    of every file it read. Expansions are cached until one of those files changes.
+
+    Parameters:
+    - file_path: The .xacro or .urdf file to expand.
+    - args: Values of xacro:arg arguments, overriding their defaults.
+    """
+    key = (os.path.abspath(file_path), tuple(sorted((args or {}).items())))
+    cached = _expansion_cache.get(key)
+    if cached is not None and _versions(path for path, _, _ in cached[0]) == cached[0]:
+        _expansion_cache.move_to_end(key)
+        return cached[1]
+    expander = XacroExpander(args)
+    root = expander.expand_file(file_path)
+    # Replaces the stale expansion of the same file and args.
+    _expansion_cache[key] = (_versions(expander.includes), (root, list(expander.includes)))
+    _expansion_cache.move_to_end(key)
+    if len(_expansion_cache) > EXPANSION_CACHE_SIZE:
+        _expansion_cache.popitem(last=False)
+    return root, list(expander.includes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expand a xacro file into a plain URDF, without ROS.")
+    parser.add_argument("xacro_file", type=str, help="The .xacro or .urdf file to expand.")
+    parser.add_argument("output_file", type=str, help="Path of the URDF file to write.")
+    parser.add_argument("--arg", type=str, nargs="+", default=[], help="xacro arguments in the format name:=value.")
+    args = parser.parse_args()
+
+    root, includes = expand_file(args.xacro_file, parse_xacro_args(args.arg))
+    ET.indent(root)
+    ET.ElementTree(root).write(args.output_file, encoding="unicode")
+    print(f"Expanded {args.xacro_file} ({len(includes)} files) into {args.output_file}")